@@ -0,0 +1,167 @@
+"""
+Batched evaluation of many positions at once with NumPy
+
+The positions are stacked in an (N, rows, columns) array and scored together with vectorized window sums:
+the lines of four (the winners), the open windows with 2 and 3 symbols (the threats), the placements allowed
+by the neighbor rule and the slides. The scores are the same as the scores of Evaluation and AlphaBeta.evaluate.
+
+It's used by the analysis jobs that score many positions and by AlphaBeta, which can score all the children of
+the nodes of depth 1 in one batch (see AlphaBeta.batch_evaluation):
+
+    alpha_beta = AlphaBeta(batch_evaluation=BatchEvaluation())
+"""
+import numpy as np
+
+from engine import BitBoard, Evaluation, LineWindows, NOTHING_VALUE, X_VALUE, ZERO_VALUE
+
+# Directions (row step, column step) of the windows and of the neighbors
+WINDOW_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def get_matrix(board):
+    """
+    :return: The game matrix of the board as an int8 array; the bitboards are unpacked without a loop over the cells
+    """
+    if not isinstance(board, BitBoard):
+        return board.get_game_matrix().astype(np.int8)
+
+    geometry = board.geometry
+    bit_count = geometry.no_rows * geometry.stride
+    byte_count = (bit_count + 7) // 8
+    matrix = np.zeros((geometry.no_rows, geometry.no_columns), dtype=np.int8)
+    for (player, bits) in ((X_VALUE, board.x_bits), (ZERO_VALUE, board.zero_bits)):
+        cells = np.unpackbits(np.frombuffer(bits.to_bytes(byte_count, 'little'), dtype=np.uint8),
+                              bitorder='little')[:bit_count]
+        matrix[cells.reshape(geometry.no_rows, geometry.stride)[:, :geometry.no_columns] == 1] = player
+    return matrix
+
+
+def stack_boards(boards):
+    """
+    :return: Array (N, rows, columns) with the game matrices of the boards (all of the same size)
+    """
+    return np.stack([get_matrix(board) for board in boards])
+
+
+def get_window_counts(planes):
+    """
+    :param planes: Array (N, rows, columns) with 1 on the cells of a player
+    :return: Array (N, windows) with the number of symbols of the player on every window of 4 cells
+    """
+    no_rows, no_columns = planes.shape[1:]
+    length = LineWindows.LENGTH
+    counts = []
+    for (row_step, column_step) in WINDOW_DIRECTIONS:
+        row_count = no_rows - (length - 1) * row_step
+        column_count = no_columns - (length - 1) * abs(column_step)
+        first_column = (length - 1) if column_step < 0 else 0
+        window_sum = 0
+        for i in range(length):
+            row_start = i * row_step
+            column_start = first_column + i * column_step
+            window_sum = window_sum + planes[:, row_start:row_start + row_count, column_start:column_start + column_count]
+        counts.append(window_sum.reshape(len(planes), -1))
+    return np.concatenate(counts, axis=1)
+
+
+def get_neighbor_sums(planes, directions):
+    """
+    :param directions: The (row step, column step) of the neighbors
+    :return: Array (N, rows, columns) with the number of neighbors of every cell that are 1 in the planes
+    """
+    no_rows, no_columns = planes.shape[1:]
+    padded = np.pad(planes, ((0, 0), (1, 1), (1, 1)))
+    return sum(padded[:, 1 + row_step:1 + row_step + no_rows, 1 + column_step:1 + column_step + no_columns]
+               for (row_step, column_step) in directions)
+
+
+ORTHOGONAL_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+ALL_DIRECTIONS = ORTHOGONAL_DIRECTIONS + ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+class BatchEvaluation:
+    """
+    Evaluation of a stack of positions with the features and the weights of Evaluation
+    """
+    WIN_SCORE = Evaluation.WIN_SCORE
+
+    def __init__(self, weights=None):
+        """
+        :param weights: Dictionary feature -> weight, see Evaluation
+        """
+        self.weights = Evaluation(weights).weights
+
+    def get_features(self, matrices):
+        """
+        :param matrices: Array (N, rows, columns) of game matrices
+        :return: Tuple (winners, features): the array of the winners (the Symbol value of the player with a
+            line of four, 0 if there is none) and the dictionary feature -> (array for Zero, array for X)
+        """
+        x_planes = (matrices == X_VALUE).astype(np.int8)
+        zero_planes = (matrices == ZERO_VALUE).astype(np.int8)
+        empty_planes = (matrices == NOTHING_VALUE).astype(np.int8)
+
+        # Windows: open_k - the windows with k symbols of the player and none of the opponent
+        x_counts, zero_counts = get_window_counts(x_planes), get_window_counts(zero_planes)
+        x_open, zero_open = zero_counts == 0, x_counts == 0
+        length = LineWindows.LENGTH
+        winners = np.where((x_counts == length).any(axis=1), X_VALUE,
+                           np.where((zero_counts == length).any(axis=1), ZERO_VALUE, 0))
+
+        # Placements: the empty cells where the opponent doesn't have more orthogonal neighbors than the player
+        x_neighbors = get_neighbor_sums(x_planes, ORTHOGONAL_DIRECTIONS)
+        zero_neighbors = get_neighbor_sums(zero_planes, ORTHOGONAL_DIRECTIONS)
+        empty_cells = empty_planes == 1
+        x_mobility = np.count_nonzero(empty_cells & (zero_neighbors <= x_neighbors), axis=(1, 2))
+        zero_mobility = np.count_nonzero(empty_cells & (x_neighbors <= zero_neighbors), axis=(1, 2))
+
+        # Slides: the pairs (symbol of the player, empty neighbor)
+        empty_neighbors = get_neighbor_sums(empty_planes, ALL_DIRECTIONS)
+
+        features = {
+            'open_3': (np.count_nonzero(zero_open & (zero_counts == length - 1), axis=1),
+                       np.count_nonzero(x_open & (x_counts == length - 1), axis=1)),
+            'open_2': (np.count_nonzero(zero_open & (zero_counts == length - 2), axis=1),
+                       np.count_nonzero(x_open & (x_counts == length - 2), axis=1)),
+            'mobility': (zero_mobility, x_mobility),
+            'slides': ((zero_planes * empty_neighbors).sum(axis=(1, 2)), (x_planes * empty_neighbors).sum(axis=(1, 2))),
+        }
+        return winners, features
+
+    def evaluate(self, matrices, depth=0):
+        """
+        :param depth: The remaining depth of the positions, the wins found with more depth are preferred
+            (see AlphaBeta.evaluate)
+        :return: Tuple (array of the scores from the point of view of Zero, array of the winners)
+        """
+        winners, features = self.get_features(matrices)
+        scores = 0
+        for (feature, (zero_values, x_values)) in features.items():
+            scores = scores + self.weights[feature] * (zero_values.astype(np.int64) - x_values)
+        scores = np.clip(scores, -self.WIN_SCORE + 1, self.WIN_SCORE - 1)
+        scores = np.where(winners == ZERO_VALUE, self.WIN_SCORE + depth,
+                          np.where(winners == X_VALUE, -self.WIN_SCORE - depth, scores))
+        return scores, winners
+
+    def evaluate_boards(self, boards, depth=0):
+        """
+        :return: Tuple (array of the scores, array of the winners) of the boards, see evaluate
+        """
+        return self.evaluate(stack_boards(boards), depth)
+
+    def evaluate_moves(self, board, moves_list):
+        """
+        Scores the positions after every move of the list; the children are built from the matrix of the board
+        with one indexed assignment per kind of move, without playing the moves on the board
+
+        :return: Tuple (array of the scores, array of the winners), in the order of the moves
+        """
+        children = np.repeat(get_matrix(board)[np.newaxis], len(moves_list), axis=0)
+        slides = [(child_index, move) for (child_index, move) in enumerate(moves_list) if move.from_cell is not None]
+        if slides:
+            slide_indexes = [child_index for (child_index, move) in slides]
+            children[slide_indexes, [move.from_cell[0] for (child_index, move) in slides],
+                     [move.from_cell[1] for (child_index, move) in slides]] = NOTHING_VALUE
+        children[np.arange(len(moves_list)), [move.to_cell[0] for move in moves_list],
+                 [move.to_cell[1] for move in moves_list]] = moves_list[0].player
+        return self.evaluate(children)
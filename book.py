@@ -0,0 +1,231 @@
+"""
+Opening book
+
+The first moves of every game are searched from the same positions, so they are searched once, offline, and
+kept in a book. A book file has a header (BOOK_HEADER: magic, version, size of the board, the maximum number of
+symbols of its positions and the number of entries) followed by the entries, sorted by key:
+    key    - uint64, the canonical hash of the position with the player to move (see get_canonical_hash)
+    move   - uint16, the move in the canonical orientation of the position (see records.pack_move)
+    weight - uint16, how often the move is chosen
+    score  - int32, the score of the search of the move (records.NO_SCORE if the move comes from the games only)
+All the numbers are little-endian. The file is read through a memory map and searched with a binary search, so
+a lookup costs a few microseconds and the processes that open the same book share its pages.
+
+The entries come from deep searches of every position up to a number of plies from the empty board, from
+the statistics of self-play games (see records.py), or from both:
+
+    python book.py --output book.bin --plies 2 --depth 5
+    python book.py --output book.bin --plies 8 --records games.rec --no-search
+
+    alpha_beta = AlphaBeta(book=Book('book.bin'))
+"""
+import argparse
+import mmap
+import random
+import struct
+import time
+
+from engine import AlphaBeta, BitBoard, Symbol, TranspositionTable, get_opposite_player, NO_ROWS, NO_COLUMNS
+from records import NO_SCORE, pack_move, read_records, replay, unpack_move
+
+MAGIC = b'4LOB'
+VERSION = 1
+BOOK_HEADER = struct.Struct('<4sBBBBI')  # magic, version, rows, columns, maximum symbols, number of entries
+ENTRY = struct.Struct('<QHHi')
+KEY = struct.Struct('<Q')
+
+MAX_WEIGHT = 2 ** 16 - 1
+GAME_POINTS = {'win': 2, 'draw': 1, 'loss': 0}  # Weight added to a move of the games for every result
+# Weight of the best move of a search: the openings of the self-play games are mostly random moves, so a deep
+# search outweighs the results of hundreds of games (--search-weight sets the mix)
+SEARCH_WEIGHT = 1000
+
+
+class BookBuilder:
+    """
+    Collects the entries of a book: dictionary key -> dictionary packed move -> [weight, score]
+    """
+
+    def __init__(self, no_rows=NO_ROWS, no_columns=NO_COLUMNS):
+        self.no_rows = no_rows
+        self.no_columns = no_columns
+        self.entries = {}
+        self.max_symbols = 0
+
+    def add(self, board, player, move, weight, score=None):
+        """
+        Adds the weight (and the score, if given) to the move of the player in the position of the board
+        """
+        key, symmetry = board.get_canonical_hash(player)
+        packed_move = pack_move(board.geometry.transform_move(move, symmetry), self.no_columns)
+        entry = self.entries.setdefault(key, {}).setdefault(packed_move, [0, NO_SCORE])
+        entry[0] = min(MAX_WEIGHT, entry[0] + weight)
+        if score is not None:
+            entry[1] = score
+        self.max_symbols = max(self.max_symbols, len(board.geometry.cells) - board.get_empty_count())
+
+    def add_searches(self, plies, depth_or_budget, memory_mb=64, log=None, weight=SEARCH_WEIGHT):
+        """
+        Searches every position up to the number of plies from the empty board (the symmetric positions once)
+        and adds its best move
+
+        :param depth_or_budget: The depth (int) or the time budget in seconds (float) of the searches
+        :param weight: The weight of the best moves, compared with GAME_POINTS of the moves of the games
+        """
+        alpha_beta = AlphaBeta(TranspositionTable(memory_mb))
+        positions = [(BitBoard(no_rows=self.no_rows, no_columns=self.no_columns), Symbol.X.value)]
+        seen = {positions[0][0].get_canonical_hash(Symbol.X.value)[0]}
+        for ply in range(plies):
+            next_positions = []
+            for (board, player) in positions:
+                move, score = alpha_beta.search(board, player, depth_or_budget)
+                if move is not None:
+                    self.add(board, player, move, weight, score)
+                if ply + 1 == plies:
+                    continue
+
+                opponent = get_opposite_player(player)
+                for child_move in board.get_possible_moves(player):
+                    child = board.copy()
+                    child.make(child_move)
+                    key = child.get_canonical_hash(opponent)[0]
+                    if key not in seen and not child.is_board_final():
+                        seen.add(key)
+                        next_positions.append((child, opponent))
+            if log:
+                log(f"ply {ply + 1}: {len(positions)} positions searched")
+            positions = next_positions
+
+    def add_records(self, path, plies):
+        """
+        Adds the first plies of the games of a file of records; the weight of a move grows with the results
+        of the games where it was played (GAME_POINTS)
+        """
+        for record in read_records(path):
+            if (record.no_rows, record.no_columns) != (self.no_rows, self.no_columns) or record.result is None:
+                continue
+            for (ply, (board, move, score)) in enumerate(replay(record)):
+                if ply == plies:
+                    break
+                if record.result == 0:
+                    points = GAME_POINTS['draw']
+                else:
+                    points = GAME_POINTS['win'] if record.result == move.player else GAME_POINTS['loss']
+                if points:
+                    self.add(board, move.player, move, points)
+
+    def write(self, path):
+        rows = sorted((key, packed_move, weight, score) for (key, moves) in self.entries.items()
+                      for (packed_move, (weight, score)) in moves.items() if weight > 0)
+        with open(path, 'wb') as book_file:
+            book_file.write(BOOK_HEADER.pack(MAGIC, VERSION, self.no_rows, self.no_columns, self.max_symbols,
+                                             len(rows)))
+            for row in rows:
+                book_file.write(ENTRY.pack(*row))
+        return len(rows)
+
+
+class Book:
+    """
+    A book file read through a memory map (read-only, so the processes that open it share its pages)
+    """
+
+    def __init__(self, path, max_symbols=None, best_only=False, seed=None):
+        """
+        :param max_symbols: The book is used only for the positions with up to this number of symbols (the
+            first plies of the game), the limit of the file if None
+        :param best_only: If True, the move with the highest weight is always played, else the moves are
+            chosen at random in proportion to their weights
+        """
+        with open(path, 'rb') as book_file:
+            self.buffer = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.no_rows, self.no_columns, file_max_symbols, self.count = BOOK_HEADER.unpack_from(
+            self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} isn't an opening book (version {VERSION})")
+        self.max_symbols = file_max_symbols if max_symbols is None else min(max_symbols, file_max_symbols)
+        self.best_only = best_only
+        self.random = random.Random(seed)
+        self.hits = 0
+
+    def close(self):
+        self.buffer.close()
+
+    def get_key(self, entry_index):
+        return KEY.unpack_from(self.buffer, BOOK_HEADER.size + entry_index * ENTRY.size)[0]
+
+    def covers(self, board):
+        geometry = board.geometry
+        return ((geometry.no_rows, geometry.no_columns) == (self.no_rows, self.no_columns) and
+                len(geometry.cells) - board.get_empty_count() <= self.max_symbols)
+
+    def get_moves(self, board, player):
+        """
+        :return: List of tuples (move, weight, score or None) of the position, empty if it isn't in the book
+        """
+        if not self.covers(board):
+            return []
+        key, symmetry = board.get_canonical_hash(player)
+
+        # The first entry of the key
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves_list = []
+        while low < self.count:
+            entry_key, packed_move, weight, score = ENTRY.unpack_from(self.buffer, BOOK_HEADER.size + low * ENTRY.size)
+            if entry_key != key:
+                break
+            move = board.geometry.inverse_transform_move(unpack_move(packed_move, self.no_columns), symmetry)
+            # A move of another position with the same key isn't legal (or isn't the player's)
+            if move.player == player and board.is_legal_move(move):
+                moves_list.append((move, weight, score if score != NO_SCORE else None))
+            low += 1
+        return moves_list
+
+    def choose_move(self, board, player):
+        """
+        :return: Tuple (move, score or None) chosen from the book, the move is None if the position isn't in it
+        """
+        moves_list = self.get_moves(board, player)
+        if not moves_list:
+            return None, None
+        self.hits += 1
+        if self.best_only:
+            move, weight, score = max(moves_list, key=lambda entry: entry[1])
+        else:
+            move, weight, score = self.random.choices(moves_list, weights=[entry[1] for entry in moves_list])[0]
+        return move, score
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build an opening book from searches and from self-play games')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--rows', type=int, default=NO_ROWS)
+    parser.add_argument('--columns', type=int, default=NO_COLUMNS)
+    parser.add_argument('--plies', type=int, default=2, help='the positions of the first plies of the game are added')
+    parser.add_argument('--depth', type=int, default=5, help='depth of the searches')
+    parser.add_argument('--time', type=float, help='time budget of the searches in seconds (instead of the depth)')
+    parser.add_argument('--no-search', action='store_true', help="don't search the positions")
+    parser.add_argument('--search-weight', type=int, default=SEARCH_WEIGHT,
+                        help=f"weight of a searched move; a game adds {GAME_POINTS['win']} to the moves of the "
+                             f"winner and {GAME_POINTS['draw']} to the moves of a draw")
+    parser.add_argument('--records', help='file of records of self-play games whose moves are added')
+    parser.add_argument('--memory', type=int, default=64, help='size of the transposition table in MB')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    builder = BookBuilder(arguments.rows, arguments.columns)
+    if not arguments.no_search:
+        builder.add_searches(arguments.plies, arguments.time if arguments.time is not None else arguments.depth,
+                             arguments.memory, log=print, weight=arguments.search_weight)
+    if arguments.records:
+        builder.add_records(arguments.records, arguments.plies)
+    entries_count = builder.write(arguments.output)
+    print(f"{arguments.output}: {len(builder.entries)} positions, {entries_count} moves in "
+          f"{time.perf_counter() - start:.1f}s")
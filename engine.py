@@ -0,0 +1,1877 @@
+"""
+Rules of the game and the searching algorithms
+
+This module doesn't depend on pygame, so it can be used without a display (by the AI workers,
+the benchmarks, the tools). The pygame interface from main.py is a client of this module.
+
+Nothing is printed: the module logs through the "engine" logger, which is silent by default
+(see instrumentation.py for the counters and the profiler of the search).
+"""
+import logging
+import math
+import random
+import time
+from collections import namedtuple
+from enum import Enum
+import numpy as np
+
+from instrumentation import SamplingProfiler, SearchStats
+
+logger = logging.getLogger(__name__)
+
+# Default size of the board; every game can choose its size, up to MAX_ROWS x MAX_COLUMNS (see BoardGeometry)
+NO_ROWS = 6
+NO_COLUMNS = 6
+MAX_ROWS = 19
+MAX_COLUMNS = 19
+
+DEFAULT_DEPTH = 4  # Depth of the AI search (4-8 on the 6x6 board)
+
+
+class NeighborPos(Enum):
+    UP = (0, -1)
+    DOWN = (0, 1)
+    LEFT = (-1, 0)
+    RIGHT = (1, 0)
+    UP_LEFT = (-1, -1)
+    UP_RIGHT = (1, -1)
+    DOWN_LEFT = (-1, 1)
+    DOWN_RIGHT = (1, 1)
+
+
+class Symbol(Enum):
+    Nothing = 0
+    Zero = 1
+    X = 2
+    Zero_possible = 3
+    X_possible = 4
+    Impossible = 5
+
+
+P_MIN = Symbol.X.value
+P_MAX = Symbol.Zero.value
+
+# The values of the symbols for the hot paths (reading Symbol.X.value is slow)
+NOTHING_VALUE = Symbol.Nothing.value
+ZERO_VALUE = Symbol.Zero.value
+X_VALUE = Symbol.X.value
+
+# The neighbors that count for the placement of a symbol (UP, DOWN, LEFT, RIGHT)
+ORTHOGONAL_NEIGHBORS = list(NeighborPos)[0:4]
+
+# The symmetries of the board (transpose, flip the rows, flip the columns); the rules don't change under them.
+# The square boards have all the 8 symmetries, the others only the first 4 (the ones that don't transpose).
+SYMMETRIES = [(transpose, flip_rows, flip_columns)
+              for transpose in (False, True) for flip_rows in (False, True) for flip_columns in (False, True)]
+
+
+class Move(namedtuple('Move', ['player', 'from_cell', 'to_cell'])):
+    """
+    A move of a player: a placement on to_cell (from_cell is None) or a move of the symbol
+    from from_cell to the empty neighbor to_cell
+    """
+    __slots__ = ()
+
+    def is_placement(self):
+        return self.from_cell is None
+
+    def to_text(self):
+        """
+        :return: The move as text: "row,column" for a placement, "row,column-row,column" for a slide
+        """
+        to_text = f"{self.to_cell[0]},{self.to_cell[1]}"
+        if self.from_cell is None:
+            return to_text
+        return f"{self.from_cell[0]},{self.from_cell[1]}-{to_text}"
+
+    @classmethod
+    def from_text(cls, text, player):
+        """
+        :param text: A move written by to_text
+        :param player: The player that makes the move
+        :raise ValueError: If the text isn't one or two cells of two integers
+        """
+        cells = [tuple(int(index) for index in cell.split(',')) for cell in text.strip().split('-')]
+        if len(cells) > 2 or any(len(cell) != 2 for cell in cells):
+            raise ValueError(f"{text} isn't a move")
+        if len(cells) == 1:
+            return cls(player, None, cells[0])
+        return cls(player, cells[0], cells[1])
+
+
+def get_opposite_player(current_player: int):
+    if current_player == Symbol.Zero.value:
+        return Symbol.X.value
+    elif current_player == Symbol.X.value:
+        return Symbol.Zero.value
+    else:
+        logger.warning("Trying to switch the player, but the current_player param (%s) is not a X or Zero",
+                       current_player)
+        return
+
+
+class BoardGeometry:
+    """
+    Everything that depends only on the size of the board: the neighbors of every cell, the windows of 4 cells
+    and the masks of the bitboards
+
+    It's computed once for every size (see get) and shared by all the boards of that size, so the boards
+    don't scan the whole board to find the neighbors of a cell.
+    """
+    CACHE = {}
+
+    def __init__(self, no_rows, no_columns):
+        if not (LineWindows.LENGTH <= no_rows <= MAX_ROWS and LineWindows.LENGTH <= no_columns <= MAX_COLUMNS):
+            raise ValueError(f"The board must have {LineWindows.LENGTH} to {MAX_ROWS} rows and "
+                             f"{LineWindows.LENGTH} to {MAX_COLUMNS} columns, not {no_rows}x{no_columns}")
+
+        self.no_rows = no_rows
+        self.no_columns = no_columns
+        self.cells = [(row_index, column_index) for row_index in range(no_rows) for column_index in range(no_columns)]
+
+        # The in-bounds neighbors of every cell: all the 8 neighbors (in the order of NeighborPos) and the
+        # orthogonal ones; the flat neighbors are (row * no_columns + column, neighbor) pairs
+        self.neighbors = {cell_index: [] for cell_index in self.cells}
+        self.orthogonal_neighbors = {cell_index: [] for cell_index in self.cells}
+        self.flat_neighbors = {cell_index: [] for cell_index in self.cells}
+        for cell_index in self.cells:
+            for neighbor in NeighborPos:
+                neighbor_index = (cell_index[0] + neighbor.value[0], cell_index[1] + neighbor.value[1])
+                if self.is_inside(neighbor_index):
+                    self.neighbors[cell_index].append(neighbor_index)
+                    self.flat_neighbors[cell_index].append((self.flat_index(neighbor_index), neighbor_index))
+                    if neighbor in ORTHOGONAL_NEIGHBORS:
+                        self.orthogonal_neighbors[cell_index].append(neighbor_index)
+
+        # List of the windows (tuples of cells) and the indexes of the windows that contain each cell
+        self.windows = []
+        for cell_index in self.cells:
+            for (row_step, column_step) in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                window = tuple((cell_index[0] + i * row_step, cell_index[1] + i * column_step)
+                               for i in range(LineWindows.LENGTH))
+                if all(self.is_inside(window_cell) for window_cell in window):
+                    self.windows.append(window)
+
+        self.cell_windows = {cell_index: [] for cell_index in self.cells}
+        for (window_index, window) in enumerate(self.windows):
+            for cell_index in window:
+                self.cell_windows[cell_index].append(window_index)
+
+        # The cell that every cell is mapped to by each symmetry (the identity first) and back
+        self.symmetries = SYMMETRIES if no_rows == no_columns else SYMMETRIES[0:4]
+        self.symmetry_cells = []
+        self.inverse_symmetry_cells = []
+        for (transpose, flip_rows, flip_columns) in self.symmetries:
+            cells_map = {}
+            for (row_index, column_index) in self.cells:
+                mapped_row = no_rows - 1 - row_index if flip_rows else row_index
+                mapped_column = no_columns - 1 - column_index if flip_columns else column_index
+                cells_map[(row_index, column_index)] = (
+                    (mapped_column, mapped_row) if transpose else (mapped_row, mapped_column))
+            self.symmetry_cells.append(cells_map)
+            self.inverse_symmetry_cells.append({mapped: cell_index for (cell_index, mapped) in cells_map.items()})
+
+        # The Zobrist keys of every symbol on every cell (flat index) under each symmetry: the boards keep the
+        # hashes of all their symmetric positions (see BaseBoard.get_canonical_hash)
+        self.symmetry_keys = {NOTHING_VALUE: [(0,) * len(self.symmetries)] * len(self.cells)}
+        for symbol in (X_VALUE, ZERO_VALUE):
+            self.symmetry_keys[symbol] = [tuple(Zobrist.key(symbol, cells_map[cell_index])
+                                                for cells_map in self.symmetry_cells)
+                                          for cell_index in self.cells]
+
+        # Bitboards (see BitBoard): one guard column after every row
+        self.stride = no_columns + 1
+
+        # Every real cell of the board (the guard columns excluded)
+        self.cells_mask = int(('0' + '1' * no_columns) * no_rows, 2)
+
+        # Bit offsets of the 4 orthogonal neighbors and of all the 8 neighbors (same order as NeighborPos)
+        self.neighbor_shifts = [pos.value[0] * self.stride + pos.value[1] for pos in NeighborPos]
+        self.orthogonal_shifts = self.neighbor_shifts[0:4]
+
+        # Mask of the orthogonal neighbors and of all the 8 neighbors of every bit
+        self.orthogonal_masks = [0] * (no_rows * self.stride)
+        self.neighbor_masks = [0] * (no_rows * self.stride)
+        for bit_index in range(no_rows * self.stride):
+            for offset in self.orthogonal_shifts:
+                self.orthogonal_masks[bit_index] |= self.shift(1 << bit_index, offset)
+            for offset in self.neighbor_shifts:
+                self.neighbor_masks[bit_index] |= self.shift(1 << bit_index, offset)
+
+    @classmethod
+    def get(cls, no_rows=NO_ROWS, no_columns=NO_COLUMNS):
+        """
+        :return: The geometry of the boards with no_rows x no_columns cells
+        """
+        if (no_rows, no_columns) not in cls.CACHE:
+            cls.CACHE[(no_rows, no_columns)] = cls(no_rows, no_columns)
+        return cls.CACHE[(no_rows, no_columns)]
+
+    def is_inside(self, cell_index):
+        return (0 <= cell_index[0] < self.no_rows) and (0 <= cell_index[1] < self.no_columns)
+
+    def flat_index(self, cell_index):
+        return cell_index[0] * self.no_columns + cell_index[1]
+
+    def get_center(self):
+        return self.no_rows // 2, self.no_columns // 2
+
+    def shift(self, bits, offset):
+        """
+        Moves every symbol of the bitboard by the offset, dropping the ones that leave the board
+        """
+        if offset > 0:
+            return (bits << offset) & self.cells_mask
+        return (bits >> -offset) & self.cells_mask
+
+    def transform_move(self, move, symmetry):
+        """
+        :param symmetry: The index of the symmetry in self.symmetries
+        :return: The move mapped by the symmetry
+        """
+        cells_map = self.symmetry_cells[symmetry]
+        from_cell = cells_map[move.from_cell] if move.from_cell is not None else None
+        return Move(move.player, from_cell, cells_map[move.to_cell])
+
+    def inverse_transform_move(self, move, symmetry):
+        """
+        :return: The move that is mapped to the given move by the symmetry
+        """
+        cells_map = self.inverse_symmetry_cells[symmetry]
+        from_cell = cells_map[move.from_cell] if move.from_cell is not None else None
+        return Move(move.player, from_cell, cells_map[move.to_cell])
+
+
+class LineWindows:
+    """
+    Index of the windows of 4 consecutive cells (horizontal, vertical and diagonal) of the board,
+    with the number of symbols of each player on every window
+
+    Besides the counts, it keeps for each player how many windows are open (they contain only symbols of
+    that player) with 1, 2, 3 and 4 symbols, and which open windows have 3 symbols (the threats). A player
+    has a line of four when it has an open window with 4 symbols, so a win is detected without looking at
+    the board. The counts are updated by the boards on every change of a cell.
+    """
+    LENGTH = 4
+
+    def __init__(self, geometry):
+        self.windows = geometry.windows
+        self.cell_windows = geometry.cell_windows
+        self.counts = {player: [0] * len(self.windows) for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # open_windows[player][k] - the number of windows with k symbols of the player and none of the opponent
+        self.open_windows = {player: [0] * (self.LENGTH + 1) for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # The indexes of the open windows with 3 symbols of each player
+        self.threat_windows = {player: set() for player in (Symbol.X.value, Symbol.Zero.value)}
+
+    def copy(self):
+        line_windows = LineWindows.__new__(LineWindows)
+        line_windows.windows = self.windows
+        line_windows.cell_windows = self.cell_windows
+        line_windows.counts = {player: counts[:] for (player, counts) in self.counts.items()}
+        line_windows.open_windows = {player: counts[:] for (player, counts) in self.open_windows.items()}
+        line_windows.threat_windows = {player: set(windows) for (player, windows) in self.threat_windows.items()}
+        return line_windows
+
+    def update(self, cell_index, old_value, value):
+        """
+        Updates the windows of cell_index after its symbol changed from old_value to value
+        """
+        x, zero = X_VALUE, ZERO_VALUE
+        threat_count = self.LENGTH - 1
+        x_counts, zero_counts = self.counts[x], self.counts[zero]
+        x_open, zero_open = self.open_windows[x], self.open_windows[zero]
+        x_threats, zero_threats = self.threat_windows[x], self.threat_windows[zero]
+        x_change = (value == x) - (old_value == x)
+        zero_change = (value == zero) - (old_value == zero)
+
+        for window_index in self.cell_windows[cell_index]:
+            # Remove the window from the open windows, update the counts and add it back
+            x_count, zero_count = x_counts[window_index], zero_counts[window_index]
+            if zero_count == 0:
+                x_open[x_count] -= 1
+                if x_count == threat_count:
+                    x_threats.discard(window_index)
+            if x_count == 0:
+                zero_open[zero_count] -= 1
+                if zero_count == threat_count:
+                    zero_threats.discard(window_index)
+
+            x_count += x_change
+            zero_count += zero_change
+
+            if zero_count == 0:
+                x_open[x_count] += 1
+                if x_count == threat_count:
+                    x_threats.add(window_index)
+            if x_count == 0:
+                zero_open[zero_count] += 1
+                if zero_count == threat_count:
+                    zero_threats.add(window_index)
+            x_counts[window_index], zero_counts[window_index] = x_count, zero_count
+
+    def get_winner(self):
+        """
+        :return: The player that has a line of four or False
+        """
+        if self.open_windows[Symbol.X.value][self.LENGTH]:
+            return Symbol.X.value
+        if self.open_windows[Symbol.Zero.value][self.LENGTH]:
+            return Symbol.Zero.value
+        return False
+
+    def is_line(self, cell_index, player):
+        """
+        Check if cell_index is part of a line of four symbols of the player
+        """
+        if player not in self.counts:
+            return False
+        counts = self.counts[player]
+        return any(counts[window_index] == self.LENGTH for window_index in self.cell_windows[cell_index])
+
+    def get_threat_cells(self, board, player):
+        """
+        :return: List of the empty cells that complete an open window with 3 symbols of the player
+        """
+        threat_cells = []
+        for window_index in self.threat_windows[player]:
+            for cell_index in self.windows[window_index]:
+                if board.get_cell(cell_index) == Symbol.Nothing.value and cell_index not in threat_cells:
+                    threat_cells.append(cell_index)
+        return threat_cells
+
+    def get_move_threat(self, move):
+        """
+        :return: 2 if the move completes a line of its player, 1 if it blocks an open window with 3 symbols
+            of the opponent, 0 otherwise
+        """
+        from_cell, to_cell = move.from_cell, move.to_cell
+        own_counts = self.counts[move.player]
+        opponent_counts = self.counts[get_opposite_player(move.player)]
+        from_windows = self.cell_windows[from_cell] if from_cell is not None else ()
+
+        threat = 0
+        for window_index in self.cell_windows[to_cell]:
+            # The symbol is moved inside the same window, its count doesn't change
+            if window_index in from_windows:
+                continue
+            if own_counts[window_index] == self.LENGTH - 1 and opponent_counts[window_index] == 0:
+                return 2
+            if opponent_counts[window_index] == self.LENGTH - 1 and own_counts[window_index] == 0:
+                threat = 1
+        return threat
+
+
+class BaseBoard:
+    """
+    Methods shared by the board backends (Board and BitBoard)
+
+    They are written on top of the methods of the backends: get_cell, set_cell, is_impossible_placement
+    and the generators of the placements and of the moves of the symbols (slides).
+
+    Every board keeps the number of slides of each player (slide_counts) up to date and knows its number
+    of placements (get_placements_counts), which are used by the Evaluation.
+
+    Every board has a BoardGeometry (its size) and knows its frontier: the empty cells next to (in the 8
+    directions) a symbol. The searches place only on the frontier of the large boards, so they don't
+    scan the empty part of the board (see generate_frontier_placements).
+    """
+
+    def get_hash(self, player):
+        return Zobrist.side_hash(self.zobrist_hash, player)
+
+    def update_hashes(self, cell_index, old_value, value):
+        """
+        Updates the Zobrist hashes of the board and of its symmetric positions when a cell changes
+        """
+        flat_index = cell_index[0] * self.geometry.no_columns + cell_index[1]
+        symmetry_keys = self.geometry.symmetry_keys
+        self.symmetry_hashes = [symmetry_hash ^ old_key ^ new_key for (symmetry_hash, old_key, new_key) in zip(
+            self.symmetry_hashes, symmetry_keys[old_value][flat_index], symmetry_keys[value][flat_index])]
+        self.zobrist_hash = self.symmetry_hashes[0]
+
+    def get_canonical_hash(self, player):
+        """
+        The canonical form of a position is the symmetric position with the smallest hash, so all the
+        symmetric positions share one key (used by the transposition tables and the opening books)
+
+        :return: Tuple (hash of the canonical form with the player to move, the symmetry that maps this
+            board to its canonical form); the moves are mapped with geometry.transform_move
+        """
+        canonical_hash = min(self.symmetry_hashes)
+        return Zobrist.side_hash(canonical_hash, player), self.symmetry_hashes.index(canonical_hash)
+
+    def get_transformed(self, symmetry):
+        """
+        :param symmetry: The index of the symmetry in geometry.symmetries
+        :return: A new board with the position mapped by the symmetry
+        """
+        cells_map = self.geometry.symmetry_cells[symmetry]
+        board = self.__class__(no_rows=self.geometry.no_rows, no_columns=self.geometry.no_columns)
+        for cell_index in self.geometry.cells:
+            value = self.get_cell(cell_index)
+            if value != NOTHING_VALUE:
+                board.set_cell(cells_map[cell_index], value)
+        board.impossible_player = self.impossible_player
+        return board
+
+    def get_canonical(self):
+        """
+        :return: Tuple (the canonical form of the position as a new board, the symmetry that maps this board to it)
+        """
+        canonical_hash, symmetry = self.get_canonical_hash(None)
+        return self.get_transformed(symmetry), symmetry
+
+    def get_size(self):
+        return self.geometry.no_rows, self.geometry.no_columns
+
+    def is_impossible_move(self, cell_index):
+        return self.is_impossible_placement(cell_index, self.impossible_player)
+
+    def refresh_impossible_moves(self, player):
+        """
+        Selects the player whose impossible moves are returned by get_impossible_moves_matrix;
+        the data used by the placement rule is kept up to date by set_cell
+
+        :param player: The value of the player to move: Symbol.Zero.value, Symbol.X.value or None
+        """
+        self.impossible_player = player
+
+    def is_final(self, cell_index):
+        """
+        Check if the symbol from cell_index is part of a line of at least four identical symbols
+        """
+        return self.line_windows.is_line(cell_index, self.get_cell(cell_index))
+
+    def is_board_final(self):
+        return self.line_windows.get_winner()
+
+    def is_legal_move(self, move: Move):
+        """
+        Check if the move can be played on this board (used for the moves that don't come from the
+        move generators, like the moves stored in the transposition table or read from files); the cells
+        outside the board are checked first, the bitboards would map them onto the guard column or the next row
+        """
+        geometry = self.geometry
+        if move.player not in (X_VALUE, ZERO_VALUE) or not geometry.is_inside(move.to_cell) or (
+                move.from_cell is not None and not geometry.is_inside(move.from_cell)):
+            return False
+        if self.get_cell(move.to_cell) != Symbol.Nothing.value:
+            return False
+        if move.from_cell is None:
+            return not self.is_impossible_placement(move.to_cell, move.player)
+        return self.get_cell(move.from_cell) == move.player and (
+                max(abs(move.from_cell[0] - move.to_cell[0]), abs(move.from_cell[1] - move.to_cell[1])) == 1)
+
+    def get_moves_to(self, cell_index, player):
+        """
+        :return: List of the moves of the player that end on cell_index (the placement and the slides)
+        """
+        moves_list = []
+        if self.get_cell(cell_index) != Symbol.Nothing.value:
+            return moves_list
+
+        if not self.is_impossible_placement(cell_index, player):
+            moves_list.append(Move(player, None, cell_index))
+
+        for neighbor_index in self.geometry.neighbors[cell_index]:
+            if self.get_cell(neighbor_index) == player:
+                moves_list.append(Move(player, neighbor_index, cell_index))
+
+        return moves_list
+
+    def generate_moves(self, player):
+        """
+        Generates the moves of the player lazily: first the placements, then the slides
+        """
+        yield from self.generate_placements(player)
+        yield from self.generate_slides(player)
+
+    def get_possible_moves(self, player):
+        """
+        Create the possible moves for the player - used in the searching algorithms
+        :param player: The value of the player associated with the play: Symbol.Zero.value or Symbol.X.value
+        :return: List of Move objects, one for every placement and every move of the player
+        """
+        return list(self.generate_moves(player))
+
+    def get_possible_boards(self, player):
+        """
+        :return: List of boards, one for every placement and every move of the player
+        """
+        boards_list = []
+        for move in self.generate_moves(player):
+            board = self.copy()
+            board.make(move)
+            boards_list.append(board)
+        return boards_list
+
+    def make(self, move: Move):
+        """
+        Plays the move on this board
+        """
+        if move.from_cell is not None:
+            self.set_cell(move.from_cell, Symbol.Nothing.value)
+        self.set_cell(move.to_cell, move.player)
+
+    def unmake(self, move: Move):
+        """
+        Takes back the move, which must be the last move played on this board
+        """
+        self.set_cell(move.to_cell, Symbol.Nothing.value)
+        if move.from_cell is not None:
+            self.set_cell(move.from_cell, move.player)
+
+
+class Board(BaseBoard):
+    """
+    Board backend that keeps the position in a NumPy matrix
+
+    Both board backends (Board and BitBoard) expose the same methods, so the Game and the
+    searching algorithms can work with any of them. Besides the symbols, a board keeps the data
+    needed by the placement rule for both players (the number of orthogonal neighbors of each player
+    and the impossible moves), the cells of each player and the frontier. Changing a cell only updates
+    the data of the cell and of its neighbors.
+    """
+
+    def __init__(self, game_matrix=None, no_rows=NO_ROWS, no_columns=NO_COLUMNS):
+        if game_matrix is not None:
+            no_rows, no_columns = game_matrix.shape
+        self.geometry = BoardGeometry.get(no_rows, no_columns)
+
+        self.game_matrix = np.zeros([no_rows, no_columns], dtype=int)
+
+        # Zobrist hash of the symbols and the hashes of the symmetric positions (see update_hashes)
+        self.zobrist_hash = 0
+        self.symmetry_hashes = [0] * len(self.geometry.symmetries)
+
+        # Number of orthogonal neighbors of each player, for every cell
+        self.neighbors_matrices = {player: np.zeros([no_rows, no_columns], dtype=int)
+                                   for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # Impossible moves of each player and their number
+        self.impossible_moves_matrices = {player: np.zeros([no_rows, no_columns], dtype=int)
+                                          for player in (Symbol.X.value, Symbol.Zero.value)}
+        self.impossible_counts = {player: 0 for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # Number of moves of the symbols of each player on an empty neighbor
+        self.slide_counts = {player: 0 for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # The cells of each player and the cells next to a symbol (their number of neighbor symbols is near_counts)
+        self.player_cells = {player: set() for player in (Symbol.X.value, Symbol.Zero.value)}
+        self.near_cells = set()
+        self.near_counts = [0] * (no_rows * no_columns)
+
+        # Symbols of each player on the windows of 4 cells
+        self.line_windows = LineWindows(self.geometry)
+
+        # The player whose impossible moves are returned by get_impossible_moves_matrix
+        self.impossible_player = None
+
+        if game_matrix is not None:
+            for cell_index in self.geometry.cells:
+                self.set_cell(cell_index, int(game_matrix[cell_index]))
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.game_matrix = self.game_matrix.copy()
+        board.zobrist_hash = self.zobrist_hash
+        board.symmetry_hashes = self.symmetry_hashes
+        board.neighbors_matrices = {player: matrix.copy() for (player, matrix) in self.neighbors_matrices.items()}
+        board.impossible_moves_matrices = {player: matrix.copy()
+                                           for (player, matrix) in self.impossible_moves_matrices.items()}
+        board.impossible_counts = dict(self.impossible_counts)
+        board.slide_counts = dict(self.slide_counts)
+        board.player_cells = {player: set(cells) for (player, cells) in self.player_cells.items()}
+        board.near_cells = set(self.near_cells)
+        board.near_counts = self.near_counts[:]
+        board.impossible_player = self.impossible_player
+        board.line_windows = self.line_windows.copy()
+        return board
+
+    def get_game_matrix(self):
+        return self.game_matrix
+
+    def get_impossible_moves_matrix(self):
+        if self.impossible_player in self.impossible_moves_matrices:
+            return self.impossible_moves_matrices[self.impossible_player]
+        return np.zeros(self.get_size(), dtype=int)
+
+    def get_cell(self, cell_index):
+        return int(self.game_matrix[cell_index[0], cell_index[1]])
+
+    def set_cell(self, cell_index, value):
+        """
+        Changes the symbol of a cell and updates the data kept for the cell and for its neighbors
+        """
+        old_value = self.get_cell(cell_index)
+        if old_value == value:
+            return
+
+        self.update_hashes(cell_index, old_value, value)
+        self.game_matrix[cell_index[0], cell_index[1]] = value
+        self.line_windows.update(cell_index, old_value, value)
+
+        if old_value in self.player_cells:
+            self.player_cells[old_value].discard(cell_index)
+        if value in self.player_cells:
+            self.player_cells[value].add(cell_index)
+
+        if old_value == Symbol.Nothing.value:
+            self.update_near_counts(cell_index, 1)
+        elif value == Symbol.Nothing.value:
+            self.update_near_counts(cell_index, -1)
+        self.update_slide_counts(cell_index, old_value, value)
+
+        for neighbor_index in self.geometry.orthogonal_neighbors[cell_index]:
+            if old_value in self.neighbors_matrices:
+                self.neighbors_matrices[old_value][neighbor_index] -= 1
+            if value in self.neighbors_matrices:
+                self.neighbors_matrices[value][neighbor_index] += 1
+            self.update_impossible_moves(neighbor_index)
+
+        self.update_impossible_moves(cell_index)
+
+    def update_near_counts(self, cell_index, change):
+        """
+        Updates the number of symbols around the neighbors of cell_index after a symbol was put on
+        the cell (change 1) or removed from it (change -1)
+        """
+        near_counts = self.near_counts
+        for (flat_index, neighbor_index) in self.geometry.flat_neighbors[cell_index]:
+            near_counts[flat_index] += change
+            if change > 0 and near_counts[flat_index] == 1:
+                self.near_cells.add(neighbor_index)
+            elif change < 0 and near_counts[flat_index] == 0:
+                self.near_cells.discard(neighbor_index)
+
+    def is_impossible_placement(self, cell_index, player):
+        if player not in self.impossible_moves_matrices:
+            return False
+        return self.impossible_moves_matrices[player][cell_index[0], cell_index[1]] == Symbol.Impossible.value
+
+    def update_impossible_moves(self, cell_index):
+        """
+        Recomputes the impossible moves of both players on cell_index:
+        a player can't put a symbol on an empty cell that has more orthogonal neighbors of the opponent
+        """
+        is_empty = self.game_matrix[cell_index] == Symbol.Nothing.value
+        x_symbol_counter = self.neighbors_matrices[Symbol.X.value][cell_index]
+        zero_symbol_counter = self.neighbors_matrices[Symbol.Zero.value][cell_index]
+
+        for (player, is_impossible) in ((Symbol.X.value, is_empty and x_symbol_counter < zero_symbol_counter),
+                                        (Symbol.Zero.value, is_empty and zero_symbol_counter < x_symbol_counter)):
+            impossible_value = Symbol.Impossible.value if is_impossible else Symbol.Nothing.value
+            if self.impossible_moves_matrices[player][cell_index] != impossible_value:
+                self.impossible_moves_matrices[player][cell_index] = impossible_value
+                self.impossible_counts[player] += 1 if is_impossible else -1
+
+    def update_slide_counts(self, cell_index, old_value, value):
+        """
+        Updates the slide counts after the symbol of cell_index changed from old_value to value:
+        the moves of the symbol of the cell and the moves of its neighbors to the cell
+        """
+        game_matrix = self.game_matrix
+        neighbor_values = [int(game_matrix[neighbor_index]) for neighbor_index in self.geometry.neighbors[cell_index]]
+        empty_neighbors = neighbor_values.count(NOTHING_VALUE)
+
+        if old_value in self.slide_counts:
+            self.slide_counts[old_value] -= empty_neighbors
+        if value in self.slide_counts:
+            self.slide_counts[value] += empty_neighbors
+
+        if (old_value == NOTHING_VALUE) != (value == NOTHING_VALUE):
+            change = 1 if value == NOTHING_VALUE else -1
+            for neighbor_value in neighbor_values:
+                if neighbor_value in self.slide_counts:
+                    self.slide_counts[neighbor_value] += change
+
+    def get_placements_counts(self):
+        """
+        :return: Dictionary player -> the number of cells where the player can put a symbol
+        """
+        empty_count = len(self.geometry.cells) - sum(len(cells) for cells in self.player_cells.values())
+        return {player: empty_count - impossible_count for (player, impossible_count) in self.impossible_counts.items()}
+
+    def is_move_available(self, player):
+        """
+        Check if any moves are available for the player
+        """
+        game_matrix = self.game_matrix
+        symbols_count = sum(len(cells) for cells in self.player_cells.values())
+        empty_near_cells = [cell_index for cell_index in self.near_cells
+                            if game_matrix[cell_index] == Symbol.Nothing.value]
+
+        # An empty cell away from the frontier doesn't have neighbors, so a symbol can be put there
+        if len(empty_near_cells) < len(self.geometry.cells) - symbols_count:
+            return True
+
+        # Look for a valid cell to put a symbol, then for a move of a symbol on an empty neighbor
+        if any(not self.is_impossible_placement(cell_index, player) for cell_index in empty_near_cells):
+            return True
+
+        return any(game_matrix[neighbor_index] == Symbol.Nothing.value
+                   for cell_index in self.player_cells[player]
+                   for neighbor_index in self.geometry.neighbors[cell_index])
+
+    def generate_placements(self, player):
+        """
+        Generates the placements of the player
+        """
+        game_matrix = self.game_matrix
+        impossible_moves_matrix = self.impossible_moves_matrices[player]
+        for cell_index in self.geometry.cells:
+            if (game_matrix[cell_index] == Symbol.Nothing.value) and (
+                    impossible_moves_matrix[cell_index] != Symbol.Impossible.value):
+                yield Move(player, None, cell_index)
+
+    def generate_frontier_placements(self, player):
+        """
+        Generates the placements of the player on the frontier (the empty cells of near_cells)
+        """
+        game_matrix = self.game_matrix
+        impossible_moves_matrix = self.impossible_moves_matrices[player]
+        for cell_index in self.near_cells:
+            if (game_matrix[cell_index] == Symbol.Nothing.value) and (
+                    impossible_moves_matrix[cell_index] != Symbol.Impossible.value):
+                yield Move(player, None, cell_index)
+
+    def generate_slides(self, player):
+        """
+        Generates the moves of the symbols of the player on an empty neighbor cell
+        """
+        game_matrix = self.game_matrix
+        for cell_index in self.player_cells[player]:
+            for neighbor_index in self.geometry.neighbors[cell_index]:
+                if game_matrix[neighbor_index] == Symbol.Nothing.value:
+                    yield Move(player, cell_index, neighbor_index)
+
+    def is_empty(self):
+        return not any(self.player_cells.values())
+
+    def get_empty_count(self):
+        return len(self.geometry.cells) - sum(len(cells) for cells in self.player_cells.values())
+
+
+class Zobrist:
+    """
+    Zobrist hashing of the positions
+
+    Every (symbol, cell) pair has a random 64-bit key and the hash of a board is the XOR of the keys of
+    its symbols, so placing, removing or moving a symbol updates the hash with one or two XORs.
+    The player to move is added to the hash with one more key. The keys cover the largest board,
+    the smaller boards use the keys of their cells.
+    """
+    SEED = 2021
+
+    CELL_KEYS = None
+    SIDE_KEY = None
+
+    @classmethod
+    def generate_keys(cls):
+        random_generator = random.Random(cls.SEED)
+        cls.CELL_KEYS = {}
+        for symbol in (Symbol.X.value, Symbol.Zero.value):
+            cls.CELL_KEYS[symbol] = [[random_generator.getrandbits(64) for column_index in range(MAX_COLUMNS)]
+                                     for row_index in range(MAX_ROWS)]
+        cls.SIDE_KEY = random_generator.getrandbits(64)
+
+    @classmethod
+    def key(cls, symbol, cell_index):
+        """
+        :return: The key of the symbol placed on cell_index; an empty cell has the key 0
+        """
+        if symbol in cls.CELL_KEYS:
+            return cls.CELL_KEYS[symbol][cell_index[0]][cell_index[1]]
+        return 0
+
+    @classmethod
+    def side_hash(cls, zobrist_hash, player):
+        """
+        :return: The hash of the board together with the player to move
+        """
+        if player == Symbol.X.value:
+            return zobrist_hash ^ cls.SIDE_KEY
+        return zobrist_hash
+
+
+Zobrist.generate_keys()
+
+
+class BitBoard(BaseBoard):
+    """
+    Board backend that keeps the position as two integer bitboards, one for X and one for Zero
+
+    The cell (row, column) is stored on the bit row * stride + column. Every row has one extra
+    column that is always empty (the guard column), so shifting a bitboard never wraps a symbol
+    from the end of a row to the start of the next one. Placement legality and move targets are
+    computed with shifts and masks over the whole board at once; the lines of four are kept by LineWindows.
+    The masks and the offsets of the size of the board are in its BoardGeometry.
+    """
+
+    def __init__(self, x_bits=0, zero_bits=0, no_rows=NO_ROWS, no_columns=NO_COLUMNS):
+        self.geometry = BoardGeometry.get(no_rows, no_columns)
+        self.x_bits = 0
+        self.zero_bits = 0
+
+        # Number of orthogonal neighbors of each player, for every cell (see increment_count)
+        self.x_neighbor_planes = (0, 0, 0)
+        self.zero_neighbor_planes = (0, 0, 0)
+
+        # Number of moves of the symbols of each player on an empty neighbor
+        self.slide_counts = {player: 0 for player in (Symbol.X.value, Symbol.Zero.value)}
+
+        # The player whose impossible moves are returned by get_impossible_moves_matrix
+        self.impossible_player = None
+
+        # Zobrist hashes of the symbols (see update_hashes) and symbols of each player on the windows of 4 cells
+        self.zobrist_hash = 0
+        self.symmetry_hashes = [0] * len(self.geometry.symmetries)
+        self.line_windows = LineWindows(self.geometry)
+
+        for (player, bits) in ((Symbol.X.value, x_bits), (Symbol.Zero.value, zero_bits)):
+            for bit_index in self.iter_bits(bits):
+                self.set_cell(self.bit_cell(bit_index), player)
+
+    def copy(self):
+        board = BitBoard.__new__(BitBoard)
+        board.geometry = self.geometry
+        board.x_bits = self.x_bits
+        board.zero_bits = self.zero_bits
+        board.x_neighbor_planes = self.x_neighbor_planes
+        board.zero_neighbor_planes = self.zero_neighbor_planes
+        board.slide_counts = dict(self.slide_counts)
+        board.impossible_player = self.impossible_player
+        board.zobrist_hash = self.zobrist_hash
+        board.symmetry_hashes = self.symmetry_hashes
+        board.line_windows = self.line_windows.copy()
+        return board
+
+    # ------ Bit operations ------ #
+    def cell_bit(self, cell_index):
+        return 1 << (cell_index[0] * self.geometry.stride + cell_index[1])
+
+    def bit_cell(self, bit_index):
+        return divmod(bit_index, self.geometry.stride)
+
+    @classmethod
+    def iter_bits(cls, bits):
+        while bits:
+            lowest_bit = bits & -bits
+            yield lowest_bit.bit_length() - 1
+            bits ^= lowest_bit
+
+    @classmethod
+    def increment_count(cls, planes, mask):
+        """
+        Adds 1 to the count of every cell from the mask; the count is kept as 3 bitboards
+        (bit 0, bit 1 and bit 2 of the count of each cell)
+        """
+        bit_0, bit_1, bit_2 = planes
+        carry = bit_0 & mask
+        bit_0 ^= mask
+        bit_2 ^= bit_1 & carry
+        bit_1 ^= carry
+        return bit_0, bit_1, bit_2
+
+    @classmethod
+    def decrement_count(cls, planes, mask):
+        """
+        Subtracts 1 from the count (as kept by increment_count) of every cell from the mask
+        """
+        bit_0, bit_1, bit_2 = planes
+        borrow = ~bit_0 & mask
+        bit_0 ^= mask
+        bit_2 ^= ~bit_1 & borrow
+        bit_1 ^= borrow
+        return bit_0, bit_1, bit_2
+
+    def get_player_bits(self, player):
+        if player == Symbol.X.value:
+            return self.x_bits
+        if player == Symbol.Zero.value:
+            return self.zero_bits
+        return 0
+
+    def get_empty_bits(self):
+        return self.geometry.cells_mask & ~(self.x_bits | self.zero_bits)
+
+    def get_impossible_bits(self, player):
+        """
+        :return: The bitboard of the empty cells where the player has fewer orthogonal
+            neighbors than the opponent
+        """
+        if player == Symbol.X.value:
+            (own_0, own_1, own_2), (opp_0, opp_1, opp_2) = self.x_neighbor_planes, self.zero_neighbor_planes
+        elif player == Symbol.Zero.value:
+            (own_0, own_1, own_2), (opp_0, opp_1, opp_2) = self.zero_neighbor_planes, self.x_neighbor_planes
+        else:
+            return 0
+
+        # Bit-sliced comparison opp > own, from the most significant bit of the count
+        greater = opp_0 & ~own_0
+        greater = (opp_1 & ~own_1) | (~(opp_1 ^ own_1) & greater)
+        greater = (opp_2 & ~own_2) | (~(opp_2 ^ own_2) & greater)
+
+        return greater & self.get_empty_bits()
+
+    # ------ Board API ------ #
+    def get_game_matrix(self):
+        game_matrix = np.zeros(self.get_size(), dtype=int)
+        for bit_index in self.iter_bits(self.x_bits):
+            game_matrix[self.bit_cell(bit_index)] = Symbol.X.value
+        for bit_index in self.iter_bits(self.zero_bits):
+            game_matrix[self.bit_cell(bit_index)] = Symbol.Zero.value
+        return game_matrix
+
+    def get_impossible_moves_matrix(self):
+        impossible_moves_matrix = np.zeros(self.get_size(), dtype=int)
+        for bit_index in self.iter_bits(self.get_impossible_bits(self.impossible_player)):
+            impossible_moves_matrix[self.bit_cell(bit_index)] = Symbol.Impossible.value
+        return impossible_moves_matrix
+
+    def get_cell(self, cell_index):
+        bit = self.cell_bit(cell_index)
+        if self.x_bits & bit:
+            return Symbol.X.value
+        if self.zero_bits & bit:
+            return Symbol.Zero.value
+        return Symbol.Nothing.value
+
+    def set_cell(self, cell_index, value):
+        """
+        Changes the symbol of a cell and updates the neighbor counts of its orthogonal neighbors
+        """
+        geometry = self.geometry
+        bit_index = cell_index[0] * geometry.stride + cell_index[1]
+        bit = 1 << bit_index
+        if self.x_bits & bit:
+            old_value = X_VALUE
+        elif self.zero_bits & bit:
+            old_value = ZERO_VALUE
+        else:
+            old_value = NOTHING_VALUE
+        if old_value == value:
+            return
+
+        self.update_hashes(cell_index, old_value, value)
+        self.line_windows.update(cell_index, old_value, value)
+
+        neighbors_mask = geometry.orthogonal_masks[bit_index]
+
+        # The slides of the symbol of the cell and the slides of its neighbors to the cell
+        x_bits, zero_bits, slide_counts = self.x_bits, self.zero_bits, self.slide_counts
+        all_neighbors_mask = geometry.neighbor_masks[bit_index]
+        empty_neighbors = (all_neighbors_mask & ~(x_bits | zero_bits)).bit_count()
+        if old_value != NOTHING_VALUE:
+            slide_counts[old_value] -= empty_neighbors
+        if value != NOTHING_VALUE:
+            slide_counts[value] += empty_neighbors
+        if old_value == NOTHING_VALUE or value == NOTHING_VALUE:
+            change = 1 if value == NOTHING_VALUE else -1
+            slide_counts[X_VALUE] += change * (all_neighbors_mask & x_bits).bit_count()
+            slide_counts[ZERO_VALUE] += change * (all_neighbors_mask & zero_bits).bit_count()
+
+        if old_value == X_VALUE:
+            self.x_bits ^= bit
+            self.x_neighbor_planes = self.decrement_count(self.x_neighbor_planes, neighbors_mask)
+        elif old_value == ZERO_VALUE:
+            self.zero_bits ^= bit
+            self.zero_neighbor_planes = self.decrement_count(self.zero_neighbor_planes, neighbors_mask)
+
+        if value == X_VALUE:
+            self.x_bits |= bit
+            self.x_neighbor_planes = self.increment_count(self.x_neighbor_planes, neighbors_mask)
+        elif value == ZERO_VALUE:
+            self.zero_bits |= bit
+            self.zero_neighbor_planes = self.increment_count(self.zero_neighbor_planes, neighbors_mask)
+
+    def is_impossible_placement(self, cell_index, player):
+        return bool(self.get_impossible_bits(player) & self.cell_bit(cell_index))
+
+    def get_placements_counts(self):
+        """
+        :return: Dictionary player -> the number of cells where the player can put a symbol; both players are
+            counted at once, with the same bit-sliced comparison as get_impossible_bits
+        """
+        x_0, x_1, x_2 = self.x_neighbor_planes
+        zero_0, zero_1, zero_2 = self.zero_neighbor_planes
+        equal_1, equal_2 = ~(x_1 ^ zero_1), ~(x_2 ^ zero_2)
+
+        x_greater = x_0 & ~zero_0
+        x_greater = (x_1 & ~zero_1) | (equal_1 & x_greater)
+        x_greater = (x_2 & ~zero_2) | (equal_2 & x_greater)
+        zero_greater = zero_0 & ~x_0
+        zero_greater = (zero_1 & ~x_1) | (equal_1 & zero_greater)
+        zero_greater = (zero_2 & ~x_2) | (equal_2 & zero_greater)
+
+        empty_bits = self.geometry.cells_mask & ~(self.x_bits | self.zero_bits)
+        empty_count = empty_bits.bit_count()
+        return {X_VALUE: empty_count - (zero_greater & empty_bits).bit_count(),
+                ZERO_VALUE: empty_count - (x_greater & empty_bits).bit_count()}
+
+    def is_move_available(self, player):
+        player_bits = self.get_player_bits(player)
+        empty_bits = self.get_empty_bits()
+
+        # A valid cell to put a symbol
+        if empty_bits & ~self.get_impossible_bits(player):
+            return True
+
+        # An empty cell next to a symbol of the player
+        for offset in self.geometry.neighbor_shifts:
+            if self.geometry.shift(player_bits, offset) & empty_bits:
+                return True
+
+        return False
+
+    def generate_placements(self, player):
+        """
+        Generates the placements of the player
+        """
+        for bit_index in self.iter_bits(self.get_empty_bits() & ~self.get_impossible_bits(player)):
+            yield Move(player, None, self.bit_cell(bit_index))
+
+    def get_frontier_bits(self):
+        """
+        :return: The bitboard of the empty cells next to a symbol; it's computed with 8 shifts of all the
+            symbols (a few operations on the words of the integers), which is cheaper than keeping it up to
+            date on every change of a cell
+        """
+        symbol_bits = self.x_bits | self.zero_bits
+        near_bits = 0
+        for offset in self.geometry.neighbor_shifts:
+            near_bits |= self.geometry.shift(symbol_bits, offset)
+        return near_bits & self.get_empty_bits()
+
+    def generate_frontier_placements(self, player):
+        """
+        Generates the placements of the player on the frontier
+        """
+        for bit_index in self.iter_bits(self.get_frontier_bits() & ~self.get_impossible_bits(player)):
+            yield Move(player, None, self.bit_cell(bit_index))
+
+    def generate_slides(self, player):
+        """
+        Generates the moves of the symbols of the player: every empty cell reached by shifting
+        the player's symbols towards a neighbor
+        """
+        player_bits = self.get_player_bits(player)
+        empty_bits = self.get_empty_bits()
+        geometry = self.geometry
+        for offset in geometry.neighbor_shifts:
+            for bit_index in self.iter_bits(geometry.shift(player_bits, offset) & empty_bits):
+                yield Move(player, self.bit_cell(bit_index - offset), self.bit_cell(bit_index))
+
+    def is_empty(self):
+        return not (self.x_bits | self.zero_bits)
+
+    def get_empty_count(self):
+        return self.get_empty_bits().bit_count()
+
+
+class Evaluation:
+    """
+    Score of the positions that aren't final, from the point of view of P_MAX (Zero minus X)
+
+    The features of a position are kept up to date by the boards on every move, so a leaf is scored
+    with a few lookups:
+        open_3   - open windows with 3 symbols of the player (threats), see LineWindows
+        open_2   - open windows with 2 symbols of the player
+        mobility - empty cells where the player can put a symbol (the neighbor rule)
+        slides   - moves of the symbols of the player on an empty neighbor
+    The score is the weighted sum of the features; the weights can be changed with the weights parameter.
+    Every score stays below WIN_SCORE, the score of a won position.
+    """
+    WIN_SCORE = 1000000
+    DEFAULT_WEIGHTS = {'open_3': 32, 'open_2': 8, 'mobility': 1, 'slides': 1}
+
+    def __init__(self, weights=None):
+        """
+        :param weights: Dictionary feature -> weight (int), the features without a weight use DEFAULT_WEIGHTS
+        """
+        self.weights = dict(self.DEFAULT_WEIGHTS)
+        if weights:
+            unknown_features = set(weights) - set(self.DEFAULT_WEIGHTS)
+            if unknown_features:
+                raise ValueError(f"Unknown features of the evaluation: {sorted(unknown_features)}")
+            self.weights.update(weights)
+
+        self.open_3_weight = self.weights['open_3']
+        self.open_2_weight = self.weights['open_2']
+        self.mobility_weight = self.weights['mobility']
+        self.slides_weight = self.weights['slides']
+
+    def evaluate(self, board):
+        zero_open = board.line_windows.open_windows[ZERO_VALUE]
+        x_open = board.line_windows.open_windows[X_VALUE]
+        score = (self.open_3_weight * (zero_open[LineWindows.LENGTH - 1] - x_open[LineWindows.LENGTH - 1])
+                 + self.open_2_weight * (zero_open[LineWindows.LENGTH - 2] - x_open[LineWindows.LENGTH - 2]))
+
+        if self.mobility_weight:
+            placements_counts = board.get_placements_counts()
+            score += self.mobility_weight * (placements_counts[ZERO_VALUE] - placements_counts[X_VALUE])
+        if self.slides_weight:
+            score += self.slides_weight * (board.slide_counts[ZERO_VALUE] - board.slide_counts[X_VALUE])
+
+        return max(-self.WIN_SCORE + 1, min(self.WIN_SCORE - 1, score))
+
+    def get_features(self, board):
+        """
+        :return: Dictionary feature -> (value for Zero, value for X), used to inspect and to tune the weights
+        """
+        open_windows = board.line_windows.open_windows
+        placements_counts = board.get_placements_counts()
+        return {
+            'open_3': (open_windows[ZERO_VALUE][LineWindows.LENGTH - 1], open_windows[X_VALUE][LineWindows.LENGTH - 1]),
+            'open_2': (open_windows[ZERO_VALUE][LineWindows.LENGTH - 2], open_windows[X_VALUE][LineWindows.LENGTH - 2]),
+            'mobility': (placements_counts[ZERO_VALUE], placements_counts[X_VALUE]),
+            'slides': (board.slide_counts[ZERO_VALUE], board.slide_counts[X_VALUE]),
+        }
+
+
+DEFAULT_EVALUATION = Evaluation()
+
+
+class State:
+    """
+    Class used for searching algorithms min-max and alpha-beta;
+    - A state represents the node from a tree -
+
+    This class requires the two players P_MAX, P_MIN of this module
+    and the board (Board or BitBoard) has
+        - a method generate_moves(player) that generates the possible moves
+
+    A state doesn't keep its parent or its children: after min_max only the states of the principal
+    variation are kept (chosen_state), so the memory doesn't grow with the size of the tree.
+    """
+    __slots__ = ('board', 'current_player', 'depth', 'estimation', 'move', 'chosen_state')
+
+    def __init__(self, board, current_player: int, depth, estimation=None, move=None):
+        self.board = board
+        self.current_player = current_player
+        self.depth = depth
+        self.estimation = estimation
+        self.move = move  # The move that produced this state (None for the root and for a skipped turn)
+        self.chosen_state = None  # Best move computed
+
+    def __str__(self):
+        return f"The player {self.current_player} has the board \n{self.board.get_game_matrix()}\n Current Depth is: {self.depth}\nHas the estimation value: {self.estimation}\nIs a chosen state?: {self.chosen_state}\n"
+
+    def generate_possible_states(self):
+        """
+        Generates the possible states (nodes) of the current player lazily, one for each move
+        """
+        opposite_player = get_opposite_player(self.current_player)
+        for move in self.board.generate_moves(self.current_player):
+            board = self.board.copy()
+            board.make(move)
+            yield State(board, opposite_player, self.depth - 1, move=move)
+
+    def get_possible_states(self):
+        """
+        :return: List of possible states (nodes) of the current player on the subtree
+        """
+        # If possible, go deeper into the tree and continue the algorithm
+        possible_states_list = list(self.generate_possible_states())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Possible states of the player %s:", self.current_player)
+            for state in possible_states_list:
+                logger.debug("%s", state)
+
+        return possible_states_list
+
+    def estimate_score(self, depth):
+        t_final = self.board.is_board_final()
+        if t_final == Symbol.Zero.value:
+            return Evaluation.WIN_SCORE + depth
+        elif t_final == Symbol.X.value:
+            return -Evaluation.WIN_SCORE - depth
+        else:
+            return DEFAULT_EVALUATION.evaluate(self.board)
+
+
+def min_max_line(board, player, depth):
+    """
+    Min-max on one board: the moves are played and taken back, so only the current line is in memory
+
+    :return: Tuple (score, principal variation), where the principal variation is the list of the best
+        moves (None for a skipped turn)
+    """
+    winner = board.is_board_final()
+    if depth == 0 or winner:
+        if winner == ZERO_VALUE:
+            return Evaluation.WIN_SCORE + depth, []
+        if winner == X_VALUE:
+            return -Evaluation.WIN_SCORE - depth, []
+        return DEFAULT_EVALUATION.evaluate(board), []
+
+    opposite_player = get_opposite_player(player)
+    best_score, best_line = None, []
+    for move in board.get_possible_moves(player):
+        board.make(move)
+        score, line = min_max_line(board, opposite_player, depth - 1)
+        board.unmake(move)
+        if best_score is None or (score > best_score if player == P_MAX else score < best_score):
+            best_score, best_line = score, [move] + line
+
+    # The player doesn't have any moves and skips the turn; if the opponent can't move either it's a draw
+    if best_score is None:
+        if not board.is_move_available(opposite_player):
+            return 0, []
+        score, line = min_max_line(board, opposite_player, depth - 1)
+        return score, [None] + line
+
+    return best_score, best_line
+
+
+def min_max(state: State):
+    """
+    Sets the estimation of the state and its chosen_state, the state after the best move; the chosen states
+    form the principal variation (the boards of its states are copies, the board of the state isn't changed)
+
+    :return: The state
+    """
+    logger.debug("min_max on state: %s", state)
+    state.estimation, line = min_max_line(state.board.copy(), state.current_player, state.depth)
+
+    parent = state
+    for move in line:
+        board = parent.board.copy()
+        if move is not None:
+            board.make(move)
+        parent.chosen_state = State(board, get_opposite_player(parent.current_player), parent.depth - 1,
+                                    estimation=state.estimation, move=move)
+        parent = parent.chosen_state
+    return state
+
+
+class PositionHistory:
+    """
+    The positions of a game (Zobrist hashes with the player to move, see BaseBoard.get_hash) as a stack,
+    with the number of times each position was reached
+
+    The symbols can slide back and forth, so a game can repeat its positions forever: it ends in a draw when a
+    position is reached max_repetitions times or after max_plies plies (the skipped turns included); a rule
+    is off if its limit is None. The searches get the history of the game and score the repeated positions as draws.
+    """
+    DEFAULT_REPETITIONS = 3
+
+    def __init__(self, max_repetitions=DEFAULT_REPETITIONS, max_plies=None):
+        self.max_repetitions = max_repetitions
+        self.max_plies = max_plies
+        self.keys = []
+        self.counts = {}
+
+    def copy(self):
+        history = PositionHistory(self.max_repetitions, self.max_plies)
+        history.keys = self.keys[:]
+        history.counts = dict(self.counts)
+        return history
+
+    def push(self, key):
+        self.keys.append(key)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def pop(self):
+        key = self.keys.pop()
+        if self.counts[key] == 1:
+            del self.counts[key]
+        else:
+            self.counts[key] -= 1
+        return key
+
+    def count(self, key):
+        return self.counts.get(key, 0)
+
+    def get_plies(self):
+        """
+        :return: The number of plies played since the first position
+        """
+        return max(0, len(self.keys) - 1)
+
+    def is_repetition(self):
+        return (self.max_repetitions is not None and bool(self.keys) and
+                self.counts[self.keys[-1]] >= self.max_repetitions)
+
+    def is_move_limit(self):
+        return self.max_plies is not None and self.get_plies() >= self.max_plies
+
+    def is_draw(self):
+        """
+        :return: True if the game ends in a draw by one of the rules
+        """
+        return self.is_repetition() or self.is_move_limit()
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1  # The score is a lower bound (the search failed high)
+    UPPER = 2  # The score is an upper bound (the search failed low)
+
+
+TTEntry = namedtuple('TTEntry', ['key', 'depth', 'bound', 'score', 'move', 'generation'])
+
+
+class TranspositionTable:
+    """
+    Table of the already searched positions, keyed by the Zobrist hash of the board and the player to move
+    (AlphaBeta uses the hash of the canonical form, so the symmetric positions share their entry)
+
+    The table has a fixed number of buckets, computed from the memory cap. Every bucket has two slots:
+        - a depth-preferred slot, replaced only by deeper searches or by the entries of a newer search
+        - an always-replace slot, which takes every entry that didn't get the depth-preferred slot
+    """
+    ENTRY_BYTES = 256  # Estimated memory of one entry (the tuple, the key and the move)
+
+    def __init__(self, memory_mb=64):
+        self.bucket_count = max(1, (memory_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.depth_slots = [None] * self.bucket_count
+        self.always_slots = [None] * self.bucket_count
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def new_search(self):
+        """
+        Marks the entries stored until now as old, so they are replaced first
+        """
+        self.generation += 1
+
+    def clear(self):
+        self.depth_slots = [None] * self.bucket_count
+        self.always_slots = [None] * self.bucket_count
+
+    def probe(self, key):
+        """
+        :return: The TTEntry of the key or None
+        """
+        bucket_index = key % self.bucket_count
+        for entry in (self.depth_slots[bucket_index], self.always_slots[bucket_index]):
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        bucket_index = key % self.bucket_count
+        new_entry = TTEntry(key, depth, bound, score, move, self.generation)
+        self.stores += 1
+
+        old_entry = self.depth_slots[bucket_index]
+        if old_entry is None or old_entry.key == key or old_entry.generation != self.generation or (
+                depth >= old_entry.depth):
+            self.depth_slots[bucket_index] = new_entry
+
+            # The replaced entry of another position is kept in the always-replace slot
+            if old_entry is None or old_entry.key == key:
+                return
+            new_entry = old_entry
+
+        if self.always_slots[bucket_index] is not None and self.always_slots[bucket_index].key != new_entry.key:
+            self.evictions += 1
+        self.always_slots[bucket_index] = new_entry
+
+    def get_stats(self):
+        probes = self.hits + self.misses
+        used_slots = (sum(entry is not None for entry in self.depth_slots) +
+                      sum(entry is not None for entry in self.always_slots))
+        return {
+            'capacity': 2 * self.bucket_count,
+            'used': used_slots,
+            'probes': probes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBeta:
+    """
+    Alpha-beta search with iterative deepening
+
+    The scores are computed from the point of view of P_MAX (Zero): positive values are good for
+    Zero, negative values are good for X. The results of the nodes are kept in a transposition table,
+    shared by all the searches of this object. The moves of every node are generated in stages,
+    see generate_moves. The leaves that aren't final are scored by an Evaluation. With a batch_evaluation
+    (a batch.BatchEvaluation with the same weights), the children of the nodes of depth 1 are scored together
+    in one vectorized batch instead of one by one (see evaluate_batch); it scores more leaves per second, but
+    all the children of the node, so it's faster only where the search doesn't cut off (like the wide
+    searches of depth 1). With a tablebase (a tablebase.Tablebase), the endgame positions are scored by the
+    tablebase instead of being searched (the nodes with children in the tablebase aren't scored by the batch),
+    and a root in the tablebase is answered with its perfect move. With a book (a book.Book), the positions of
+    the book are answered with one of its moves, without a search.
+
+    The counters of the last search are returned by get_stats; hooks (a SearchHooks) are called after
+    every iteration and at the end of the search, and profile=True runs a SamplingProfiler during the searches.
+    """
+    WIN_SCORE = Evaluation.WIN_SCORE
+    MAX_DEPTH = 64
+    KILLER_SLOTS = 2
+    TIME_CHECK_NODES = 1024  # How often (in nodes) the deadline and the stop requests are checked
+
+    # Boards with more cells are searched with the placements on the frontier only (see generate_moves)
+    FRONTIER_AREA = 64
+
+    def __init__(self, transposition_table=None, hooks=None, profile=False, evaluation=None, batch_evaluation=None,
+                 tablebase=None, book=None):
+        if transposition_table is not None:
+            self.transposition_table = transposition_table
+        else:
+            self.transposition_table = TranspositionTable()
+        self.evaluation = evaluation if evaluation is not None else DEFAULT_EVALUATION
+        self.batch_evaluation = batch_evaluation
+        self.tablebase = tablebase
+        self.book = book
+
+        self.killer_moves = [[] for ply in range(self.MAX_DEPTH)]
+        self.history_scores = {}
+        self.principal_variation = []
+        self.nodes = 0
+        self.deadline = None
+        self.max_depth = self.MAX_DEPTH - 1
+        self.max_nodes = None
+        self.next_check = 0  # The number of nodes of the next check of the budget (see check_budget)
+        self.stop_requested = False
+        self.iteration_depth = 0
+        self.root_best = None  # The best (score, line) of the root found so far by the current iteration
+        self.root_moves = None  # If set, only these moves are searched at the root
+        self.history = PositionHistory()  # The positions of the game and of the current line (see alpha_beta)
+
+        # Instrumentation
+        self.hooks = hooks
+        self.profile = profile
+        self.profiler = None
+        self.evaluations = 0
+        self.win_checks = 0
+        self.expanded_nodes = 0
+        self.moves_searched = 0
+        self.cutoffs = [0] * self.MAX_DEPTH
+        self.tt_probes_start = 0
+        self.tt_hits_start = 0
+        self.search_start = 0.0
+        self.iteration_times = []
+
+    def evaluate(self, board, winner, depth):
+        """
+        Score of a leaf; the wins found closer to the root (more remaining depth) are preferred.
+        The other leaves are scored by the Evaluation.
+        """
+        self.evaluations += 1
+        if winner == ZERO_VALUE:
+            return self.WIN_SCORE + depth
+        if winner == X_VALUE:
+            return -self.WIN_SCORE - depth
+
+        return self.evaluation.evaluate(board)
+
+    def order_moves(self, moves_list, ply):
+        """
+        Sorts the moves: the killer moves of the ply (moves that produced a cutoff in a sibling node) first,
+        then the rest of the moves by their history score (cutoffs produced anywhere in the tree)
+        """
+        killers = self.killer_moves[ply]
+
+        def move_priority(move):
+            if move in killers:
+                return 0, killers.index(move)
+            return 1, -self.history_scores.get(move, 0)
+
+        return sorted(moves_list, key=move_priority)
+
+    def generate_moves(self, board, player, ply, pv_move, hash_move):
+        """
+        Generates the moves of the node in stages; a stage is computed only if the search asks for
+        more moves after a stage ended (there was no cutoff):
+            1. the move of the principal variation found by the previous iteration and the best move
+               stored in the transposition table
+            2. the moves that complete a line, then the moves that block a line of the opponent
+            3. the placements, ordered by order_moves
+            4. the slides, ordered by order_moves
+
+        On the boards larger than FRONTIER_AREA only the placements next to a symbol are searched (the
+        empty board is searched with the center); the other placements are generated only if the player
+        doesn't have any other move.
+        """
+        tried_moves = set()
+
+        for move in (pv_move, hash_move):
+            if move is not None and move.player == player and move not in tried_moves and board.is_legal_move(move):
+                tried_moves.add(move)
+                yield move
+
+        line_windows = board.line_windows
+        threat_moves = []
+        for cell_index in line_windows.get_threat_cells(board, player) + line_windows.get_threat_cells(
+                board, get_opposite_player(player)):
+            for move in board.get_moves_to(cell_index, player):
+                threat = line_windows.get_move_threat(move)
+                if threat and move not in tried_moves:
+                    tried_moves.add(move)
+                    threat_moves.append((threat, move))
+        threat_moves.sort(key=lambda threat_move: -threat_move[0])
+        for (threat, move) in threat_moves:
+            yield move
+
+        geometry = board.geometry
+        if geometry.no_rows * geometry.no_columns <= self.FRONTIER_AREA:
+            placements_generator = board.generate_placements
+        elif board.is_empty():
+            yield Move(player, None, geometry.get_center())
+            return
+        else:
+            placements_generator = board.generate_frontier_placements
+
+        has_moves = bool(tried_moves)
+        for moves_generator in (placements_generator, board.generate_slides):
+            moves_list = [move for move in moves_generator(player) if move not in tried_moves]
+            has_moves = has_moves or bool(moves_list)
+            yield from self.order_moves(moves_list, ply)
+
+        if not has_moves and placements_generator == board.generate_frontier_placements:
+            yield from board.generate_placements(player)
+
+    def evaluate_batch(self, board, player, moves_list, key, symmetry):
+        """
+        Scores all the children of a node of depth 1 with the batch_evaluation; the children are counted as
+        nodes, like the leaves searched by alpha_beta. All the children are scored, so the result is exact.
+        The first iteration (depth 1 at the root) is never interrupted, so root_best isn't needed.
+
+        :return: Tuple (score, principal variation) of the node
+        """
+        scores, winners = self.batch_evaluation.evaluate_moves(board, moves_list)
+        count = len(moves_list)
+        self.nodes += count
+        self.evaluations += count
+        self.win_checks += count
+        self.moves_searched += count
+        if self.nodes >= self.next_check:
+            self.check_budget()
+
+        best_index = int(scores.argmax() if player == P_MAX else scores.argmin())
+        best_score, best_move = int(scores[best_index]), moves_list[best_index]
+        self.transposition_table.store(key, 1, Bound.EXACT, best_score, board.geometry.transform_move(best_move, symmetry))
+        return best_score, [best_move]
+
+    def store_cutoff(self, move, depth, ply):
+        self.cutoffs[ply] += 1
+        killers = self.killer_moves[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.KILLER_SLOTS:]
+
+        self.history_scores[move] = self.history_scores.get(move, 0) + depth * depth
+
+    def alpha_beta(self, board, player, depth, ply, alpha, beta, on_pv):
+        """
+        :return: Tuple (score, principal variation) of the board, where the principal variation
+            is the list of the best moves from this node
+        """
+        self.nodes += 1
+
+        # The first iteration always completes, so there is a move to return
+        if self.nodes >= self.next_check:
+            self.check_budget()
+
+        self.win_checks += 1
+        winner = board.is_board_final()
+        if winner:
+            return self.evaluate(board, winner, depth), []
+
+        # The endgames are solved: the tablebase has the result of the position with perfect play, also at the
+        # horizon of the search
+        if ply > 0 and self.tablebase is not None and self.tablebase.covers(board):
+            return self.tablebase.get_score(board, player, depth), []
+
+        if depth == 0:
+            return self.evaluate(board, winner, depth), []
+
+        # A position reached again by the line or played before in the game is a draw: the slides back and
+        # forth would only repeat the search of its subtree
+        position_key = board.get_hash(player)
+        if ply > 0 and position_key in self.history.counts:
+            return 0, []
+
+        # Look for the result of an earlier search of the same position or of a symmetric one (the table is
+        # keyed by the canonical form and its moves are mapped to it); the root is always searched
+        key, symmetry = board.get_canonical_hash(player)
+        entry = self.transposition_table.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = board.geometry.inverse_transform_move(entry.move, symmetry)
+            if ply > 0 and entry.depth >= depth:
+                if entry.bound is Bound.EXACT:
+                    return entry.score, [hash_move]
+                if entry.bound is Bound.LOWER:
+                    alpha = max(alpha, entry.score)
+                else:
+                    beta = min(beta, entry.score)
+                if alpha >= beta:
+                    return entry.score, [hash_move]
+
+        alpha_original, beta_original = alpha, beta
+        opposite_player = get_opposite_player(player)
+        pv_move = self.principal_variation[ply] if on_pv and ply < len(self.principal_variation) else None
+        best_score = None
+        best_line = []
+        self.expanded_nodes += 1
+
+        # The children in the tablebase are scored by it (see above), so they aren't scored by the batch
+        if (depth == 1 and self.batch_evaluation is not None and (ply > 0 or self.root_moves is None) and
+                (self.tablebase is None or not self.tablebase.covers_children(board))):
+            moves_list = list(self.generate_moves(board, player, ply, pv_move, hash_move))
+            if moves_list:
+                return self.evaluate_batch(board, player, moves_list, key, symmetry)
+
+        self.history.push(position_key)
+
+        for move in self.generate_moves(board, player, ply, pv_move, hash_move):
+            if ply == 0 and self.root_moves is not None and move not in self.root_moves:
+                continue
+
+            self.moves_searched += 1
+            board.make(move)
+            score, line = self.alpha_beta(board, opposite_player, depth - 1, ply + 1, alpha, beta,
+                                          on_pv and move == pv_move)
+            board.unmake(move)
+
+            if player == P_MAX:
+                if best_score is None or score > best_score:
+                    best_score, best_line = score, [move] + line
+                    if ply == 0:
+                        self.root_best = best_score, best_line
+                alpha = max(alpha, score)
+            else:
+                if best_score is None or score < best_score:
+                    best_score, best_line = score, [move] + line
+                    if ply == 0:
+                        self.root_best = best_score, best_line
+                beta = min(beta, score)
+
+            if alpha >= beta:
+                self.store_cutoff(move, depth, ply)
+                break
+
+        # The player doesn't have any moves and skips the turn; if the opponent can't move either it's a draw
+        if best_score is None:
+            if not board.is_move_available(opposite_player):
+                self.history.pop()
+                return 0, []
+            score, line = self.alpha_beta(board, opposite_player, depth - 1, ply + 1, alpha, beta, False)
+            self.history.pop()
+            return score, [None] + line
+
+        self.history.pop()
+        if best_score <= alpha_original:
+            bound = Bound.UPPER
+        elif best_score >= beta_original:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        self.transposition_table.store(key, depth, bound, best_score,
+                                       board.geometry.transform_move(best_line[0], symmetry))
+
+        return best_score, best_line
+
+    def check_budget(self):
+        """
+        Called every TIME_CHECK_NODES nodes (and when the node budget is reached): stops the search if the
+        time or the nodes are over or if stop was called. The first iteration always completes, so there
+        is a move to return.
+        """
+        self.next_check = self.nodes + self.TIME_CHECK_NODES
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
+
+        if self.iteration_depth > 1 and (
+                self.stop_requested or (self.deadline is not None and time.perf_counter() > self.deadline) or (
+                self.max_nodes is not None and self.nodes >= self.max_nodes)):
+            raise SearchTimeout
+
+    def stop(self):
+        """
+        Asks the running search (from another thread) to return the best move found so far
+        """
+        self.stop_requested = True
+
+    def set_budget(self, depth_or_budget, max_nodes=None):
+        """
+        Sets the budget of the search; it's called by search and it can be called from another thread during
+        a search (a ponder search that becomes the search of the move, see worker.SearchWorker.ponder): the
+        time and the nodes are counted from the call
+
+        :param depth_or_budget: The maximum depth (int) or the time budget in seconds (float)
+        :param max_nodes: The node budget, no limit if None
+        """
+        if isinstance(depth_or_budget, float):
+            self.max_depth = self.MAX_DEPTH - 1
+            self.deadline = time.perf_counter() + depth_or_budget
+        else:
+            self.max_depth = min(depth_or_budget, self.MAX_DEPTH - 1)
+            self.deadline = None
+            # The iteration that goes past the depth returns the result of the deeper completed iterations
+            if self.iteration_depth > self.max_depth:
+                self.stop_requested = True
+        self.max_nodes = self.nodes + max_nodes if max_nodes is not None else None
+        self.next_check = self.nodes + self.TIME_CHECK_NODES
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
+
+    def search(self, board, player, depth_or_budget, root_moves=None, max_nodes=None, history=None):
+        """
+        Iterative deepening: searches with depth 1, 2, ... and each iteration starts with the
+        principal variation of the previous one
+
+        The search can be stopped by a time budget, a node budget or a call of stop; it returns the result
+        of the last completed iteration, or the better move found by the interrupted iteration. The time
+        budget is checked every TIME_CHECK_NODES nodes, so the search doesn't run much longer than the budget.
+
+        :param depth_or_budget: The maximum depth (int) or the time budget in seconds (float)
+        :param root_moves: List of moves to search at the root (used to split the root moves between
+            processes), all the moves are searched if None
+        :param max_nodes: The node budget, no limit if None
+        :param history: PositionHistory of the game (up to the current position), the positions reached
+            again are scored as draws; only the repetitions inside the search are detected if None
+        :return: Tuple (best move, score); the move is a Move or None if the player doesn't have any moves, the
+            score of a move of the book is None if the book doesn't have it
+        """
+        self.root_moves = root_moves
+        self.history = history.copy() if history is not None else PositionHistory()
+        if self.history.keys and self.history.keys[-1] == board.get_hash(player):
+            # The root is pushed again by alpha_beta
+            self.history.pop()
+        self.reset_stats()
+        # A stop that came after the end of the previous search doesn't stop this one
+        self.stop_requested = False
+        self.iteration_depth = 0
+        self.set_budget(depth_or_budget, max_nodes)
+        self.principal_variation = []
+        self.transposition_table.new_search()
+        best_move, best_score = None, None
+
+        # The openings are played from the book and a root in the tablebase is answered with its perfect move,
+        # without a search
+        if self.book is not None and root_moves is None:
+            best_move, best_score = self.book.choose_move(board, player)
+            if best_move is not None:
+                self.principal_variation = [best_move]
+                if self.hooks is not None:
+                    self.hooks.on_search_end(best_move, best_score, self.get_stats())
+                return best_move, best_score
+
+        if self.tablebase is not None and root_moves is None and self.tablebase.covers(board):
+            best_move = self.tablebase.get_best_move(board.copy(), player)[0]
+            best_score = self.tablebase.get_score(board, player, 0)
+            self.principal_variation = [best_move] if best_move is not None else []
+            if self.hooks is not None:
+                self.hooks.on_search_end(best_move, best_score, self.get_stats())
+            return best_move, best_score
+
+        if self.profile:
+            self.profiler = SamplingProfiler()
+            self.profiler.start()
+
+        # The search plays and takes back the moves on its own copy of the board
+        board = board.copy()
+
+        try:
+            for depth in range(1, self.MAX_DEPTH):
+                # The budget can be changed during the search, see set_budget
+                if depth > self.max_depth:
+                    break
+                self.iteration_depth = depth
+                self.root_best = None
+                iteration_start = time.perf_counter()
+                try:
+                    score, line = self.alpha_beta(board, player, depth, 0, -math.inf, math.inf, True)
+                except SearchTimeout:
+                    # The moves of the root are searched with the best move of the previous iteration first,
+                    # so a move that replaced it is better
+                    if self.root_best is not None and self.root_best[1] and self.root_best[1][0] != best_move:
+                        best_score, line = self.root_best
+                        best_move = line[0]
+                        logger.debug("depth %d interrupted: score %s, line %s", depth, best_score, line)
+                    break
+                self.iteration_times.append(time.perf_counter() - iteration_start)
+
+                self.principal_variation = line
+                best_move, best_score = (line[0] if line else None), score
+                logger.debug("depth %d: score %s, %d nodes, line %s", depth, score, self.nodes, line)
+                if self.hooks is not None:
+                    self.hooks.on_iteration(depth, score, line, self.get_stats())
+
+                # A forced win was found, deeper iterations can't change the result
+                if abs(score) >= self.WIN_SCORE:
+                    break
+        finally:
+            self.stop_requested = False
+            if self.profiler is not None:
+                self.profiler.stop()
+
+        if self.hooks is not None:
+            self.hooks.on_search_end(best_move, best_score, self.get_stats())
+        return best_move, best_score
+
+    def reset_stats(self):
+        self.nodes = 0
+        self.evaluations = 0
+        self.win_checks = 0
+        self.expanded_nodes = 0
+        self.moves_searched = 0
+        self.cutoffs = [0] * self.MAX_DEPTH
+        self.tt_probes_start = self.transposition_table.hits + self.transposition_table.misses
+        self.tt_hits_start = self.transposition_table.hits
+        self.iteration_times = []
+        self.profiler = None
+        self.search_start = time.perf_counter()
+
+    def get_stats(self):
+        """
+        :return: SearchStats of the last search (or of the current search, if it's called by a hook)
+        """
+        transposition_table = self.transposition_table
+        last_ply = max((ply for (ply, count) in enumerate(self.cutoffs) if count), default=-1)
+        return SearchStats(
+            depth=len(self.iteration_times),
+            nodes=self.nodes,
+            evaluations=self.evaluations,
+            win_checks=self.win_checks,
+            tt_probes=transposition_table.hits + transposition_table.misses - self.tt_probes_start,
+            tt_hits=transposition_table.hits - self.tt_hits_start,
+            expanded_nodes=self.expanded_nodes,
+            moves_searched=self.moves_searched,
+            cutoffs=self.cutoffs[:last_ply + 1],
+            iteration_times=list(self.iteration_times),
+            total_time=time.perf_counter() - self.search_start,
+            phase_times=self.profiler.get_phase_times() if self.profiler is not None and not self.profiler.running
+            else {},
+        )
+
+
+def search(board, player, depth_or_budget=DEFAULT_DEPTH, transposition_table=None, max_nodes=None, history=None):
+    """
+    Search the best move of the player
+
+    :param board: Board or BitBoard
+    :param player: Symbol.Zero.value or Symbol.X.value
+    :param depth_or_budget: The maximum depth (int) or the time budget in seconds (float)
+    :param transposition_table: TranspositionTable to reuse between searches, a new one is used if None
+    :param max_nodes: The node budget, no limit if None
+    :param history: PositionHistory of the game, see AlphaBeta.search
+    :return: Tuple (best move, score) - see AlphaBeta.search
+    """
+    return AlphaBeta(transposition_table).search(board, player, depth_or_budget, max_nodes=max_nodes,
+                                                 history=history)
@@ -0,0 +1,162 @@
+"""
+Instrumentation of the search: counters, hooks and a sampling profiler
+
+The counters of AlphaBeta are plain integers updated on the hot path; everything else (the hooks, the profiler,
+the logging of the engine) is off unless it's asked for. The statistics can be written as JSON:
+
+    alpha_beta = AlphaBeta(profile=True)
+    alpha_beta.search(board, player, 5)
+    print(alpha_beta.get_stats().to_json())
+"""
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+# The functions whose samples are counted as the time of each phase of the search
+PHASE_FUNCTIONS = {
+    'move_generation': ('generate_moves', 'generate_placements', 'generate_slides', 'get_threat_cells',
+                        'get_moves_to', 'get_move_threat', 'order_moves', 'is_legal_move'),
+    'evaluation': ('evaluate',),
+    'win_checks': ('is_board_final', 'get_winner'),
+    'make_unmake': ('make', 'unmake', 'set_cell'),
+    'transposition_table': ('probe', 'store', 'get_hash'),
+}
+
+
+class SearchStats:
+    """
+    Counters of a search (see AlphaBeta.get_stats)
+    """
+
+    def __init__(self, depth=0, nodes=0, evaluations=0, win_checks=0, tt_probes=0, tt_hits=0, expanded_nodes=0,
+                 moves_searched=0, cutoffs=None, iteration_times=None, total_time=0.0, phase_times=None):
+        self.depth = depth  # Depth of the last completed iteration
+        self.nodes = nodes
+        self.evaluations = evaluations  # Leaves scored by AlphaBeta.evaluate
+        self.win_checks = win_checks
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+        self.expanded_nodes = expanded_nodes  # Nodes whose moves were searched
+        self.moves_searched = moves_searched
+        self.cutoffs = cutoffs or []  # Beta cutoffs of each ply
+        self.iteration_times = iteration_times or []  # Seconds of each iteration of the iterative deepening
+        self.total_time = total_time
+        self.phase_times = phase_times or {}  # Seconds of each phase, estimated by the SamplingProfiler
+
+    def get_branching_factor(self):
+        """
+        :return: Average number of moves searched by the nodes that weren't leaves
+        """
+        return self.moves_searched / self.expanded_nodes if self.expanded_nodes else 0.0
+
+    def get_nodes_per_second(self):
+        return self.nodes / self.total_time if self.total_time else 0.0
+
+    def to_dict(self):
+        return {
+            'depth': self.depth,
+            'nodes': self.nodes,
+            'evaluations': self.evaluations,
+            'win_checks': self.win_checks,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'expanded_nodes': self.expanded_nodes,
+            'moves_searched': self.moves_searched,
+            'branching_factor': self.get_branching_factor(),
+            'cutoffs': self.cutoffs,
+            'iteration_times': self.iteration_times,
+            'total_time': self.total_time,
+            'nodes_per_second': self.get_nodes_per_second(),
+            'phase_times': self.phase_times,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+class SearchHooks:
+    """
+    Callbacks of the search, override the methods that are needed and pass the object to AlphaBeta
+    """
+
+    def on_iteration(self, depth, score, line, stats):
+        """
+        Called after every completed iteration of the iterative deepening
+
+        :param line: The principal variation found by the iteration
+        :param stats: SearchStats of the search so far
+        """
+
+    def on_search_end(self, best_move, score, stats):
+        pass
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of a thread at a fixed interval from a background thread
+
+    Sampling doesn't slow down the profiled code (unlike cProfile), so the results show where the time of
+    the search really goes. A sample is counted for the innermost function of the stack found in
+    PHASE_FUNCTIONS; the other samples are counted as 'other'.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = Counter()  # Phase -> number of samples
+        self.functions = Counter()  # Function that was running -> number of samples
+        self.sample_count = 0
+        self.elapsed = 0.0
+        self.thread_id = None
+        self.running = False
+        self.sampler = None
+        self.start_time = None
+
+        self.phases = {}
+        for (phase, function_names) in PHASE_FUNCTIONS.items():
+            for function_name in function_names:
+                self.phases[function_name] = phase
+
+    def start(self, thread_id=None):
+        """
+        :param thread_id: The thread to profile, the calling thread if None
+        """
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.running = False
+        self.sampler.join()
+        self.elapsed += time.perf_counter() - self.start_time
+
+    def sample(self):
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            self.sample_count += 1
+            self.functions[frame.f_code.co_name] += 1
+            phase = 'other'
+            while frame is not None:
+                if frame.f_code.co_name in self.phases:
+                    phase = self.phases[frame.f_code.co_name]
+                    break
+                frame = frame.f_back
+            self.samples[phase] += 1
+
+    def get_phase_times(self):
+        """
+        :return: Dictionary phase -> estimated seconds (the samples share the measured time)
+        """
+        if not self.sample_count:
+            return {}
+        return {phase: self.elapsed * count / self.sample_count for (phase, count) in self.samples.items()}
+
+    def get_top_functions(self, count=10):
+        return self.functions.most_common(count)
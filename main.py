@@ -1,18 +1,19 @@
-import copy
+import argparse
+import time
 from enum import Enum
-import numpy as np
 import pygame
 
+import engine
+from book import Book
+from engine import Symbol, Move, Board, BitBoard
+from worker import SearchWorker
 
-class NeighborPos(Enum):
-    UP = (0, -1)
-    DOWN = (0, 1)
-    LEFT = (-1, 0)
-    RIGHT = (1, 0)
-    UP_LEFT = (-1, -1)
-    UP_RIGHT = (1, -1)
-    DOWN_LEFT = (-1, 1)
-    DOWN_RIGHT = (1, 1)
+# Event posted by the AI worker when its search ends (attributes: move, score, nodes)
+AI_MOVE_EVENT = pygame.USEREVENT + 1
+
+# Timer event that refreshes the caption while the AI thinks
+THINKING_TIMER_EVENT = pygame.USEREVENT + 2
+THINKING_TIMER_MS = 500
 
 
 class GameState(Enum):
@@ -23,15 +24,6 @@ class GameState(Enum):
     FINAL = 4
 
 
-class Symbol(Enum):
-    Nothing = 0
-    Zero = 1
-    X = 2
-    Zero_possible = 3
-    X_possible = 4
-    Impossible = 5
-
-
 class Colors(Enum):
     Background = pygame.Color(35, 35, 35)
     GridLine = pygame.Color(60, 60, 60)
@@ -40,87 +32,128 @@ class Colors(Enum):
     ImpossibleSymbol = pygame.Color(20, 20, 20)
 
 
-class Board:
-    def __init__(self, game_matrix=None, impossible_moves_matrix=None):
-        if game_matrix is not None:
-            self.game_matrix = game_matrix
-        else:
-            self.game_matrix = np.zeros([Game.NO_ROWS, Game.NO_COLUMNS], dtype=int)
-
-        if impossible_moves_matrix is not None:
-            self.impossible_moves_matrix = impossible_moves_matrix
-        else:
-            self.impossible_moves_matrix = np.zeros([Game.NO_ROWS, Game.NO_COLUMNS], dtype=int)
-
-    def get_game_matrix(self):
-        return self.game_matrix
-
-    def get_impossible_moves_matrix(self):
-        return self.impossible_moves_matrix
-
-    def is_board_final(self):
-        print("Board to test if final:")
-        print(self.game_matrix)
-        for row_index in range(Game.NO_ROWS):
-            for column_index in range(Game.NO_COLUMNS):
-                if (self.game_matrix[row_index, column_index] == Symbol.X.value) or (
-                        self.game_matrix[row_index, column_index] == Symbol.Zero.value):
-                    if g.is_final(cell_index=(row_index, column_index), game_matrix=self.game_matrix):
-                        return self.game_matrix[row_index, column_index]
-        return False
-
-
 class Game:
-    NO_ROWS = 6
-    NO_COLUMNS = 6
+    NO_ROWS = engine.NO_ROWS
+    NO_COLUMNS = engine.NO_COLUMNS
     CELL_DIM = 75
     LINE_WIDTH = int(CELL_DIM * 0.10)
+    MAX_SCREEN_DIM = 800  # The cells of the large boards are smaller, so the window fits on the screen
 
     SCREEN_WIDTH = (NO_COLUMNS * CELL_DIM) + ((NO_COLUMNS - 1) * LINE_WIDTH)
     SCREEN_HEIGHT = (NO_ROWS * CELL_DIM) + ((NO_ROWS - 1) * LINE_WIDTH)
 
-    DEPTH = 1
-    P_MIN = None
-    P_MAX = None
+    AI_TIME = 2.0  # Think time of the AI in seconds
+    P_MIN = engine.P_MIN
+    P_MAX = engine.P_MAX
+
+    def __init__(self, board, ai_player=None, ai_budget=AI_TIME, ai_max_nodes=None,
+                 repetitions=engine.PositionHistory.DEFAULT_REPETITIONS, max_plies=None, book=None, ponder=False):
+        """
+        :param ai_player: The symbol played by the AI (Symbol.X.value or Symbol.Zero.value), None for two players
+        :param ai_budget: Time budget of the AI in seconds (float) or the depth of its searches (int)
+        :param ai_max_nodes: Node budget of the AI, no limit if None
+        :param repetitions: The game is a draw when a position is reached this number of times (None for no limit)
+        :param max_plies: The game is a draw after this number of plies, no limit if None
+        :param book: Path of the opening book of the AI (see book.py), or None
+        :param ponder: If True, the AI keeps searching during the turns of the player (see SearchWorker.ponder)
+        """
+        # The size of the window depends on the size of the board
+        self.NO_ROWS, self.NO_COLUMNS = board.get_size()
+        self.CELL_DIM = min(self.CELL_DIM, int(self.MAX_SCREEN_DIM / (1.1 * max(self.NO_ROWS, self.NO_COLUMNS))))
+        self.LINE_WIDTH = max(1, int(self.CELL_DIM * 0.10))
+        self.SCREEN_WIDTH = (self.NO_COLUMNS * self.CELL_DIM) + ((self.NO_COLUMNS - 1) * self.LINE_WIDTH)
+        self.SCREEN_HEIGHT = (self.NO_ROWS * self.CELL_DIM) + ((self.NO_ROWS - 1) * self.LINE_WIDTH)
 
-    def __init__(self, board):
         pygame.init()
         self.window = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
         pygame.display.set_caption('four-in-a-line but not really')
         pygame.display.set_icon(pygame.image.load('resources/icon.png'))
 
+        # Rendering: the cells are drawn from sprites and only when they change (see draw)
+        self.sprites = self.create_sprites()
+        self.drawn_cells = {}  # Cell -> the value drawn on the window
+        self.drawn_view_state = None
+        self.full_redraw = True
+
         # The game always starts with the player X
         self.game_state = GameState.TURN_X
 
-        # Current Board used
+        # Current Board used (Board or BitBoard) and the positions of the game, for the draws by repetition
         self.board = board
-        self.game_matrix = board.get_game_matrix()
-        self.impossible_moves_matrix = board.get_impossible_moves_matrix()
-        self.P_MIN = Symbol.X.value
-        self.P_MAX = Symbol.Zero.value
+        self.history = engine.PositionHistory(repetitions, max_plies)
+        self.history.push(self.board.get_hash(Symbol.X.value))
 
         # Variables used for the moving methods
         self.showing_possible_moves = False
         self.moving_cell_index = None
+        self.possible_move_cells = []  # Cells where the symbol from moving_cell_index can be moved
+
+        # The AI searches in a background thread and posts its move as an AI_MOVE_EVENT
+        self.ai_player = ai_player
+        self.ai_budget = ai_budget
+        self.ai_max_nodes = ai_max_nodes
+        opening_book = Book(book) if book else None
+        self.worker = SearchWorker(self.post_ai_move, book=opening_book) if ai_player is not None else None
+        self.ponder = ponder
+        self.ai_start_time = None
+
+        # The AI searched the position (its hash with the AI to move) and its move wasn't played yet: a search is
+        # started only once per turn, the thread can end before its AI_MOVE_EVENT is handled
+        self.waiting_ai_move = False
+        self.ai_position = None
 
     # ------ Setters ------ #
-    def set_board(self, board: Board):
+    def set_board(self, board):
+        self.stop_ai()
         self.board = board
-        self.game_matrix = board.get_game_matrix()
-        self.impossible_moves_matrix = board.get_impossible_moves_matrix()
+        self.history = engine.PositionHistory(self.history.max_repetitions, self.history.max_plies)
+        self.history.push(self.board.get_hash(self.get_turn_symbol()))
+        self.redraw_all()
 
     # ------ Drawing Methods ------ #
-    def draw(self):
+    def create_sprites(self):
         """
-        Draw everything on the window
+        Renders the cells once: the empty cell, the symbols, the possible moves and the cells where
+        the player can't place
+
+        :return: Dictionary value of the cell (Symbol value) -> Surface of the cell
         """
-        # Creates a background
-        background = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        background.fill(Colors.Background.value)
+        sprites = {}
+        for symbol in Symbol:
+            sprite = pygame.Surface((self.CELL_DIM, self.CELL_DIM)).convert()
+            sprite.fill(Colors.Background.value)
+            self.draw_cell(sprite, symbol.value)
+            sprites[symbol.value] = sprite
+        return sprites
 
-        self.window.blit(background, (0, 0))
-        self.draw_grid()
-        self.draw_symbols()
+    def draw(self):
+        """
+        Draw on the window the cells that changed since the last call (everything after redraw_all)
+
+        :return: List of the rectangles of the window that changed, for pygame.display.update
+        """
+        # Nothing changed: same position, same player to move and same possible moves
+        view_state = (self.board.zobrist_hash, self.board.impossible_player, tuple(self.possible_move_cells),
+                      self.game_state)
+        if not self.full_redraw and view_state == self.drawn_view_state:
+            return []
+        self.drawn_view_state = view_state
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.drawn_cells = {}
+            self.window.fill(Colors.Background.value)
+            self.draw_grid()
+            self.draw_symbols()
+            return [self.window.get_rect()]
+
+        return self.draw_symbols()
+
+    def redraw_all(self):
+        """
+        The next draw repaints the whole window (e.g. after the window was covered)
+        """
+        self.full_redraw = True
 
     def draw_grid(self):
         # Draw vertical lines of the grid
@@ -137,47 +170,67 @@ class Game:
 
     def draw_symbols(self):
         """
-        Iterates through the matrix and it draws the symbols
+        Iterates through the matrix and it blits the sprites of the cells that changed
+
+        :return: List of the rectangles of the cells that were drawn
         """
         cell_dim_offset = self.CELL_DIM + self.LINE_WIDTH
 
-        for row_index in range(len(self.game_matrix)):
-            for (column_index, cell_value) in enumerate(self.game_matrix[row_index]):
+        game_matrix = self.board.get_game_matrix()
+        impossible_moves_matrix = self.board.get_impossible_moves_matrix()
+
+        # The possible moves are shown with the symbol of the player to move
+        possible_symbol = (Symbol.Zero_possible.value if self.game_state is GameState.TURN_ZERO
+                           else Symbol.X_possible.value)
+
+        dirty_rects = []
+        for row_index in range(len(game_matrix)):
+            for (column_index, cell_value) in enumerate(game_matrix[row_index]):
                 cell_value = int(cell_value)  # From numpy.int32 to int
 
-                # Draw the Zero Symbols
-                if (cell_value is Symbol.Zero.value) or (cell_value is Symbol.Zero_possible.value):
-                    # Get the center position of the cell
-                    cell_pos = (column_index * cell_dim_offset + self.CELL_DIM / 2, row_index * cell_dim_offset + self.CELL_DIM / 2)
-
-                    pygame.draw.circle(self.window, (
-                        Colors.Symbol.value if (cell_value is Symbol.Zero.value) else Colors.PossibleSymbol.value),
-                                       cell_pos, (self.CELL_DIM * 0.8) / 2, width=int(self.CELL_DIM * 0.1))
-
-                # Draw the X Symbols
-                elif (cell_value is Symbol.X.value) or (cell_value is Symbol.X_possible.value):
-                    # Get the top-left position of the cell
-                    cell_pos = (column_index * cell_dim_offset, row_index * cell_dim_offset)
-                    offset = self.CELL_DIM * 0.2
-
-                    pygame.draw.line(self.window, (
-                        Colors.Symbol.value if (cell_value is Symbol.X.value) else Colors.PossibleSymbol.value),
-                                     (cell_pos[0] + offset, cell_pos[1] + offset),
-                                     (cell_pos[0] + self.CELL_DIM - offset, cell_pos[1] + self.CELL_DIM - offset),
-                                     width=self.LINE_WIDTH)
-                    pygame.draw.line(self.window, (
-                        Colors.Symbol.value if (cell_value is Symbol.X.value) else Colors.PossibleSymbol.value),
-                                     (cell_pos[0] + self.CELL_DIM - offset, cell_pos[1] + offset),
-                                     (cell_pos[0] + offset, cell_pos[1] + self.CELL_DIM - offset),
-                                     width=self.LINE_WIDTH)
-
-                # Draw the cell where you can't place
-                elif self.impossible_moves_matrix[row_index][column_index] == Symbol.Impossible.value:
-                    # Get the top-left position of the cell
-                    cell_pos = (column_index * cell_dim_offset, row_index * cell_dim_offset)
-
-                    pygame.draw.rect(self.window, Colors.ImpossibleSymbol.value,
-                                     pygame.Rect(cell_pos[0], cell_pos[1], self.CELL_DIM, self.CELL_DIM))
+                if (row_index, column_index) in self.possible_move_cells:
+                    cell_value = possible_symbol
+                elif cell_value == Symbol.Nothing.value and (
+                        impossible_moves_matrix[row_index][column_index] == Symbol.Impossible.value):
+                    cell_value = Symbol.Impossible.value
+
+                if self.drawn_cells.get((row_index, column_index)) != cell_value:
+                    self.drawn_cells[(row_index, column_index)] = cell_value
+                    cell_rect = self.window.blit(self.sprites[cell_value],
+                                                 (column_index * cell_dim_offset, row_index * cell_dim_offset))
+                    dirty_rects.append(cell_rect)
+
+        return dirty_rects
+
+    def draw_cell(self, surface, cell_value):
+        """
+        Draws the symbol of a cell on the surface of the cell (used to render the sprites)
+        """
+        # Draw the Zero Symbols
+        if (cell_value == Symbol.Zero.value) or (cell_value == Symbol.Zero_possible.value):
+            # Get the center position of the cell
+            cell_pos = (self.CELL_DIM / 2, self.CELL_DIM / 2)
+
+            pygame.draw.circle(surface, (
+                Colors.Symbol.value if (cell_value == Symbol.Zero.value) else Colors.PossibleSymbol.value),
+                               cell_pos, (self.CELL_DIM * 0.8) / 2, width=max(1, int(self.CELL_DIM * 0.1)))
+
+        # Draw the X Symbols
+        elif (cell_value == Symbol.X.value) or (cell_value == Symbol.X_possible.value):
+            offset = self.CELL_DIM * 0.2
+
+            pygame.draw.line(surface, (
+                Colors.Symbol.value if (cell_value == Symbol.X.value) else Colors.PossibleSymbol.value),
+                             (offset, offset), (self.CELL_DIM - offset, self.CELL_DIM - offset),
+                             width=self.LINE_WIDTH)
+            pygame.draw.line(surface, (
+                Colors.Symbol.value if (cell_value == Symbol.X.value) else Colors.PossibleSymbol.value),
+                             (self.CELL_DIM - offset, offset), (offset, self.CELL_DIM - offset),
+                             width=self.LINE_WIDTH)
+
+        # Draw the cell where you can't place
+        elif cell_value == Symbol.Impossible.value:
+            surface.fill(Colors.ImpossibleSymbol.value)
 
     # ------ Game Functionality Methods ------ #
     def put_symbol(self, symbol_type, cursor_pos):
@@ -194,28 +247,17 @@ class Game:
 
         cell_index = (int(cursor_pos[1] / cell_dim_offset),
                       int(cursor_pos[0] / cell_dim_offset))
+        cell_value = self.board.get_cell(cell_index)
 
         # If a move needs to be done it has priority over the placement
         if self.showing_possible_moves:
             # Clears the possible moves, and it moves the symbol by having the positions' mem, where:
             #       moving_cell_index   - Indexes of the cell that needs to be moved
             #       cell_index          - Indexes of the cell where the symbol is moved
-            if (self.game_state is GameState.TURN_ZERO) and (
-                    self.game_matrix[cell_index[0], cell_index[1]] == Symbol.Zero_possible.value):
+            if cell_index in self.possible_move_cells:
+                moving_cell_index = self.moving_cell_index
                 self.clear_possible_moves()
-                self.game_matrix[self.moving_cell_index[0], self.moving_cell_index[1]] = Symbol.Nothing.value
-                self.game_matrix[cell_index[0], cell_index[1]] = Symbol.Zero.value
-
-                if self.is_final(cell_index):
-                    self.game_state = GameState.FINAL
-
-                return True
-
-            elif (self.game_state is GameState.TURN_X) and (
-                    self.game_matrix[cell_index[0], cell_index[1]] == Symbol.X_possible.value):
-                self.clear_possible_moves()
-                self.game_matrix[self.moving_cell_index[0], self.moving_cell_index[1]] = Symbol.Nothing.value
-                self.game_matrix[cell_index[0], cell_index[1]] = Symbol.X.value
+                self.board.make(Move(symbol_type, moving_cell_index, cell_index))
 
                 if self.is_final(cell_index):
                     self.game_state = GameState.FINAL
@@ -223,17 +265,16 @@ class Game:
                 return True
 
         # Put symbol on an empty cell
-        if (self.game_matrix[cell_index[0], cell_index[1]] == Symbol.Nothing.value) and (
-                self.impossible_moves_matrix[cell_index[0], cell_index[1]] != Symbol.Impossible.value):
+        if (cell_value == Symbol.Nothing.value) and not self.board.is_impossible_move(cell_index):
 
-            self.game_matrix[cell_index[0], cell_index[1]] = symbol_type
+            self.board.make(Move(symbol_type, None, cell_index))
             self.clear_possible_moves()
             if self.is_final(cell_index):
                 self.game_state = GameState.FINAL
             return True
 
         # Move a symbol
-        elif self.game_matrix[cell_index[0], cell_index[1]] == symbol_type:
+        elif cell_value == symbol_type:
 
             # If the possible moves are already rendered, by clicking on the same type of symbol it clears them
             if self.showing_possible_moves is True:
@@ -241,24 +282,15 @@ class Game:
                 return False
 
             else:
-                is_possible_cell = False
-                for possible_cell in NeighborPos:  # Iterate through all possible neighbors
-                    neighbor_index = (cell_index[0] + possible_cell.value[0], cell_index[1] + possible_cell.value[1])
-
-                    # Checking if the neighbor cell is In-Bounds + Empty (No symbol is placed there)
-                    if (0 <= neighbor_index[0] < self.NO_ROWS) and (0 <= neighbor_index[1] < self.NO_COLUMNS) and (
-                            self.game_matrix[neighbor_index[0], neighbor_index[1]] == Symbol.Nothing.value):
-                        if symbol_type is Symbol.Zero.value:
-                            self.game_matrix[neighbor_index[0], neighbor_index[1]] = Symbol.Zero_possible.value
-                        elif symbol_type is Symbol.X.value:
-                            self.game_matrix[neighbor_index[0], neighbor_index[1]] = Symbol.X_possible.value
-
-                        is_possible_cell = True
+                for neighbor_index in self.board.geometry.neighbors[cell_index]:  # The in-bounds neighbors
+                    # Checking if the neighbor cell is Empty (No symbol is placed there)
+                    if self.board.get_cell(neighbor_index) == Symbol.Nothing.value:
+                        self.possible_move_cells.append(neighbor_index)
 
                 # If there are possible cells where to move the symbol, initiate the moving process by
                 #   assigning True to showing_possible_moves and
                 #   keeping the indexes of the symbol that needs to be moved
-                if is_possible_cell:
+                if self.possible_move_cells:
                     self.showing_possible_moves = True
                     self.moving_cell_index = (cell_index[0], cell_index[1])
 
@@ -271,130 +303,118 @@ class Game:
         Clears the symbols of the possible moves and
             sets the showing_possible_moves to False
         """
-        for row_index in range(len(self.game_matrix)):
-            for (column_index, cell_value) in enumerate(self.game_matrix[row_index]):
-                if (self.game_matrix[row_index][column_index] == Symbol.Zero_possible.value) or (
-                        self.game_matrix[row_index][column_index] == Symbol.X_possible.value):
-                    self.game_matrix[row_index][column_index] = Symbol.Nothing.value
+        self.possible_move_cells = []
 
         self.refresh_board()
         self.showing_possible_moves = False
 
-    def is_final(self, cell_index, game_matrix=None):
-        if game_matrix is None:
-            game_matrix = self.game_matrix
-
-        symbol = game_matrix[cell_index[0], cell_index[1]]
-
-        # Check horizontal line
-        symbol_counter = 0
-
-        # Check left
-        for i in range(1, 4):
-            if (0 <= cell_index[0] < self.NO_ROWS) and (0 <= cell_index[1] - i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0], cell_index[1] - i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
-
-        # Check right
-        for i in range(1, 4):
-            if (0 <= cell_index[0] < self.NO_ROWS) and (0 <= cell_index[1] + i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0], cell_index[1] + i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
+    def end_turn(self, symbol_type):
+        """
+        Called after the player symbol_type made a move: gives the turn to the other player
+        (or back to the same player if the other one doesn't have any moves)
+        """
+        if self.game_state is GameState.FINAL:
+            print("X is the Winner" if symbol_type == Symbol.X.value else "Zero is the Winner")
+            self.stop_ai()
+            return
 
-        if symbol_counter == 3:
-            print("A winning position was found on a horizontal line")
-            return True
+        if symbol_type == Symbol.X.value:
+            current_state, next_state = GameState.TURN_X, GameState.TURN_ZERO
+        else:
+            current_state, next_state = GameState.TURN_ZERO, GameState.TURN_X
 
-        # Check vertical line
-        symbol_counter = 0
+        self.game_state = next_state
+        self.refresh_board()
 
-        # Check up
-        for i in range(1, 4):
-            if (0 <= cell_index[0] - i < self.NO_ROWS) and (0 <= cell_index[1] < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] - i, cell_index[1]] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
-
-        # Check down
-        for i in range(1, 4):
-            if (0 <= cell_index[0] + i < self.NO_ROWS) and (0 <= cell_index[1] < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] + i, cell_index[1]] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
+        if not self.is_move_available():
+            self.game_state = current_state
+            self.refresh_board()
 
-        if symbol_counter == 3:
-            print("A winning position was found on a vertical line")
-            return True
+        self.history.push(self.board.get_hash(self.get_turn_symbol()))
+        if self.history.is_draw():
+            print("Draw: the position was repeated" if self.history.is_repetition() else "Draw: too many moves")
+            self.game_state = GameState.FINAL
+            self.refresh_board()
+            self.stop_ai()
 
-        # Check diagonal 1
-        symbol_counter = 0
+    def get_turn_symbol(self):
+        if self.game_state is GameState.TURN_ZERO:
+            return Symbol.Zero.value
+        if self.game_state is GameState.TURN_X:
+            return Symbol.X.value
+        return None
 
-        # Check top-left half of diagonal
-        for i in range(1, 4):
-            if (0 <= cell_index[0] - i < self.NO_ROWS) and (0 <= cell_index[1] - i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] - i, cell_index[1] - i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
-
-        # Check bottom-right half of diagonal
-        for i in range(1, 4):
-            if (0 <= cell_index[0] + i < self.NO_ROWS) and (0 <= cell_index[1] + i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] + i, cell_index[1] + i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
+    # ------ AI Methods ------ #
+    def is_ai_turn(self):
+        return self.ai_player is not None and self.get_turn_symbol() == self.ai_player
 
-        if symbol_counter == 3:
-            print("A winning position was found on diag 1")
-            return True
+    def start_ai_turn(self):
+        """
+        Starts the search of the AI if it's its turn and it isn't already waiting for its move
+        """
+        if self.is_ai_turn() and not self.waiting_ai_move:
+            self.waiting_ai_move = True
+            self.ai_position = self.board.get_hash(self.ai_player)
+            self.ai_start_time = time.perf_counter()
+            self.update_thinking_caption()
+            pygame.time.set_timer(THINKING_TIMER_EVENT, THINKING_TIMER_MS)
+            self.worker.start(self.board, self.ai_player, self.ai_budget, self.ai_max_nodes, self.history)
+
+    def update_thinking_caption(self):
+        if self.worker is not None and self.worker.is_searching():
+            pygame.display.set_caption(f'four-in-a-line but not really - thinking '
+                                       f'({time.perf_counter() - self.ai_start_time:.1f}s)')
+
+    def post_ai_move(self, move, score, stats):
+        """
+        Called by the worker thread at the end of the search; the move is played by the game loop
+        """
+        pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=move, score=score, nodes=stats.nodes))
 
-        # Check diagonal 2
-        symbol_counter = 0
+    def play_ai_move(self, move):
+        pygame.time.set_timer(THINKING_TIMER_EVENT, 0)
+        pygame.display.set_caption('four-in-a-line but not really')
+        # The results of a search of another position are dropped
+        if not (self.waiting_ai_move and self.is_ai_turn() and
+                self.board.get_hash(self.ai_player) == self.ai_position):
+            return
+        self.waiting_ai_move = False
 
-        # Check bottom-left half of diagonal
-        for i in range(1, 4):
-            if (0 <= cell_index[0] + i < self.NO_ROWS) and (0 <= cell_index[1] - i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] + i, cell_index[1] - i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
-
-        # Check top-right half of diagonal
-        for i in range(1, 4):
-            if (0 <= cell_index[0] - i < self.NO_ROWS) and (0 <= cell_index[1] + i < self.NO_COLUMNS):
-                if game_matrix[cell_index[0] - i, cell_index[1] + i] == symbol:
-                    symbol_counter = symbol_counter + 1
-                else:
-                    break
-            else:
-                break
+        # The AI doesn't have any moves, it skips the turn
+        if move is not None:
+            self.clear_possible_moves()
+            self.board.make(move)
+            if self.is_final(move.to_cell):
+                self.game_state = GameState.FINAL
+        self.end_turn(self.ai_player)
+        self.start_pondering()
 
-        if symbol_counter == 3:
-            print("A winning position was found on diag 2")
-            return True
+    def start_pondering(self):
+        """
+        Starts the search of the AI during the turn of the player, if pondering is on
+        """
+        if self.ponder and self.worker is not None and self.game_state in (GameState.TURN_X, GameState.TURN_ZERO) \
+                and not self.is_ai_turn() and not self.worker.is_pondering():
+            self.worker.ponder(self.board, self.get_turn_symbol(), self.history)
 
-        return False
+    def toggle_ponder(self):
+        if self.worker is None:
+            return
+        self.ponder = not self.ponder
+        print("Pondering on" if self.ponder else "Pondering off")
+        if self.ponder:
+            self.start_pondering()
+        elif self.worker.is_pondering():
+            self.worker.stop()
+
+    def stop_ai(self):
+        if self.worker is not None:
+            pygame.time.set_timer(THINKING_TIMER_EVENT, 0)
+            self.worker.stop()
+            self.waiting_ai_move = False
+
+    def is_final(self, cell_index):
+        return self.board.is_final(cell_index)
 
     def refresh_board(self):
         """
@@ -406,37 +426,7 @@ class Game:
         elif self.game_state is GameState.TURN_X:
             symbol = Symbol.X.value
 
-        neighbors = list(NeighborPos)[0:4]
-
-        # Iterate through the matrix
-        for row_index in range(len(self.game_matrix)):
-            for (column_index, cell_value) in enumerate(self.game_matrix[row_index]):
-
-                # Reset the cells so the next turn impossible moves can be refreshed
-                if self.impossible_moves_matrix[row_index, column_index] == Symbol.Impossible.value:
-                    self.impossible_moves_matrix[row_index, column_index] = Symbol.Nothing.value
-
-                # If the cell is empty check neighbors so the impossible moves can be calculated
-                if cell_value == Symbol.Nothing.value:
-
-                    zero_symbol_counter = 0
-                    x_symbol_counter = 0
-
-                    for neighbor in neighbors:  # Iterate through the first 4 neighbors (UP, DOWN, LEFT, RIGHT)
-                        neighbor_index = (row_index + neighbor.value[0], column_index + neighbor.value[1])
-
-                        # Checking if the neighbor cell is In-Bounds
-                        if (0 <= neighbor_index[0] < self.NO_ROWS) and (0 <= neighbor_index[1] < self.NO_COLUMNS):
-
-                            if self.game_matrix[neighbor_index[0], neighbor_index[1]] == Symbol.Zero.value:
-                                zero_symbol_counter = zero_symbol_counter + 1
-                            elif self.game_matrix[neighbor_index[0], neighbor_index[1]] == Symbol.X.value:
-                                x_symbol_counter = x_symbol_counter + 1
-
-                    # Impossible move found
-                    if ((symbol is Symbol.Zero.value) and (zero_symbol_counter < x_symbol_counter)) or (
-                            (symbol is Symbol.X.value) and (x_symbol_counter < zero_symbol_counter)):
-                        self.impossible_moves_matrix[row_index][column_index] = Symbol.Impossible.value
+        self.board.refresh_impossible_moves(symbol)
 
     def is_move_available(self):
         """
@@ -448,220 +438,98 @@ class Game:
         elif self.game_state is GameState.TURN_X:
             symbol = Symbol.X.value
 
-        # Look for a valid cell to put a symbol
-
-        # Iterate through the matrix
-        for row_index in range(len(self.game_matrix)):
-            for column_index in range(len(self.game_matrix[row_index])):
-                # The matrix contains an empty cell that is valid for putting a symbol
-                if (self.game_matrix[row_index, column_index] == Symbol.Nothing.value) and (
-                        self.impossible_moves_matrix[row_index, column_index] != Symbol.Impossible.value):
-                    return True
-
-        # If there are no valid cell to put a symbol, look for a move
-        # Iterate through the matrix
-        for row_index in range(len(self.game_matrix)):
-            for column_index in range(len(self.game_matrix[row_index])):
-                # The matrix contains an empty cell
-                if self.game_matrix[row_index, column_index] == Symbol.Nothing.value:
-                    # Check if the empty cell is a possible cell to move a symbol:
-                    #   If the neighbor of the empty cell contains a symbol then a move is possible
-
-                    # Iterate through all possible neighbors
-                    for neighbor in NeighborPos:
-                        neighbor_index = (row_index + neighbor.value[0], column_index + neighbor.value[1])
-
-                        # Checking if the neighbor cell is In-Bounds
-                        if (0 <= neighbor_index[0] < self.NO_ROWS) and (0 <= neighbor_index[1] < self.NO_COLUMNS):
-                            if self.game_matrix[neighbor_index[0], neighbor_index[1]] == symbol:
-                                return True  # Found a possible move
-
-            # Couldn't find any move either -> The player loses turn.
-            print("Player doesn't have any moves, skip turn")
-            return False
-
-    # ===== Implementing AI - work in progress =====
-    def get_possible_boards(self, player, current_state_matrix):
-        """
-        Create the possible boards for the current player - used in the searching algorithms
-        :param current_state_matrix: .
-        :param player: The value of the player associated with the play: Symbol.Zero.value or Symbol.X.value
-        :return:
-        """
-        print(f"get pos board player value is: {player} and it's type is {type(player)}")
-        game_matrix = current_state_matrix
-        boards_list = []
-        for row_index in range(self.NO_ROWS):
-            for column_index in range(self.NO_COLUMNS):
-
-                # Put a piece
-                if (game_matrix[row_index, column_index] == Symbol.Nothing.value) and (
-                        self.impossible_moves_matrix[row_index, column_index] != Symbol.Impossible.value):
-                    matrix_copy = copy.deepcopy(game_matrix)
-                    matrix_copy[row_index, column_index] = player
-                    boards_list.append(Board(matrix_copy, self.impossible_moves_matrix))
-
-                # Move a piece
-                if game_matrix[row_index, column_index] == player:
-
-                    for possible_cell in NeighborPos:  # Iterate through all possible neighbors
-                        neighbor_index = (row_index + possible_cell.value[0], column_index + possible_cell.value[1])
-
-                        # Checking if the neighbor cell is In-Bounds + Empty (No symbol is placed there)
-                        if (0 <= neighbor_index[0] < self.NO_ROWS) and (0 <= neighbor_index[1] < self.NO_COLUMNS) and (
-                                game_matrix[neighbor_index[0], neighbor_index[1]] == Symbol.Nothing.value):
-                            matrix_copy = copy.deepcopy(game_matrix)
-                            matrix_copy[row_index, column_index] = Symbol.Nothing.value
-                            matrix_copy[neighbor_index[0], neighbor_index[1]] = player
-                            boards_list.append(Board(matrix_copy, self.impossible_moves_matrix))
-
-        return boards_list
-
-    @classmethod
-    def get_opposite_player(cls, current_player: int):
-        if current_player == Symbol.Zero.value:
-            return Symbol.X.value
-        elif current_player == Symbol.X.value:
-            return Symbol.Zero.value
-        else:
-            print("Trying to switch the player, but the current_player param is not a X or Zero")
-            return
-
-
-class State:
-    """
-    Class used for searching algorithms min-max and alpha-beta;
-    - A state represents the node from a tree -
-
-    This class requires that the Game class has
-        - the two player: P_MAX, P_MIN
-        - a method moves(player) that returns the list of possible moves
-    """
-
-    def __init__(self, board: Board, current_player: int, depth, parent=None, estimation=None):
-        self.board = board
-        self.current_player = current_player
-        self.depth = depth
-        self.parent = parent  # Parent: Another State -> Parent node from the tree
-        self.estimation = estimation
-        self.possible_moves = []  # List of the possible moves (ramifications) from this State (node)
-        self.chosen_state = None  # Best move computed
-
-    def __str__(self):
-        return f"The player {self.current_player} has the board \n{self.board.game_matrix}\n Current Depth is: {self.depth}\nHas the estimation value: {self.estimation}\nIs a chosen state?: {self.chosen_state}\n"
-
-    def get_possible_states(self):
-        """
-        :return: List of possible states (nodes) of the current player on the subtree
-        """
-        # Create possible boards of the current player
-        possible_boards_list = Game.get_possible_boards(g, player=self.current_player,
-                                                        current_state_matrix=self.board.get_game_matrix())
-
-        # Switch players
-        print(f"Current player is {self.current_player}")
-        opposite_player = Game.get_opposite_player(self.current_player)
-        print(f"opposite player is {opposite_player}")
-
-        # If possible, go deeper into the tree and continue the algorithm
-        possible_states_list = [State(possible_board, opposite_player, self.depth - 1, parent=self) for possible_board
-                                in possible_boards_list]
-        print("==================== possible states list: =================")
-        for state in possible_states_list:
-            print(state)
-
-        return possible_states_list
-
-    def estimate_score(self, depth):
-        t_final = self.board.is_board_final()
-        print(f"T_FINAL = {t_final}")
-        if t_final == Symbol.Zero.value:
-            print("return 99+depth")
-            return 99 + depth
-        elif t_final == Symbol.X.value:
-            print("return -99+depth")
-
-            return -99 + depth
-        else:
-            return 1
-            # return self.open_lines(Symbol.Zero.value) - self.open_lines(Symbol.X.value)
-
-
-def min_max(state: State):
-    print(f"\n\n\n\n====== Call min_max on state: {state} ======")
-    if state.depth == 0 or state.board.is_board_final():
-        state.estimation = state.estimate_score(depth=state.depth)
-        return state
-
-    # Compute all the possible nodes from the next level of the tree
-    state.possible_moves = state.get_possible_states()
+        if self.board.is_move_available(symbol):
+            return True
 
-    print("Passes the initial get possible states")
+        # Couldn't find any move -> The player loses turn.
+        print("Player doesn't have any moves, skip turn")
+        return False
 
-    print("Start the recursive part -> estimated_moves = [min_max(move) for move in state.possible_moves]")
-    # Apply min-max algorithm on the next level nodes created previously
-    estimated_moves = [min_max(move) for move in state.possible_moves]
 
-    print("Passes the estimated moves section")
+# Board backends of the game (--backend): Board (NumPy matrix) or BitBoard
+BOARD_BACKENDS = {'bitboard': BitBoard, 'board': Board}
 
-    # Pick the players best estimation
-    if state.current_player == Game.P_MAX:
-        # Pick the state with the max estimation if the Player is MAX
-        state.chosen_state = max(estimated_moves, key=lambda x: x.estimation)
-    else:
-        # Pick the state with the min estimation if the Player is MIN
-        state.chosen_state = min(estimated_moves, key=lambda x: x.estimation)
 
-    state.estimation = state.chosen_state.estimation
-    return state
+def wait_events(clock, fps):
+    """
+    Blocks until there are events to handle: with fps 0 the loop sleeps until an event arrives (input, the move
+    of the AI, a timer), otherwise it wakes up at most fps times per second
 
+    :return: List of events
+    """
+    if fps:
+        clock.tick(fps)
+        return pygame.event.get()
+    return [pygame.event.wait()] + pygame.event.get()
 
-g = Game(Board())
 
 if __name__ == '__main__':
-
-    # Game loop
+    parser = argparse.ArgumentParser(description='4-In-A-Line With a Twist')
+    parser.add_argument('--rows', type=int, default=engine.NO_ROWS, help=f'up to {engine.MAX_ROWS}')
+    parser.add_argument('--columns', type=int, default=engine.NO_COLUMNS, help=f'up to {engine.MAX_COLUMNS}')
+    parser.add_argument('--backend', choices=list(BOARD_BACKENDS), default='bitboard',
+                        help='board backend of the game and of the AI')
+    parser.add_argument('--ai', choices=['x', 'zero'], help='the symbol played by the AI (two players if missing)')
+    parser.add_argument('--ai-time', type=float, default=Game.AI_TIME, help='think time of the AI in seconds')
+    parser.add_argument('--ai-nodes', type=int, help='node budget of the AI')
+    parser.add_argument('--ai-depth', type=int,
+                        help='fixed depth of the AI instead of --ai-time (4-8 on 6x6; the deep ones take seconds)')
+    parser.add_argument('--repetitions', type=int, default=engine.PositionHistory.DEFAULT_REPETITIONS,
+                        help='a position reached this number of times ends the game in a draw')
+    parser.add_argument('--max-plies', type=int, help='the game ends in a draw after this number of plies')
+    parser.add_argument('--book', help='opening book file of the AI (see book.py)')
+    parser.add_argument('--ponder', action='store_true',
+                        help='the AI keeps searching during your turns (P switches it on and off during the game)')
+    parser.add_argument('--fps', type=int, default=0,
+                        help='maximum frames per second; 0 (default) redraws only when an event arrives')
+    arguments = parser.parse_args()
+
+    ai_symbol = {'x': Symbol.X.value, 'zero': Symbol.Zero.value, None: None}[arguments.ai]
+    # A fixed depth has priority over the think time
+    ai_budget = arguments.ai_depth if arguments.ai_depth is not None else arguments.ai_time
+    board_backend = BOARD_BACKENDS[arguments.backend]
+    g = Game(board_backend(no_rows=arguments.rows, no_columns=arguments.columns), ai_symbol, ai_budget,
+             arguments.ai_nodes, arguments.repetitions, arguments.max_plies, arguments.book,
+             arguments.ponder)
+
+    # The mouse motion isn't used, it would only wake up the loop
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+    clock = pygame.time.Clock()
+
+    # Game loop: the loop sleeps until an event arrives, so an idle window doesn't use the CPU
     while g.game_state is not GameState.CLOSING:
+        # The AI starts its search in the background when it's its turn
+        g.start_ai_turn()
+
+        # Drawing and rendering of the cells that changed
+        pygame.display.update(g.draw())
+
         # --- Events ---
-        for event in pygame.event.get():
+        for event in wait_events(clock, arguments.fps):
 
             # Closing event
             if event.type == pygame.QUIT:
+                g.stop_ai()
                 g.game_state = GameState.CLOSING
 
-            # Mouse press down event
+            # The window was covered or restored, its content is lost
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                g.redraw_all()
+
+            # The AI found its move
+            if event.type == AI_MOVE_EVENT:
+                g.play_ai_move(event.move)
+
+            if event.type == THINKING_TIMER_EVENT:
+                g.update_thinking_caption()
+
+            # P switches the pondering of the AI on and off
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                g.toggle_ponder()
+
+            # Mouse press down event (the clicks are ignored while the AI thinks)
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # 1 == left button
-
-                    # ===== Player X Turn =====
-                    if g.game_state is GameState.TURN_X:
-                        if g.put_symbol(Symbol.X.value, pygame.mouse.get_pos()):
-                            if g.game_state is not GameState.FINAL:
-                                g.game_state = GameState.TURN_ZERO
-                                g.refresh_board()
-
-                                if not g.is_move_available():
-                                    g.game_state = GameState.TURN_X
-                                    g.refresh_board()
-
-                            else:
-                                print("X is the Winner")
-
-                    # ===== Player Zero Turn =====
-                    elif g.game_state is GameState.TURN_ZERO:
-                        if g.put_symbol(Symbol.Zero.value, pygame.mouse.get_pos()):
-                            if g.game_state is not GameState.FINAL:
-                                g.game_state = GameState.TURN_X
-                                g.refresh_board()
-
-                                if not g.is_move_available():
-                                    g.game_state = GameState.TURN_ZERO
-                                    g.refresh_board()
-                            else:
-                                print("Zero is the Winner")
-
-        # Drawing
-        g.draw()
-
-        # Rendering
-        pygame.display.update()
+                if event.button == 1 and not g.is_ai_turn():  # 1 == left button
+                    symbol = g.get_turn_symbol()
+                    if symbol is not None and g.put_symbol(symbol, pygame.mouse.get_pos()):
+                        g.end_turn(symbol)
@@ -0,0 +1,141 @@
+"""
+Parallel search: the moves of the root are split between the processes of a pool
+
+Every process searches its share of the root moves with its own AlphaBeta and transposition table,
+then the results are merged. Run this module to compare it with the single-process search:
+
+    python parallel.py --workers 8 --depth 5
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import AlphaBeta, BitBoard, Symbol, TranspositionTable, P_MAX, get_opposite_player, NO_ROWS, NO_COLUMNS
+
+
+def search_root_moves(board, player, depth_or_budget, root_moves, memory_mb, history=None):
+    """
+    Searches a share of the root moves - runs in the worker processes
+
+    :return: Tuple (best move, score, nodes)
+    """
+    alpha_beta = AlphaBeta(TranspositionTable(memory_mb))
+    best_move, score = alpha_beta.search(board, player, depth_or_budget, root_moves=root_moves, history=history)
+    return best_move, score, alpha_beta.nodes
+
+
+class ParallelSearch:
+    """
+    Root splitting search over a pool of processes
+
+    The root moves are sorted like in the single-process search (winning and blocking moves first) and dealt
+    round-robin to the workers, so every worker gets a similar share of the promising moves. The results are
+    merged deterministically: the best score wins and equal scores are broken by the order of the root moves.
+    """
+
+    def __init__(self, workers=None, memory_mb=64):
+        self.workers = workers or os.cpu_count()
+        self.memory_mb = memory_mb
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.nodes = 0
+
+        # Orders the root moves and searches the positions that aren't split, in this process
+        self.alpha_beta = AlphaBeta(TranspositionTable(memory_mb))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def search(self, board, player, depth_or_budget, history=None):
+        """
+        :param history: PositionHistory of the game, see AlphaBeta.search
+        :return: Tuple (best move, score) - see AlphaBeta.search
+        """
+        root_moves = list(self.alpha_beta.generate_moves(board, player, 0, None, None))
+
+        # Nothing to split, the single-process search handles the skipped turns and the final boards
+        if len(root_moves) < 2 or board.is_board_final():
+            result = self.alpha_beta.search(board, player, depth_or_budget, history=history)
+            self.nodes = self.alpha_beta.nodes
+            return result
+
+        shares = [root_moves[worker_index::self.workers] for worker_index in range(self.workers)]
+        futures = [self.executor.submit(search_root_moves, board, player, depth_or_budget, share, self.memory_mb,
+                                        history)
+                   for share in shares if share]
+        results = [future.result() for future in futures]
+        self.nodes = sum(nodes for (move, score, nodes) in results)
+
+        def result_priority(result):
+            move, score, nodes = result
+            return -score if player == P_MAX else score, root_moves.index(move)
+
+        best_move, best_score, nodes = min(results, key=result_priority)
+        return best_move, best_score
+
+
+def generate_positions(count, plies, seed, size=(NO_ROWS, NO_COLUMNS)):
+    """
+    :return: List of (board, player to move) reached by playing random moves from the empty board
+    """
+    random_generator = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = BitBoard(no_rows=size[0], no_columns=size[1])
+        player = Symbol.X.value
+        for ply in range(plies):
+            moves_list = board.get_possible_moves(player)
+            if not moves_list:
+                break
+            board.make(random_generator.choice(moves_list))
+            player = get_opposite_player(player)
+        if not board.is_board_final():
+            positions.append((board, player))
+    return positions
+
+
+def benchmark(workers, depth, positions_count, plies, seed, size=(NO_ROWS, NO_COLUMNS)):
+    positions = generate_positions(positions_count, plies, seed, size)
+    single_time = parallel_time = 0.0
+
+    with ParallelSearch(workers) as parallel_search:
+        for (position_index, (board, player)) in enumerate(positions):
+            start = time.perf_counter()
+            alpha_beta = AlphaBeta()
+            single_move, single_score = alpha_beta.search(board, player, depth)
+            single_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parallel_move, parallel_score = parallel_search.search(board, player, depth)
+            parallel_elapsed = time.perf_counter() - start
+
+            single_time += single_elapsed
+            parallel_time += parallel_elapsed
+            print(f"position {position_index}: single {single_elapsed:.2f}s ({alpha_beta.nodes} nodes, "
+                  f"score {single_score}), parallel {parallel_elapsed:.2f}s ({parallel_search.nodes} nodes, "
+                  f"score {parallel_score}), speedup {single_elapsed / parallel_elapsed:.2f}x")
+
+    print(f"total: single {single_time:.2f}s, parallel {parallel_time:.2f}s with {workers} workers, "
+          f"speedup {single_time / parallel_time:.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the parallel search with the single-process search')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--positions', type=int, default=5)
+    parser.add_argument('--plies', type=int, default=6, help='random moves played to create every position')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rows', type=int, default=NO_ROWS)
+    parser.add_argument('--columns', type=int, default=NO_COLUMNS)
+    arguments = parser.parse_args()
+
+    benchmark(arguments.workers, arguments.depth, arguments.positions, arguments.plies, arguments.seed,
+              (arguments.rows, arguments.columns))
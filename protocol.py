@@ -0,0 +1,297 @@
+"""
+Text protocol of the engine, in the style of UCI: one command per line, answered with lines
+
+    uci                                   -> id name <name>, uciok
+    isready                               -> readyok
+    newgame [<rows> <columns>]            starts a new game on an empty board (6x6 if no size is given)
+    position [startpos] [moves <move> ...]
+                                          the position after the moves played from the empty board (X moves
+                                          first); the moves are written like 2,3 (placement) or 2,3-2,4 (slide),
+                                          pass skips a turn
+    go [depth <n>] [time <seconds>] [movetime <ms>] [nodes <n>]
+                                          -> info depth <d> score <s> nodes <n> time <ms> pv <moves>,
+                                             bestmove <move> (bestmove none if the player can't move);
+                                             a game that ended with a line of four is answered with an error
+    stop                                  ends the search, which answers with the best move found so far
+    quit
+
+The scores are from the point of view of Zero (see AlphaBeta). The errors are answered with "error <message>".
+The protocol is served over stdin/stdout by `python protocol.py` and to many sessions over a socket by server.py;
+with --book the positions of an opening book (see book.py) are answered from the book.
+"""
+import argparse
+import sys
+import threading
+
+from book import Book
+from engine import (AlphaBeta, BitBoard, Move, PositionHistory, Symbol, TranspositionTable, get_opposite_player,
+                    DEFAULT_DEPTH, NO_ROWS, NO_COLUMNS)
+from instrumentation import SearchHooks
+
+ENGINE_NAME = 'four-in-a-line'
+PASS = 'pass'
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class SearchRequest:
+    """
+    A search asked by a session: everything needed to search its position in another thread or process
+    """
+
+    def __init__(self, no_rows, no_columns, moves_list, player, depth_or_budget, max_nodes, history):
+        """
+        :param moves_list: The moves played from the empty board, None for a skipped turn
+        :param history: PositionHistory of the game
+        """
+        self.no_rows = no_rows
+        self.no_columns = no_columns
+        self.moves_list = moves_list
+        self.player = player
+        self.depth_or_budget = depth_or_budget
+        self.max_nodes = max_nodes
+        self.history = history
+
+    def get_board(self):
+        board = BitBoard(no_rows=self.no_rows, no_columns=self.no_columns)
+        for move in self.moves_list:
+            if move is not None:
+                board.make(move)
+        return board
+
+
+class Session:
+    """
+    The state of a game driven by the protocol: the size, the moves and the player to move
+
+    The session doesn't search: handle returns a SearchRequest for the go commands, which is searched by
+    a SearchEngine (in a thread for the stdin/stdout protocol, in a worker process for the server).
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.new_game(NO_ROWS, NO_COLUMNS)
+
+    def new_game(self, no_rows, no_columns):
+        self.board = BitBoard(no_rows=no_rows, no_columns=no_columns)
+        self.moves_list = []
+        self.player = Symbol.X.value
+        self.history = PositionHistory()
+        self.history.push(self.board.get_hash(self.player))
+
+    def handle(self, line):
+        """
+        :return: Tuple (list of the lines of the answer, SearchRequest or None)
+        """
+        words = line.split()
+        if not words:
+            return [], None
+
+        command, arguments = words[0], words[1:]
+        try:
+            if command == 'uci':
+                return [f'id name {ENGINE_NAME}', 'uciok'], None
+            if command == 'isready':
+                return ['readyok'], None
+            if command in ('newgame', 'ucinewgame'):
+                self.handle_new_game(arguments)
+                return [], None
+            if command == 'position':
+                self.handle_position(arguments)
+                return [], None
+            if command == 'go':
+                return [], self.get_search_request(arguments)
+            if command == 'quit':
+                self.closed = True
+                return [], None
+            raise ProtocolError(f"unknown command {command}")
+        except (ProtocolError, ValueError) as error:
+            return [f'error {error}'], None
+
+    def handle_new_game(self, arguments):
+        if not arguments:
+            self.new_game(NO_ROWS, NO_COLUMNS)
+        elif len(arguments) == 2:
+            self.new_game(int(arguments[0]), int(arguments[1]))
+        else:
+            raise ProtocolError("newgame takes the number of rows and columns")
+
+    def handle_position(self, arguments):
+        if arguments and arguments[0] == 'startpos':
+            arguments = arguments[1:]
+        if arguments and arguments[0] != 'moves':
+            raise ProtocolError(f"unexpected {arguments[0]} in position")
+
+        board = BitBoard(no_rows=self.board.geometry.no_rows, no_columns=self.board.geometry.no_columns)
+        player = Symbol.X.value
+        history = PositionHistory()
+        history.push(board.get_hash(player))
+        moves_list = []
+        for text in arguments[1:]:
+            if board.is_board_final():
+                raise ProtocolError(f"move {text} after the end of the game")
+            if text == PASS:
+                if board.is_move_available(player):
+                    raise ProtocolError("pass while the player has moves")
+                move = None
+            else:
+                try:
+                    move = Move.from_text(text, player)
+                except ValueError:
+                    raise ProtocolError(f"bad move {text}")
+                if not board.is_legal_move(move):
+                    raise ProtocolError(f"illegal move {text}")
+                board.make(move)
+            moves_list.append(move)
+            player = get_opposite_player(player)
+            history.push(board.get_hash(player))
+
+        self.board, self.player, self.history, self.moves_list = board, player, history, moves_list
+
+    def get_search_request(self, arguments):
+        depth_or_budget = None
+        max_nodes = None
+        for (name, value) in zip(arguments[0::2], arguments[1::2]):
+            if name == 'depth':
+                depth_or_budget = int(value)
+            elif name == 'time':
+                depth_or_budget = float(value)
+            elif name == 'movetime':
+                depth_or_budget = float(value) / 1000
+            elif name == 'nodes':
+                max_nodes = int(value)
+            else:
+                raise ProtocolError(f"unknown go parameter {name}")
+        if len(arguments) % 2:
+            raise ProtocolError(f"go {arguments[-1]} needs a value")
+        # bestmove none means that the player can't move, a search always has at least one iteration
+        if isinstance(depth_or_budget, int) and depth_or_budget < 1:
+            raise ProtocolError("the depth must be at least 1")
+        winner = self.board.is_board_final()
+        if winner:
+            raise ProtocolError(f"the game is over, {Symbol(winner).name} has a line of four")
+
+        if depth_or_budget is None:
+            depth_or_budget = AlphaBeta.MAX_DEPTH - 1 if max_nodes is not None else DEFAULT_DEPTH
+        return SearchRequest(self.board.geometry.no_rows, self.board.geometry.no_columns, list(self.moves_list),
+                             self.player, depth_or_budget, max_nodes, self.history.copy())
+
+
+def format_info(depth, score, stats, line):
+    moves_texts = [move.to_text() if move is not None else PASS for move in line]
+    return (f"info depth {depth} score {score} nodes {stats.nodes} time {int(stats.total_time * 1000)} "
+            f"pv {' '.join(moves_texts)}").rstrip()
+
+
+class InfoHooks(SearchHooks):
+    """
+    Sends an info line after every iteration of the search
+    """
+
+    def __init__(self, send):
+        self.send = send
+
+    def on_iteration(self, depth, score, line, stats):
+        self.send(format_info(depth, score, stats, line))
+
+
+class SearchEngine:
+    """
+    Searches the requests of the sessions; it keeps one AlphaBeta (and transposition table) for every
+    size of the board, shared by the games of that size
+    """
+
+    def __init__(self, memory_mb=16, book=None):
+        """
+        :param book: Path of an opening book, or None
+        """
+        self.memory_mb = memory_mb
+        self.book = Book(book) if book else None
+        self.alpha_betas = {}
+        self.current = None
+
+    def search(self, request, send_info=None):
+        """
+        :param send_info: Function called with the info line of every iteration; if None, only the info
+            of the last iteration is returned
+        :return: List of the lines of the answer (the last one is the bestmove)
+        """
+        size = (request.no_rows, request.no_columns)
+        if size not in self.alpha_betas:
+            self.alpha_betas[size] = AlphaBeta(TranspositionTable(self.memory_mb), book=self.book)
+        alpha_beta = self.alpha_betas[size]
+        alpha_beta.hooks = InfoHooks(send_info) if send_info is not None else None
+
+        self.current = alpha_beta
+        try:
+            move, score = alpha_beta.search(request.get_board(), request.player, request.depth_or_budget,
+                                            max_nodes=request.max_nodes, history=request.history)
+        finally:
+            self.current = None
+
+        lines = []
+        if send_info is None and score is not None:
+            lines.append(format_info(alpha_beta.get_stats().depth, score, alpha_beta.get_stats(),
+                                     alpha_beta.principal_variation or [move]))
+        lines.append(f"bestmove {move.to_text() if move is not None else 'none'}")
+        return lines
+
+    def stop(self):
+        """
+        Asks the running search (from another thread) to answer with the best move found so far
+        """
+        alpha_beta = self.current
+        if alpha_beta is not None:
+            alpha_beta.stop()
+
+
+def run_stdio(input_file=sys.stdin, output_file=sys.stdout, memory_mb=64, book=None):
+    """
+    Serves the protocol over a pair of text files. The search runs in a thread, so stop, isready and quit are
+    answered during the search; the other commands wait for the end of the search, in the order they came.
+    """
+    output_lock = threading.Lock()
+
+    def send(text):
+        with output_lock:
+            output_file.write(text + '\n')
+            output_file.flush()
+
+    def run_search(request):
+        for text in search_engine.search(request, send):
+            send(text)
+
+    session = Session()
+    search_engine = SearchEngine(memory_mb, book)
+    search_thread = None
+    for line in input_file:
+        command = line.split()[:1]
+        if command == ['stop'] or command == ['quit']:
+            search_engine.stop()
+            if command == ['stop']:
+                continue
+        if search_thread is not None and command != ['isready']:
+            search_thread.join()
+            search_thread = None
+
+        responses, request = session.handle(line)
+        for text in responses:
+            send(text)
+        if request is not None:
+            search_thread = threading.Thread(target=run_search, args=(request,), daemon=True)
+            search_thread.start()
+        if session.closed:
+            break
+
+    if search_thread is not None:
+        search_thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the engine protocol over stdin/stdout')
+    parser.add_argument('--memory', type=int, default=64, help='size of the transposition tables in MB')
+    parser.add_argument('--book', help='opening book file (see book.py)')
+    arguments = parser.parse_args()
+    run_stdio(memory_mb=arguments.memory, book=arguments.book)
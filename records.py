@@ -0,0 +1,205 @@
+"""
+Binary records of the games
+
+A file of records starts with FILE_HEADER (magic and version) followed by the games, one after another:
+    game header - GAME_HEADER: rows, columns, result, flags and the number of moves
+    moves       - one uint16 for every move (see pack_move)
+    scores      - one int32 for every move if the flags have HAS_SCORES (NO_SCORE for the moves without a score)
+The games are only appended, so a file can be read while it's written (up to its last complete game).
+All the numbers are little-endian.
+
+    with GameRecordWriter('games.rec') as writer:
+        writer.write(GameRecord(6, 6, moves, result=Symbol.X.value))
+
+    for record in read_records('games.rec'):
+        for (board, move, score) in replay(record):
+            ...
+"""
+import mmap
+import os
+import struct
+
+from engine import BitBoard, Move, NeighborPos, Symbol
+
+MAGIC = b'4LGR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB')
+GAME_HEADER = struct.Struct('<BBBBH')
+
+HAS_SCORES = 1  # Flag of the game header
+NO_RESULT = 255  # Result of the unfinished games (the other results are the winner's Symbol value, 0 for a draw)
+NO_SCORE = -2 ** 31
+
+# Packed move: bits 0-8 the index of to_cell (row * columns + column), bit 9 the player (1 for X),
+# bit 10 set for a slide, bits 11-13 the direction of the slide (index in NeighborPos, from from_cell to to_cell)
+DIRECTIONS = [pos.value for pos in NeighborPos]
+PLAYER_BIT = 1 << 9
+SLIDE_BIT = 1 << 10
+DIRECTION_SHIFT = 11
+
+
+def pack_move(move, no_columns):
+    packed = move.to_cell[0] * no_columns + move.to_cell[1]
+    if move.player == Symbol.X.value:
+        packed |= PLAYER_BIT
+    if move.from_cell is not None:
+        direction = (move.to_cell[0] - move.from_cell[0], move.to_cell[1] - move.from_cell[1])
+        packed |= SLIDE_BIT | (DIRECTIONS.index(direction) << DIRECTION_SHIFT)
+    return packed
+
+
+def unpack_move(packed, no_columns):
+    to_cell = divmod(packed & (PLAYER_BIT - 1), no_columns)
+    player = Symbol.X.value if packed & PLAYER_BIT else Symbol.Zero.value
+    if not packed & SLIDE_BIT:
+        return Move(player, None, to_cell)
+    row_step, column_step = DIRECTIONS[packed >> DIRECTION_SHIFT]
+    return Move(player, (to_cell[0] - row_step, to_cell[1] - column_step), to_cell)
+
+
+class GameRecord:
+    """
+    A game: the size of the board, the moves from the empty board, the result and optionally the score
+    given by the engine to every move
+
+    The moves read from a file are kept packed and decoded the first time they are used, so scanning the
+    headers (size, result, length) of many games is cheap.
+    """
+
+    def __init__(self, no_rows, no_columns, moves=None, result=None, scores=None, packed_moves=None):
+        """
+        :param moves: List of Move
+        :param result: The Symbol value of the winner, 0 for a draw, None if the game isn't finished
+        :param scores: List with the score (int or None) of every move, or None
+        """
+        self.no_rows = no_rows
+        self.no_columns = no_columns
+        self.result = result
+        self.scores = scores
+        self.decoded_moves = moves
+        self.packed_moves = packed_moves
+
+    @property
+    def moves(self):
+        if self.decoded_moves is None:
+            self.decoded_moves = [unpack_move(packed, self.no_columns) for packed in self.packed_moves]
+        return self.decoded_moves
+
+    def __len__(self):
+        return len(self.packed_moves) if self.decoded_moves is None else len(self.decoded_moves)
+
+    def to_bytes(self):
+        moves_count = len(self)
+        flags = HAS_SCORES if self.scores is not None else 0
+        result = NO_RESULT if self.result is None else self.result
+        packed_moves = self.packed_moves
+        if packed_moves is None:
+            packed_moves = [pack_move(move, self.no_columns) for move in self.decoded_moves]
+
+        data = GAME_HEADER.pack(self.no_rows, self.no_columns, result, flags, moves_count)
+        data += struct.pack(f'<{moves_count}H', *packed_moves)
+        if self.scores is not None:
+            data += struct.pack(f'<{moves_count}i', *(NO_SCORE if score is None else score for score in self.scores))
+        return data
+
+    @classmethod
+    def from_buffer(cls, buffer, offset):
+        """
+        :return: Tuple (record, offset after the record), or (None, offset) if the buffer ends before the record
+        """
+        if offset + GAME_HEADER.size > len(buffer):
+            return None, offset
+        no_rows, no_columns, result, flags, moves_count = GAME_HEADER.unpack_from(buffer, offset)
+        moves_offset = offset + GAME_HEADER.size
+        scores_offset = moves_offset + 2 * moves_count
+        end = scores_offset + (4 * moves_count if flags & HAS_SCORES else 0)
+        if end > len(buffer):
+            return None, offset
+
+        packed_moves = struct.unpack_from(f'<{moves_count}H', buffer, moves_offset)
+        scores = None
+        if flags & HAS_SCORES:
+            scores = [None if score == NO_SCORE else score
+                      for score in struct.unpack_from(f'<{moves_count}i', buffer, scores_offset)]
+
+        record = cls(no_rows, no_columns, result=None if result == NO_RESULT else result, scores=scores,
+                     packed_moves=packed_moves)
+        return record, end
+
+
+class GameRecordWriter:
+    """
+    Appends games to a file of records; the file is created (with its header) if it doesn't exist
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        self.file.write(record.to_bytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_records(path):
+    """
+    Reads the games of a file of records one by one from a memory map of the file, so the file
+    isn't loaded in memory
+
+    :return: Generator of GameRecord
+    """
+    with open(path, 'rb') as records_file:
+        if os.fstat(records_file.fileno()).st_size < FILE_HEADER.size:
+            return
+        with mmap.mmap(records_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, version = FILE_HEADER.unpack_from(buffer, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} isn't a file of game records (version {VERSION})")
+
+            offset = FILE_HEADER.size
+            while True:
+                record, offset = GameRecord.from_buffer(buffer, offset)
+                if record is None:
+                    break
+                yield record
+
+
+def replay(record, board_class=BitBoard):
+    """
+    Plays the moves of the record on a new board, checking them with the rules of the engine
+
+    :return: Generator of (board, move, score) with the board before the move; the same board is
+        used for the whole game, copy it to keep a position
+    """
+    board = board_class(no_rows=record.no_rows, no_columns=record.no_columns)
+    scores = record.scores if record.scores is not None else [None] * len(record)
+    for (move, score) in zip(record.moves, scores):
+        if not board.is_legal_move(move):
+            raise ValueError(f"Illegal move {move.to_text()} of the player {move.player}")
+        yield board, move, score
+        board.make(move)
+
+
+def get_final_board(record, board_class=BitBoard):
+    """
+    :return: The board after the last move of the record
+    """
+    board = None
+    for (board, move, score) in replay(record, board_class):
+        pass
+    if board is None:
+        return board_class(no_rows=record.no_rows, no_columns=record.no_columns)
+    board.make(record.moves[-1])
+    return board
@@ -0,0 +1,272 @@
+"""
+Self-play tournament: plays engine-vs-engine games without a window
+
+Every game starts from an opening (a list of moves read from a file or random moves) and the two sides search
+with their own depth or time budget. The games are played in parallel by a pool of processes, the result and
+the statistics of every game are written as JSON lines and a summary (games/sec, nodes/sec) is printed.
+The games can also be appended to a binary file of records (see records.py):
+
+    python selfplay.py --games 20 --x-depth 3 --zero-depth 4 --output results.jsonl --record games.rec
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (AlphaBeta, BitBoard, Move, PositionHistory, Symbol, TranspositionTable, get_opposite_player,
+                    NO_ROWS, NO_COLUMNS)
+from book import Book
+from records import GameRecord, GameRecordWriter
+from tablebase import Tablebase
+
+# Games that reach this number of plies or repeat a position this number of times are draws
+# (the slides can go on forever)
+DEFAULT_MAX_PLIES = 200
+DEFAULT_REPETITIONS = PositionHistory.DEFAULT_REPETITIONS
+
+PLAYER_NAMES = {Symbol.X.value: 'X', Symbol.Zero.value: 'Zero'}
+PLAYER_VALUES = {'X': Symbol.X.value, 'Zero': Symbol.Zero.value, 'draw': 0}
+
+
+def random_opening(plies, random_generator, size=(NO_ROWS, NO_COLUMNS)):
+    """
+    :param size: Tuple (rows, columns) of the board
+    :return: List of the texts of up to plies random moves, played from the empty board (X starts)
+    """
+    board = BitBoard(no_rows=size[0], no_columns=size[1])
+    player = Symbol.X.value
+    opening = []
+    for ply in range(plies):
+        moves_list = board.get_possible_moves(player)
+        if not moves_list:
+            break
+        move = random_generator.choice(moves_list)
+        board.make(move)
+        if board.is_board_final():
+            board.unmake(move)
+            break
+        opening.append(move.to_text())
+        player = get_opposite_player(player)
+    return opening
+
+
+def read_openings(path):
+    """
+    :return: List of openings, one per line of the file: the moves separated by spaces (see Move.to_text)
+    """
+    with open(path) as openings_file:
+        return [line.split() for line in openings_file if line.strip() and not line.startswith('#')]
+
+
+def play_game(game_index, opening, budgets, max_plies=DEFAULT_MAX_PLIES, search_stats=False,
+              size=(NO_ROWS, NO_COLUMNS), repetitions=DEFAULT_REPETITIONS, tablebase=None,
+              book=None):
+    """
+    Plays a game between two engines, each side keeps its own transposition table for the whole game
+
+    :param opening: List of the texts of the first moves
+    :param budgets: Dictionary player -> the depth (int) or the time budget in seconds (float) of its searches
+    :param max_plies: The game is a draw after this number of plies (the skipped turns included)
+    :param search_stats: If True, the statistics of every search are added to the result (see SearchStats)
+    :param size: Tuple (rows, columns) of the board
+    :param repetitions: The game is a draw when a position is reached this number of times (None for no limit)
+    :param tablebase: Path of a tablebase file (see tablebase.py) probed by both engines, or None
+    :param book: Path of an opening book (see book.py) played by both engines, or None; its moves are chosen at
+        random with the seed of the game
+    :return: Dictionary with the result and the statistics of the game
+    """
+    board = BitBoard(no_rows=size[0], no_columns=size[1])
+    player = Symbol.X.value
+    history = PositionHistory(repetitions, max_plies)
+    history.push(board.get_hash(player))
+    moves_texts = []
+    players = []
+    scores = []  # Score of the search of every move, None for the moves of the opening
+
+    for text in opening:
+        move = Move.from_text(text, player)
+        if not board.is_legal_move(move):
+            raise ValueError(f"Illegal move {text} in the opening {' '.join(opening)}")
+        board.make(move)
+        moves_texts.append(text)
+        players.append(PLAYER_NAMES[player])
+        scores.append(None)
+        player = get_opposite_player(player)
+        history.push(board.get_hash(player))
+
+    endgames = Tablebase(tablebase) if tablebase else None
+    openings = Book(book, seed=game_index) if book else None
+    engines = {side: AlphaBeta(TranspositionTable(), tablebase=endgames, book=openings) for side in budgets}
+    stats = {side: {'nodes': 0, 'moves': 0, 'time': 0.0} for side in budgets}
+    winner = board.is_board_final()
+    passes = 0
+    searches = []
+    end = 'line' if winner else None
+
+    while not winner:
+        if history.is_draw():
+            end = 'repetition' if history.is_repetition() else 'move_limit'
+            break
+
+        start = time.perf_counter()
+        move, score = engines[player].search(board, player, budgets[player], history=history)
+        stats[player]['time'] += time.perf_counter() - start
+        stats[player]['nodes'] += engines[player].nodes
+        if search_stats:
+            searches.append(dict(engines[player].get_stats().to_dict(), player=PLAYER_NAMES[player]))
+
+        if move is None:
+            # The player doesn't have any moves and skips the turn, if neither player can move it's a draw
+            passes += 1
+            if passes == 2:
+                end = 'no_moves'
+                break
+        else:
+            passes = 0
+            board.make(move)
+            moves_texts.append(move.to_text())
+            players.append(PLAYER_NAMES[player])
+            scores.append(score)
+            stats[player]['moves'] += 1
+            winner = board.is_board_final()
+            if winner:
+                end = 'line'
+
+        player = get_opposite_player(player)
+        history.push(board.get_hash(player))
+
+    sides = {}
+    for (side, side_stats) in stats.items():
+        sides[PLAYER_NAMES[side]] = {
+            'budget': budgets[side],
+            'nodes': side_stats['nodes'],
+            'moves': side_stats['moves'],
+            'nodes_per_second': side_stats['nodes'] / side_stats['time'] if side_stats['time'] else 0.0,
+            'average_move_time': side_stats['time'] / side_stats['moves'] if side_stats['moves'] else 0.0,
+        }
+
+    result = {
+        'game': game_index,
+        'size': list(size),
+        'opening': opening,
+        'result': PLAYER_NAMES[winner] if winner else 'draw',
+        'end': end,  # 'line', 'repetition', 'move_limit' or 'no_moves'
+        'length': len(moves_texts),
+        'moves': moves_texts,
+        'players': players,
+        'scores': scores,
+        'sides': sides,
+        'nodes': sum(side_stats['nodes'] for side_stats in stats.values()),
+        'search_time': sum(side_stats['time'] for side_stats in stats.values()),
+    }
+    if search_stats:
+        result['searches'] = searches
+    return result
+
+
+def get_game_record(result):
+    """
+    :param result: The result of play_game
+    :return: GameRecord of the game, with the scores of the searched moves
+    """
+    moves_list = [Move.from_text(text, PLAYER_VALUES[name]) for (text, name) in zip(result['moves'], result['players'])]
+    return GameRecord(result['size'][0], result['size'][1], moves_list, result=PLAYER_VALUES[result['result']],
+                      scores=result['scores'])
+
+
+def play_tournament(games, openings, budgets, workers=None, max_plies=DEFAULT_MAX_PLIES, output=None,
+                    search_stats=False, size=(NO_ROWS, NO_COLUMNS), record=None, repetitions=DEFAULT_REPETITIONS,
+                    tablebase=None, book=None):
+    """
+    Plays the games in parallel, game i starts from openings[i % len(openings)]
+
+    :param output: Path of the JSON lines file with the results of the games, nothing is written if None
+    :param record: Path of the file of records the games are appended to, nothing is written if None
+    :return: Tuple (list of the results in the order of the games, wall time in seconds)
+    """
+    start = time.perf_counter()
+    results = []
+    output_file = open(output, 'w') if output else None
+    record_writer = GameRecordWriter(record) if record else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_game, game_index, openings[game_index % len(openings)], budgets,
+                                       max_plies, search_stats, size, repetitions, tablebase, book)
+                       for game_index in range(games)]
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if output_file:
+                    output_file.write(json.dumps(result) + '\n')
+                if record_writer:
+                    record_writer.write(get_game_record(result))
+    finally:
+        if output_file:
+            output_file.close()
+        if record_writer:
+            record_writer.close()
+    return results, time.perf_counter() - start
+
+
+def print_summary(results, wall_time):
+    outcomes = {'X': 0, 'Zero': 0, 'draw': 0}
+    for result in results:
+        outcomes[result['result']] += 1
+
+    nodes = sum(result['nodes'] for result in results)
+    search_time = sum(result['search_time'] for result in results)
+    moves = sum(side['moves'] for result in results for side in result['sides'].values())
+
+    print(f"{len(results)} games in {wall_time:.2f}s: X {outcomes['X']}, Zero {outcomes['Zero']}, "
+          f"draws {outcomes['draw']}")
+    print(f"games/sec {len(results) / wall_time:.3f}, nodes/sec {nodes / search_time if search_time else 0:.0f} "
+          f"(per process), average move time {search_time / moves if moves else 0:.4f}s, "
+          f"average game length {sum(result['length'] for result in results) / len(results):.1f}")
+
+
+def get_budget(depth, seconds):
+    # A time budget has priority over the depth
+    return float(seconds) if seconds is not None else depth
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play engine-vs-engine games without a window')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=NO_ROWS)
+    parser.add_argument('--columns', type=int, default=NO_COLUMNS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--x-depth', type=int, default=3)
+    parser.add_argument('--zero-depth', type=int, default=3)
+    parser.add_argument('--x-time', type=float, help='time budget of X per move in seconds (instead of the depth)')
+    parser.add_argument('--zero-time', type=float, help='time budget of Zero per move in seconds')
+    parser.add_argument('--openings', help='file with one opening per line (moves like 2,3 or 2,3-2,4)')
+    parser.add_argument('--opening-plies', type=int, default=4, help='random moves of the generated openings')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--repetitions', type=int, default=DEFAULT_REPETITIONS,
+                        help='a position reached this number of times ends the game in a draw')
+    parser.add_argument('--output', help='JSON lines file for the results of the games')
+    parser.add_argument('--search-stats', action='store_true', help='add the statistics of every search to the results')
+    parser.add_argument('--record', help='binary file of records the games are appended to')
+    parser.add_argument('--tablebase', help='tablebase file of the endgames (see tablebase.py)')
+    parser.add_argument('--book', help='opening book file (see book.py)')
+    arguments = parser.parse_args()
+    board_size = (arguments.rows, arguments.columns)
+
+    if arguments.openings:
+        tournament_openings = read_openings(arguments.openings)
+    else:
+        generator = random.Random(arguments.seed)
+        tournament_openings = [random_opening(arguments.opening_plies, generator, board_size) for i in range(arguments.games)]
+
+    tournament_budgets = {Symbol.X.value: get_budget(arguments.x_depth, arguments.x_time),
+                          Symbol.Zero.value: get_budget(arguments.zero_depth, arguments.zero_time)}
+
+    tournament_results, tournament_time = play_tournament(arguments.games, tournament_openings, tournament_budgets,
+                                                          arguments.workers, arguments.max_plies, arguments.output,
+                                                          arguments.search_stats, board_size, arguments.record,
+                                                          arguments.repetitions, arguments.tablebase,
+                                                          arguments.book)
+    print_summary(tournament_results, tournament_time)
@@ -0,0 +1,337 @@
+"""
+Engine server: serves the text protocol of protocol.py to many concurrent sessions over TCP
+
+Every connection is an independent session (its own game). The searches of all the sessions go through one
+queue to a pool of worker processes; the queue has a maximum size, so when the workers can't keep up the
+server stops reading the commands of the sessions that ask for more searches (back-pressure) instead of
+buffering them. Every session has at most one search at a time; stop ends the search of the session (a
+search that is still waiting in the queue is answered with a search of depth 1).
+
+    python server.py serve --port 7878 --workers 4
+    python server.py load --port 7878 --sessions 32 --requests 1000 --depth 3
+
+load is a load generator: its sessions play engine-vs-engine games through the server and it prints the moves
+served per second and the latency percentiles of the searches (with --serve it starts its own server).
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+from engine import BitBoard, Move, Symbol, get_opposite_player, NO_ROWS, NO_COLUMNS
+from protocol import SearchEngine, Session
+from selfplay import random_opening
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7878
+DEFAULT_MAX_QUEUE = 64  # Searches waiting for a worker; more searches wait in the sessions (back-pressure)
+DEFAULT_MAX_PLIES = 100  # The load generator starts a new game after this number of plies
+
+
+def run_worker(connection, memory_mb, book=None):
+    """
+    The loop of a worker process: the searches run in a thread, so the main thread keeps reading the stop
+    requests; the answer is sent by the search thread. The opening book is opened by every worker, its
+    memory map is shared by all of them.
+    """
+    search_engine = SearchEngine(memory_mb, book)
+    running_id = None
+
+    def run_search(request_id, request):
+        connection.send((request_id, search_engine.search(request)))
+
+    search_thread = None
+    while True:
+        message = connection.recv()
+        if message[0] == 'search':
+            if search_thread is not None:
+                search_thread.join()
+            running_id = message[1]
+            search_thread = threading.Thread(target=run_search, args=(message[1], message[2]), daemon=True)
+            search_thread.start()
+        elif message[0] == 'stop':
+            # A stop that came after the end of its search is ignored by the next search
+            if message[1] == running_id:
+                search_engine.stop()
+        elif message[0] == 'close':
+            search_engine.stop()
+            break
+
+
+class PendingSearch:
+    """
+    A search of a session, from the go command to the answer
+    """
+
+    def __init__(self, request_id, request, future):
+        self.request_id = request_id
+        self.request = request
+        self.future = future  # The lines of the answer
+        self.worker = None  # The connection of the worker process that runs the search
+
+
+class EngineServer:
+    """
+    asyncio server of the protocol with a pool of worker processes (each with its transposition tables)
+    """
+
+    def __init__(self, workers=None, max_queue=DEFAULT_MAX_QUEUE, memory_mb=16, book=None):
+        """
+        :param book: Path of an opening book used by the workers, or None
+        """
+        self.workers_count = workers or os.cpu_count()
+        self.max_queue = max_queue
+        self.memory_mb = memory_mb
+        self.book = book
+        self.queue = None
+        self.processes = []
+        self.dispatchers = []
+        self.server = None
+        self.clients = {}  # The task of every connected session -> its stream writer
+        self.next_request_id = 0
+
+        # Statistics
+        self.sessions = 0
+        self.served = 0
+        self.max_queued = 0
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        for worker_index in range(self.workers_count):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_worker, args=(child_connection, self.memory_mb, self.book),
+                                              daemon=True)
+            process.start()
+            self.processes.append((process, parent_connection))
+            self.dispatchers.append(asyncio.create_task(self.dispatch(parent_connection)))
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # The sessions end when their connections are closed, then the dispatchers are cancelled
+        for writer in self.clients.values():
+            writer.close()
+        await asyncio.gather(*self.clients, return_exceptions=True)
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for (process, connection) in self.processes:
+            connection.send(('close',))
+            process.join()
+
+    async def dispatch(self, connection):
+        """
+        Runs the searches of the queue on one worker process, one after another
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self.queue.get()
+            answer = loop.create_future()
+            loop.add_reader(connection.fileno(), lambda: answer.done() or answer.set_result(connection.recv()))
+            try:
+                pending.worker = connection
+                connection.send(('search', pending.request_id, pending.request))
+                request_id, lines = await answer
+            finally:
+                loop.remove_reader(connection.fileno())
+                pending.worker = None
+            self.served += 1
+            pending.future.set_result(lines)
+
+    async def handle_client(self, reader, writer):
+        session = Session()
+        self.sessions += 1
+        self.clients[asyncio.current_task()] = writer
+        pending = None
+        answer_task = None
+
+        async def send_answer(search):
+            lines = await search.future
+            writer.write(''.join(line + '\n' for line in lines).encode())
+            await writer.drain()
+
+        try:
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().strip()
+
+                if command == 'stop':
+                    self.stop(pending)
+                    continue
+                if pending is not None and not pending.future.done() and command.split()[:1] != ['isready']:
+                    # The commands of the session are handled in order: they wait for the end of its search
+                    await answer_task
+
+                try:
+                    responses, request = session.handle(command)
+                except Exception as error:
+                    # A command that the session doesn't handle must not end the connection
+                    logger.exception("Command %r failed", command)
+                    responses, request = [f'error {type(error).__name__}'], None
+                if responses:
+                    writer.write(''.join(response + '\n' for response in responses).encode())
+                    await writer.drain()
+                if request is not None:
+                    self.next_request_id += 1
+                    pending = PendingSearch(self.next_request_id, request, asyncio.get_running_loop().create_future())
+                    await self.queue.put(pending)  # Waits while the queue is full
+                    self.max_queued = max(self.max_queued, self.queue.qsize())
+                    answer_task = asyncio.create_task(send_answer(pending))
+
+            if answer_task is not None:
+                self.stop(pending)
+                await answer_task
+        except ConnectionError:
+            pass
+        finally:
+            del self.clients[asyncio.current_task()]
+            writer.close()
+
+    def stop(self, pending):
+        if pending is None or pending.future.done():
+            return
+        if pending.worker is not None:
+            pending.worker.send(('stop', pending.request_id))
+        else:
+            # The search is still in the queue
+            pending.request.depth_or_budget = 1
+            pending.request.max_nodes = None
+
+
+async def run_load_session(host, port, session_index, arguments, counters, latencies):
+    """
+    A client of the load generator: plays engine-vs-engine games through the server until the requests are over
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    random_generator = random.Random(arguments.seed + session_index)
+    go_command = f"go depth {arguments.depth}"
+    if arguments.time is not None:
+        go_command = f"go time {arguments.time}"
+    if arguments.nodes is not None:
+        go_command += f" nodes {arguments.nodes}"
+
+    writer.write(f"newgame {arguments.rows} {arguments.columns}\n".encode())
+    while counters['remaining'] > 0:
+        # A new game from a random opening
+        moves_texts = random_opening(arguments.opening_plies, random_generator, (arguments.rows, arguments.columns))
+        board = BitBoard(no_rows=arguments.rows, no_columns=arguments.columns)
+        player = Symbol.X.value
+        for text in moves_texts:
+            board.make(Move.from_text(text, player))
+            player = get_opposite_player(player)
+
+        while counters['remaining'] > 0 and len(moves_texts) < arguments.max_plies and not board.is_board_final():
+            counters['remaining'] -= 1
+            writer.write(f"position startpos moves {' '.join(moves_texts)}\n{go_command}\n".encode())
+            await writer.drain()
+            start = time.perf_counter()
+            while True:
+                line = (await reader.readline()).decode().split()
+                if not line or line[0] == 'bestmove' or line[0] == 'error':
+                    break
+            latencies.append(time.perf_counter() - start)
+            if not line or line[0] == 'error':
+                raise RuntimeError(f"The server answered {' '.join(line)}")
+
+            if line[1] == 'none':
+                moves_texts.append('pass')
+            else:
+                board.make(Move.from_text(line[1], player))
+                moves_texts.append(line[1])
+            player = get_opposite_player(player)
+
+    writer.write(b"quit\n")
+    await writer.drain()
+    writer.close()
+
+
+def get_percentile(sorted_values, percent):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+async def run_load(arguments):
+    """
+    :return: Dictionary with the moves served per second and the latency percentiles (in seconds)
+    """
+    server = None
+    if arguments.serve:
+        server = EngineServer(arguments.workers, arguments.max_queue, book=arguments.book)
+        await server.start(arguments.host, arguments.port)
+
+    counters = {'remaining': arguments.requests}
+    latencies = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_load_session(arguments.host, arguments.port, session_index, arguments, counters,
+                                                latencies)
+                               for session_index in range(arguments.sessions)))
+    finally:
+        if server is not None:
+            await server.close()
+    wall_time = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'moves': len(latencies),
+        'wall_time': wall_time,
+        'moves_per_second': len(latencies) / wall_time,
+        'p50': get_percentile(latencies, 50),
+        'p90': get_percentile(latencies, 90),
+        'p99': get_percentile(latencies, 99),
+        'max': latencies[-1],
+        'max_queued': server.max_queued if server is not None else None,
+    }
+
+
+async def serve(arguments):
+    server = EngineServer(arguments.workers, arguments.max_queue, book=arguments.book)
+    asyncio_server = await server.start(arguments.host, arguments.port)
+    print(f"Serving on {arguments.host}:{arguments.port} with {server.workers_count} workers")
+    try:
+        await asyncio_server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the engine protocol over TCP or load test a server')
+    parser.add_argument('mode', choices=['serve', 'load'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument('--book', help='opening book file of the workers (see book.py)')
+    parser.add_argument('--serve', action='store_true', help='load: start a server in this process')
+    parser.add_argument('--sessions', type=int, default=16, help='load: concurrent sessions')
+    parser.add_argument('--requests', type=int, default=500, help='load: number of searches')
+    parser.add_argument('--depth', type=int, default=3, help='load: depth of the searches')
+    parser.add_argument('--time', type=float, help='load: time budget of the searches in seconds')
+    parser.add_argument('--nodes', type=int, help='load: node budget of the searches')
+    parser.add_argument('--rows', type=int, default=NO_ROWS)
+    parser.add_argument('--columns', type=int, default=NO_COLUMNS)
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    if arguments.mode == 'serve':
+        asyncio.run(serve(arguments))
+    else:
+        load_results = asyncio.run(run_load(arguments))
+        print(f"{load_results['moves']} moves in {load_results['wall_time']:.2f}s: "
+              f"{load_results['moves_per_second']:.1f} moves/sec")
+        print(f"latency p50 {load_results['p50'] * 1000:.1f}ms, p90 {load_results['p90'] * 1000:.1f}ms, "
+              f"p99 {load_results['p99'] * 1000:.1f}ms, max {load_results['max'] * 1000:.1f}ms")
+        if load_results['max_queued'] is not None:
+            print(f"max queued searches {load_results['max_queued']}")
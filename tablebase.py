@@ -0,0 +1,392 @@
+"""
+Retrograde solver and endgame tablebase
+
+The symbols are never taken off the board (a placement adds one, a slide moves one), so the positions with at
+most max_empty empty cells can only lead to positions with at most max_empty empty cells: they form an endgame
+that is solved exactly. Every position of the endgame (the symbols and the player to move) is labelled a win, a
+loss or a draw for the player to move, with the number of plies to the end of the game:
+    1. the positions with a line of four are lost by the player to move (distance 0)
+    2. going back from the solved positions (retrograde moves), a position with a move to a lost position is won,
+       a position whose moves all go to won positions is lost
+    3. the positions that are never solved are draws (the players can keep sliding or neither player can move)
+A player without moves skips the turn, like in AlphaBeta.
+
+The labels are written to a file with one uint16 per position (little-endian), in the order of the perfect index
+of TablebaseIndex, and read through a memory map, so the tablebase is shared by all the processes that use it.
+The whole 6x6 game (3^36 positions) is far too large for this, the endgames with a few empty cells of the small
+boards are not:
+
+    python tablebase.py --rows 4 --columns 4 --max-empty 2 --output tablebase_4x4.tb
+
+    alpha_beta = AlphaBeta(tablebase=Tablebase('tablebase_4x4.tb'))
+"""
+import argparse
+import mmap
+import struct
+import sys
+import time
+from array import array
+from math import comb
+
+from engine import BitBoard, BoardGeometry, Evaluation, X_VALUE, ZERO_VALUE, get_opposite_player
+
+MAGIC = b'4LTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBB')  # magic, version, rows, columns, max_empty
+
+# A label: the result for the player to move in the bits 0-1 and the distance (plies) in the other bits
+DRAW = 0
+WIN = 1
+LOSS = 2
+RESULT_MASK = 3
+DISTANCE_SHIFT = 2
+
+
+def get_label(result, distance):
+    return result | (distance << DISTANCE_SHIFT)
+
+
+class TablebaseIndex:
+    """
+    The rules of the game on flat bitboards (cell row * columns + column) and the perfect index of the positions
+    with at most max_empty empty cells
+
+    The index of a position counts the positions with fewer empty cells, then the set of the empty cells (its rank
+    in the combinatorial number system), then the symbols of the other cells (one bit per cell, 1 for Zero) and
+    the player to move.
+    """
+
+    def __init__(self, no_rows, no_columns, max_empty):
+        geometry = BoardGeometry.get(no_rows, no_columns)
+        self.no_rows = no_rows
+        self.no_columns = no_columns
+        self.max_empty = max_empty
+        self.cell_count = no_rows * no_columns
+        self.full_mask = (1 << self.cell_count) - 1
+
+        # The masks of the rules, from the geometry of the engine
+        self.window_masks = [sum(1 << geometry.flat_index(cell_index) for cell_index in window)
+                             for window in geometry.windows]
+        self.orthogonal_masks = [sum(1 << geometry.flat_index(neighbor) for neighbor in
+                                     geometry.orthogonal_neighbors[cell_index]) for cell_index in geometry.cells]
+        self.neighbor_cells = [[geometry.flat_index(neighbor) for neighbor in geometry.neighbors[cell_index]]
+                               for cell_index in geometry.cells]
+
+        # Index of the first position of every number of empty cells
+        self.level_offsets = []
+        offset = 0
+        for empty_count in range(max_empty + 1):
+            self.level_offsets.append(offset)
+            offset += 2 * comb(self.cell_count, empty_count) * 2 ** (self.cell_count - empty_count)
+        self.size = offset
+
+    # ------ Rules ------ #
+    def get_winner(self, x_bits, zero_bits):
+        """
+        :return: The player with a line of four (X is checked first, like LineWindows.get_winner) or None
+        """
+        for window_mask in self.window_masks:
+            if x_bits & window_mask == window_mask:
+                return X_VALUE
+        for window_mask in self.window_masks:
+            if zero_bits & window_mask == window_mask:
+                return ZERO_VALUE
+        return None
+
+    def generate_successors(self, own_bits, opponent_bits):
+        """
+        Generates (move, own bits after the move) for every move of the player that owns own_bits; the move is
+        (from cell or None, to cell) in flat cells
+        """
+        empty_bits = self.full_mask & ~(own_bits | opponent_bits)
+        orthogonal_masks = self.orthogonal_masks
+        bits = empty_bits
+        while bits:
+            bit = bits & -bits
+            cell = bit.bit_length() - 1
+            bits ^= bit
+            if (opponent_bits & orthogonal_masks[cell]).bit_count() <= (own_bits & orthogonal_masks[cell]).bit_count():
+                yield (None, cell), own_bits | bit
+
+        bits = own_bits
+        while bits:
+            bit = bits & -bits
+            cell = bit.bit_length() - 1
+            bits ^= bit
+            for neighbor in self.neighbor_cells[cell]:
+                if empty_bits >> neighbor & 1:
+                    yield (cell, neighbor), own_bits ^ bit | (1 << neighbor)
+
+    def has_moves(self, own_bits, opponent_bits):
+        for successor in self.generate_successors(own_bits, opponent_bits):
+            return True
+        return False
+
+    def generate_predecessors(self, own_bits, opponent_bits):
+        """
+        Generates the opponent bits before every move of the opponent that leads to this position (own_bits is the
+        player to move); the positions before the move aren't final and are in the index
+        """
+        empty_bits = self.full_mask & ~(own_bits | opponent_bits)
+        empty_count = empty_bits.bit_count()
+        orthogonal_masks = self.orthogonal_masks
+        bits = opponent_bits
+        while bits:
+            bit = bits & -bits
+            cell = bit.bit_length() - 1
+            bits ^= bit
+
+            # A placement on the cell, which had to be legal
+            if empty_count < self.max_empty and (own_bits & orthogonal_masks[cell]).bit_count() <= (
+                    (opponent_bits & orthogonal_masks[cell]).bit_count()):
+                yield opponent_bits ^ bit
+
+            # A slide to the cell from an empty neighbor
+            for neighbor in self.neighbor_cells[cell]:
+                if empty_bits >> neighbor & 1:
+                    yield opponent_bits ^ bit | (1 << neighbor)
+
+    # ------ Index ------ #
+    def get_index(self, x_bits, zero_bits, player):
+        empty_bits = self.full_mask & ~(x_bits | zero_bits)
+        empty_count = empty_bits.bit_count()
+        empty_rank = 0
+        pattern = 0
+        pattern_bit = 0
+        empty_seen = 0
+        for cell in range(self.cell_count):
+            if empty_bits >> cell & 1:
+                empty_seen += 1
+                empty_rank += comb(cell, empty_seen)
+            else:
+                pattern |= (zero_bits >> cell & 1) << pattern_bit
+                pattern_bit += 1
+        layout_index = empty_rank * (1 << (self.cell_count - empty_count)) + pattern
+        return self.level_offsets[empty_count] + 2 * layout_index + (player == ZERO_VALUE)
+
+    def get_position(self, index):
+        """
+        :return: Tuple (x bits, zero bits, player to move) of the index
+        """
+        empty_count = max(level for level in range(self.max_empty + 1) if self.level_offsets[level] <= index)
+        layout_index, player_bit = divmod(index - self.level_offsets[empty_count], 2)
+        empty_rank, pattern = divmod(layout_index, 1 << (self.cell_count - empty_count))
+
+        # The empty cells from their rank, the largest first
+        empty_bits = 0
+        cell = self.cell_count
+        for count in range(empty_count, 0, -1):
+            cell -= 1
+            while comb(cell, count) > empty_rank:
+                cell -= 1
+            empty_rank -= comb(cell, count)
+            empty_bits |= 1 << cell
+
+        x_bits = zero_bits = 0
+        pattern_bit = 0
+        for cell in range(self.cell_count):
+            if not empty_bits >> cell & 1:
+                if pattern >> pattern_bit & 1:
+                    zero_bits |= 1 << cell
+                else:
+                    x_bits |= 1 << cell
+                pattern_bit += 1
+        return x_bits, zero_bits, ZERO_VALUE if player_bit else X_VALUE
+
+    def get_board_bits(self, board):
+        """
+        :return: Tuple (x bits, zero bits) of the board (Board or BitBoard) on the flat cells of the index
+        """
+        if isinstance(board, BitBoard):
+            stride = board.geometry.stride
+            row_mask = (1 << self.no_columns) - 1
+            x_bits = zero_bits = 0
+            for row_index in range(self.no_rows):
+                x_bits |= (board.x_bits >> (row_index * stride) & row_mask) << (row_index * self.no_columns)
+                zero_bits |= (board.zero_bits >> (row_index * stride) & row_mask) << (row_index * self.no_columns)
+            return x_bits, zero_bits
+
+        x_bits = zero_bits = 0
+        for cell_index in board.geometry.cells:
+            value = board.get_cell(cell_index)
+            if value == X_VALUE:
+                x_bits |= 1 << board.geometry.flat_index(cell_index)
+            elif value == ZERO_VALUE:
+                zero_bits |= 1 << board.geometry.flat_index(cell_index)
+        return x_bits, zero_bits
+
+
+def solve(no_rows, no_columns, max_empty, log=None):
+    """
+    Retrograde analysis of the positions with at most max_empty empty cells
+
+    :param log: Function called with the progress messages, or None
+    :return: Tuple (TablebaseIndex, array('H') with the label of every index)
+    """
+    index = TablebaseIndex(no_rows, no_columns, max_empty)
+    labels = array('H', bytes(2 * index.size))
+    move_counts = array('H', bytes(2 * index.size))  # Moves of the unsolved positions not known to be won
+    solved = array('I')  # The solved positions, in the order of their distance
+
+    # The final positions and the number of moves of the others (a skipped turn is one move)
+    for position_index in range(index.size):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        if index.get_winner(x_bits, zero_bits) is not None:
+            labels[position_index] = get_label(LOSS, 0)
+            solved.append(position_index)
+            continue
+        own_bits, opponent_bits = (x_bits, zero_bits) if player == X_VALUE else (zero_bits, x_bits)
+        move_counts[position_index] = max(1, sum(1 for successor in index.generate_successors(own_bits, opponent_bits)))
+    if log:
+        log(f"{index.size} positions, {len(solved)} final")
+
+    # Back from the solved positions, in the order of their distance
+    next_solved = 0
+    while next_solved < len(solved):
+        position_index = solved[next_solved]
+        next_solved += 1
+        label = labels[position_index]
+        distance = label >> DISTANCE_SHIFT
+        x_bits, zero_bits, player = index.get_position(position_index)
+        opponent = get_opposite_player(player)
+        own_bits, opponent_bits = (x_bits, zero_bits) if player == X_VALUE else (zero_bits, x_bits)
+
+        predecessors = list(index.generate_predecessors(own_bits, opponent_bits))
+        if not index.has_moves(opponent_bits, own_bits):
+            # The opponent skipped the turn in the same position
+            predecessors.append(opponent_bits)
+
+        for previous_bits in predecessors:
+            if opponent == X_VALUE:
+                previous_x_bits, previous_zero_bits = previous_bits, own_bits
+            else:
+                previous_x_bits, previous_zero_bits = own_bits, previous_bits
+            previous_index = index.get_index(previous_x_bits, previous_zero_bits, opponent)
+            if labels[previous_index] or index.get_winner(previous_x_bits, previous_zero_bits) is not None:
+                continue
+
+            if label & RESULT_MASK == LOSS:
+                labels[previous_index] = get_label(WIN, distance + 1)
+                solved.append(previous_index)
+            else:
+                move_counts[previous_index] -= 1
+                if move_counts[previous_index] == 0:
+                    labels[previous_index] = get_label(LOSS, distance + 1)
+                    solved.append(previous_index)
+
+    if log:
+        log(f"{len(solved)} positions solved, {index.size - len(solved)} draws")
+    return index, labels
+
+
+def write_tablebase(path, index, labels):
+    with open(path, 'wb') as tablebase_file:
+        tablebase_file.write(HEADER.pack(MAGIC, VERSION, index.no_rows, index.no_columns, index.max_empty))
+        if sys.byteorder != 'little':
+            labels = array('H', labels)
+            labels.byteswap()
+        tablebase_file.write(labels.tobytes())
+
+
+class Tablebase:
+    """
+    A tablebase file read through a memory map (read-only, so the processes that open it share its pages)
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as tablebase_file:
+            self.buffer = mmap.mmap(tablebase_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, no_rows, no_columns, max_empty = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} isn't a tablebase (version {VERSION})")
+        self.index = TablebaseIndex(no_rows, no_columns, max_empty)
+        self.hits = 0
+
+    def close(self):
+        self.buffer.close()
+
+    def covers(self, board):
+        """
+        :return: True if the position of the board is in the tablebase
+        """
+        geometry = board.geometry
+        return ((geometry.no_rows, geometry.no_columns) == (self.index.no_rows, self.index.no_columns) and
+                board.get_empty_count() <= self.index.max_empty)
+
+    def covers_children(self, board):
+        """
+        :return: True if some of the positions after a move of the board can be in the tablebase (a placement
+            fills one more cell)
+        """
+        geometry = board.geometry
+        return ((geometry.no_rows, geometry.no_columns) == (self.index.no_rows, self.index.no_columns) and
+                board.get_empty_count() - 1 <= self.index.max_empty)
+
+    def probe(self, board, player):
+        """
+        :return: Tuple (result for the player: WIN, LOSS or DRAW, distance in plies) or None if the position
+            isn't in the tablebase
+        """
+        if not self.covers(board):
+            return None
+        x_bits, zero_bits = self.index.get_board_bits(board)
+        position_index = self.index.get_index(x_bits, zero_bits, player)
+        label, = struct.unpack_from('<H', self.buffer, HEADER.size + 2 * position_index)
+        self.hits += 1
+        return label & RESULT_MASK, label >> DISTANCE_SHIFT
+
+    def get_score(self, board, player, depth):
+        """
+        :param depth: The remaining depth of the node, the faster wins score higher (see AlphaBeta.evaluate)
+        :return: The score of the position for AlphaBeta (from the point of view of Zero) or None if the
+            position isn't in the tablebase
+        """
+        result = self.probe(board, player)
+        if result is None:
+            return None
+        result, distance = result
+        if result == DRAW:
+            return 0
+        score = Evaluation.WIN_SCORE + max(0, depth - distance)
+        return score if (result == WIN) == (player == ZERO_VALUE) else -score
+
+    def get_best_move(self, board, player):
+        """
+        :return: Tuple (move, (result, distance) of the position) with the perfect move: the fastest win, else a
+            draw, else the slowest loss; the move is None if the player doesn't have any moves or the position
+            isn't in the tablebase
+        """
+        result = self.probe(board, player)
+        if result is None:
+            return None, None
+
+        best_move, best_key = None, None
+        opponent = get_opposite_player(player)
+        for move in board.get_possible_moves(player):
+            board.make(move)
+            child_result, child_distance = self.probe(board, opponent)
+            board.unmake(move)
+            # The result of the child is for the opponent
+            if child_result == LOSS:
+                key = (0, child_distance)
+            elif child_result == DRAW:
+                key = (1, 0)
+            else:
+                key = (2, -child_distance)
+            if best_key is None or key < best_key:
+                best_move, best_key = move, key
+        return best_move, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve the endgames of a board size with a retrograde analysis')
+    parser.add_argument('--rows', type=int, default=4)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--max-empty', type=int, default=1, help='solve the positions with up to this many empty cells')
+    parser.add_argument('--output', required=True)
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    tablebase_index, tablebase_labels = solve(arguments.rows, arguments.columns, arguments.max_empty, log=print)
+    write_tablebase(arguments.output, tablebase_index, tablebase_labels)
+    print(f"{arguments.output}: {tablebase_index.size} positions in {time.perf_counter() - start:.1f}s")
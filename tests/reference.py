@@ -0,0 +1,175 @@
+"""
+Brute-force reference of the rules, computed from the game matrix only, and random positions for the tests
+
+The engine keeps the rules incrementally (LineWindows, the neighbor counts, the slide counts, the hashes); the
+functions of this module recompute them from scratch with plain loops, so the tests compare the two.
+"""
+import random
+
+from engine import Move, Symbol, Zobrist, get_opposite_player, NOTHING_VALUE, P_MAX, X_VALUE, ZERO_VALUE
+
+LINE_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+ORTHOGONAL_DIRECTIONS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+ALL_DIRECTIONS = ORTHOGONAL_DIRECTIONS + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def get_cells(matrix):
+    return [(row_index, column_index) for row_index in range(len(matrix)) for column_index in range(len(matrix[0]))]
+
+
+def get_neighbors(matrix, cell_index, directions):
+    no_rows, no_columns = len(matrix), len(matrix[0])
+    for (row_step, column_step) in directions:
+        neighbor_index = (cell_index[0] + row_step, cell_index[1] + column_step)
+        if 0 <= neighbor_index[0] < no_rows and 0 <= neighbor_index[1] < no_columns:
+            yield neighbor_index
+
+
+def get_windows(matrix):
+    """
+    :return: List of the windows of 4 cells (tuples of cells) of the board
+    """
+    no_rows, no_columns = len(matrix), len(matrix[0])
+    windows = []
+    for cell_index in get_cells(matrix):
+        for (row_step, column_step) in LINE_DIRECTIONS:
+            window = tuple((cell_index[0] + i * row_step, cell_index[1] + i * column_step) for i in range(4))
+            if all(0 <= row_index < no_rows and 0 <= column_index < no_columns for (row_index, column_index) in window):
+                windows.append(window)
+    return windows
+
+
+def get_orthogonal_count(matrix, cell_index, player):
+    return sum(1 for neighbor_index in get_neighbors(matrix, cell_index, ORTHOGONAL_DIRECTIONS)
+               if matrix[neighbor_index[0]][neighbor_index[1]] == player)
+
+
+def get_winner(matrix):
+    """
+    :return: The player with a line of four (X first, like LineWindows.get_winner) or False
+    """
+    for player in (X_VALUE, ZERO_VALUE):
+        for window in get_windows(matrix):
+            if all(matrix[row_index][column_index] == player for (row_index, column_index) in window):
+                return player
+    return False
+
+
+def get_moves(matrix, player):
+    """
+    :return: Set of the moves of the player: a placement on every empty cell where the opponent doesn't have
+        more orthogonal neighbors, a slide of every symbol of the player to every empty neighbor
+    """
+    opponent = get_opposite_player(player)
+    moves = set()
+    for cell_index in get_cells(matrix):
+        value = matrix[cell_index[0]][cell_index[1]]
+        if value == NOTHING_VALUE:
+            if get_orthogonal_count(matrix, cell_index, opponent) <= get_orthogonal_count(matrix, cell_index, player):
+                moves.add(Move(player, None, cell_index))
+        elif value == player:
+            for neighbor_index in get_neighbors(matrix, cell_index, ALL_DIRECTIONS):
+                if matrix[neighbor_index[0]][neighbor_index[1]] == NOTHING_VALUE:
+                    moves.add(Move(player, cell_index, neighbor_index))
+    return moves
+
+
+def get_open_windows(matrix, player):
+    """
+    :return: Tuple (open_windows, threat windows): the number of windows with k symbols of the player and none of
+        the opponent for k = 0..4, and the set of the open windows with 3 symbols
+    """
+    opponent = get_opposite_player(player)
+    open_windows = [0] * 5
+    threat_windows = set()
+    for (window_index, window) in enumerate(get_windows(matrix)):
+        values = [matrix[row_index][column_index] for (row_index, column_index) in window]
+        if opponent not in values:
+            open_windows[values.count(player)] += 1
+            if values.count(player) == 3:
+                threat_windows.add(window_index)
+    return open_windows, threat_windows
+
+
+def get_slide_count(matrix, player):
+    return sum(1 for cell_index in get_cells(matrix) if matrix[cell_index[0]][cell_index[1]] == player
+               for neighbor_index in get_neighbors(matrix, cell_index, ALL_DIRECTIONS)
+               if matrix[neighbor_index[0]][neighbor_index[1]] == NOTHING_VALUE)
+
+
+def get_hash(matrix, cells_map=None):
+    """
+    :param cells_map: The cell every cell is mapped to (BoardGeometry.symmetry_cells), the identity if None
+    :return: The Zobrist hash of the symbols of the matrix
+    """
+    zobrist_hash = 0
+    for cell_index in get_cells(matrix):
+        value = matrix[cell_index[0]][cell_index[1]]
+        if value != NOTHING_VALUE:
+            zobrist_hash ^= Zobrist.key(value, cells_map[cell_index] if cells_map is not None else cell_index)
+    return zobrist_hash
+
+
+def generate_games(board_class, count, max_plies, seed, no_rows=6, no_columns=6):
+    """
+    Plays random games and generates (board, player to move, move) before every move; the board is the one
+    the game is played on, so it must be copied to be kept
+    """
+    rng = random.Random(seed)
+    for game in range(count):
+        board = board_class(no_rows=no_rows, no_columns=no_columns)
+        player = Symbol.X.value
+        for ply in range(max_plies):
+            if board.is_board_final():
+                break
+            moves_list = board.get_possible_moves(player)
+            if moves_list:
+                move = rng.choice(moves_list)
+                yield board, player, move
+                board.make(move)
+            player = get_opposite_player(player)
+
+
+def get_random_positions(board_class, count, max_plies, seed, no_rows=6, no_columns=6):
+    """
+    :return: List of (board, player to move) after a random number of random moves from the empty board
+    """
+    rng = random.Random(seed)
+    positions = []
+    for game in range(count):
+        board = board_class(no_rows=no_rows, no_columns=no_columns)
+        player = Symbol.X.value
+        for ply in range(rng.randint(0, max_plies)):
+            if board.is_board_final():
+                break
+            moves_list = board.get_possible_moves(player)
+            if moves_list:
+                board.make(rng.choice(moves_list))
+            player = get_opposite_player(player)
+        positions.append((board, player))
+    return positions
+
+
+def min_max_score(board, player, depth, evaluate):
+    """
+    Plain min-max with the leaves scored like the search: evaluate(board, winner, remaining depth)
+
+    :return: The score of the board from the point of view of P_MAX
+    """
+    winner = board.is_board_final()
+    if depth == 0 or winner:
+        return evaluate(board, winner, depth)
+
+    opposite_player = get_opposite_player(player)
+    scores = []
+    for move in board.get_possible_moves(player):
+        board.make(move)
+        scores.append(min_max_score(board, opposite_player, depth - 1, evaluate))
+        board.unmake(move)
+
+    # The player doesn't have any moves and skips the turn; if the opponent can't move either it's a draw
+    if not scores:
+        if not board.is_move_available(opposite_player):
+            return 0
+        return min_max_score(board, opposite_player, depth - 1, evaluate)
+    return max(scores) if player == P_MAX else min(scores)
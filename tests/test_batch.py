@@ -0,0 +1,70 @@
+"""
+The vectorized BatchEvaluation against Evaluation
+"""
+import numpy as np
+import pytest
+
+from batch import BatchEvaluation, get_matrix
+from engine import AlphaBeta, Board, BitBoard, Evaluation, X_VALUE, ZERO_VALUE
+from tests import reference
+
+WEIGHTS = [None, {'open_3': 5, 'open_2': 3, 'mobility': 2, 'slides': 0}]
+
+
+def get_expected_score(evaluation, board, depth=0):
+    winner = board.is_board_final()
+    if winner == ZERO_VALUE:
+        return Evaluation.WIN_SCORE + depth
+    if winner == X_VALUE:
+        return -Evaluation.WIN_SCORE - depth
+    return evaluation.evaluate(board)
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_get_matrix(board_class):
+    for (board, player) in reference.get_random_positions(board_class, 10, 30, seed=1, no_rows=5, no_columns=7):
+        assert get_matrix(board).tolist() == board.get_game_matrix().tolist()
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_evaluate_boards(weights):
+    evaluation, batch_evaluation = Evaluation(weights), BatchEvaluation(weights)
+    boards = [board for (board, player) in reference.get_random_positions(BitBoard, 60, 40, seed=2)]
+    scores, winners = batch_evaluation.evaluate_boards(boards, depth=3)
+    assert scores.tolist() == [get_expected_score(evaluation, board, 3) for board in boards]
+    assert winners.tolist() == [board.is_board_final() or 0 for board in boards]
+
+    # The features are the ones kept by the boards
+    winners, features = batch_evaluation.get_features(np.stack([get_matrix(board) for board in boards]))
+    for (board_index, board) in enumerate(boards):
+        for (feature, values) in evaluation.get_features(board).items():
+            assert (features[feature][0][board_index], features[feature][1][board_index]) == values
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_evaluate_moves(board_class, weights):
+    evaluation, batch_evaluation = Evaluation(weights), BatchEvaluation(weights)
+    for (board, player) in reference.get_random_positions(board_class, 20, 40, seed=3):
+        moves_list = board.get_possible_moves(player)
+        if not moves_list:
+            continue
+        expected_scores = []
+        for move in moves_list:
+            board.make(move)
+            expected_scores.append(get_expected_score(evaluation, board))
+            board.unmake(move)
+        scores, winners = batch_evaluation.evaluate_moves(board, moves_list)
+        assert scores.tolist() == expected_scores
+
+
+def test_batch_search_matches_min_max():
+    alpha_beta = AlphaBeta(batch_evaluation=BatchEvaluation())
+    for (board, player) in reference.get_random_positions(BitBoard, 12, 24, seed=4):
+        for depth in (1, 2):
+            expected_score = reference.min_max_score(board, player, depth, AlphaBeta().evaluate)
+            move, score = alpha_beta.search(board, player, depth)
+            if abs(expected_score) >= Evaluation.WIN_SCORE:
+                assert abs(score) >= Evaluation.WIN_SCORE and (score > 0) == (expected_score > 0)
+            else:
+                assert score == expected_score
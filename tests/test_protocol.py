@@ -0,0 +1,46 @@
+"""
+The commands of the text protocol, answered by a Session and a SearchEngine
+"""
+from engine import Symbol
+from protocol import SearchEngine, Session
+
+# X completes the first row with its fifth move, then plays one more move
+FINISHED_GAME = 'position startpos moves 0,0 1,1 0,1 2,2 0,2 3,3 0,3'
+
+
+def test_position_and_go():
+    session = Session()
+    assert session.handle('position startpos moves 2,2 3,3') == ([], None)
+    assert session.player == Symbol.X.value and len(session.moves_list) == 2
+
+    responses, request = session.handle('go depth 2')
+    assert responses == []
+    lines = SearchEngine(memory_mb=1).search(request)
+    assert lines[0].startswith('info depth 2 score ') and lines[-1].startswith('bestmove ')
+    assert lines[-1] != 'bestmove none'
+
+
+def test_bad_commands_are_answered_with_errors():
+    session = Session()
+    session.handle('position startpos moves 2,2')
+    for line in ('position startpos moves 2,2 2,2', 'position startpos moves 2,x', 'position startpos moves 0,9',
+                 'position startpos moves pass', 'go depth 0', 'go nodes', 'go speed 3', 'launch'):
+        responses, request = session.handle(line)
+        assert request is None and len(responses) == 1 and responses[0].startswith('error ')
+    # The position of the session doesn't change
+    assert len(session.moves_list) == 1
+
+
+def test_finished_game():
+    session = Session()
+    assert session.handle(FINISHED_GAME) == ([], None)
+
+    # No move is accepted after the line of four
+    responses, request = session.handle(FINISHED_GAME + ' 3,2')
+    assert responses == ['error move 3,2 after the end of the game']
+    responses, request = session.handle(FINISHED_GAME + ' pass')
+    assert responses == ['error move pass after the end of the game']
+    assert len(session.moves_list) == 7
+
+    responses, request = session.handle('go depth 2')
+    assert request is None and responses == ['error the game is over, X has a line of four']
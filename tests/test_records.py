@@ -0,0 +1,79 @@
+"""
+The packed moves and the binary records of the games
+"""
+import pytest
+
+from engine import BitBoard, Move, NeighborPos, X_VALUE, ZERO_VALUE
+from records import GameRecord, GameRecordWriter, get_final_board, pack_move, read_records, replay, unpack_move
+from tests import reference
+
+
+@pytest.mark.parametrize('size', [(4, 4), (6, 6), (7, 5), (19, 19)])
+def test_pack_move_round_trip(size):
+    no_rows, no_columns = size
+    packed_moves = set()
+    moves_count = 0
+    for row_index in range(no_rows):
+        for column_index in range(no_columns):
+            for player in (X_VALUE, ZERO_VALUE):
+                moves_list = [Move(player, None, (row_index, column_index))]
+                for neighbor in NeighborPos:
+                    from_cell = (row_index - neighbor.value[0], column_index - neighbor.value[1])
+                    if 0 <= from_cell[0] < no_rows and 0 <= from_cell[1] < no_columns:
+                        moves_list.append(Move(player, from_cell, (row_index, column_index)))
+                for move in moves_list:
+                    packed = pack_move(move, no_columns)
+                    assert 0 <= packed < 2 ** 16
+                    assert unpack_move(packed, no_columns) == move
+                    packed_moves.add(packed)
+                    moves_count += 1
+    # Every move has its own packed value
+    assert len(packed_moves) == moves_count
+
+
+def get_games(count, seed):
+    games = []
+    for game in range(count):
+        moves_list = [move for (board, player, move) in reference.generate_games(BitBoard, 1, 30, seed=seed + game)]
+        games.append(moves_list)
+    return games
+
+
+def test_game_record_round_trip():
+    for (game_index, moves_list) in enumerate(get_games(6, seed=1)):
+        scores = [None if move_index % 3 else move_index * 7 - 50 for move_index in range(len(moves_list))]
+        for record in (GameRecord(6, 6, moves_list, result=X_VALUE, scores=scores),
+                       GameRecord(6, 6, moves_list, result=None)):
+            data = b'padding' + record.to_bytes()
+            read_record, offset = GameRecord.from_buffer(data, len(b'padding'))
+            assert offset == len(data)
+            assert (read_record.moves, read_record.result, read_record.scores) == (
+                moves_list, record.result, record.scores)
+            # A record cut before its end isn't read
+            assert GameRecord.from_buffer(data[:-1], len(b'padding')) == (None, len(b'padding'))
+
+
+def test_records_file(tmp_path):
+    path = str(tmp_path / 'games.rec')
+    games = get_games(5, seed=10)
+    with GameRecordWriter(path) as writer:
+        for moves_list in games:
+            writer.write(GameRecord(6, 6, moves_list, result=0))
+
+    records = list(read_records(path))
+    assert [record.moves for record in records] == games
+    for (record, moves_list) in zip(records, games):
+        # The replay gives the board before every move
+        board = BitBoard()
+        for ((replay_board, move, score), expected_move) in zip(replay(record), moves_list):
+            assert (replay_board.get_game_matrix().tolist(), move, score) == (
+                board.get_game_matrix().tolist(), expected_move, None)
+            board.make(move)
+        assert get_final_board(record).get_game_matrix().tolist() == board.get_game_matrix().tolist()
+
+
+def test_replay_rejects_the_moves_outside_the_board():
+    # The cell 40 of a 6x6 board is (6, 4), below the last row
+    record = GameRecord(6, 6, packed_moves=[pack_move(Move(X_VALUE, None, (2, 2)), 6), 40])
+    with pytest.raises(ValueError):
+        list(replay(record))
@@ -0,0 +1,164 @@
+"""
+The rules kept incrementally by the board backends (Board and BitBoard) against the brute-force reference
+"""
+import pytest
+
+from engine import Board, BitBoard, Move, get_opposite_player, NOTHING_VALUE, X_VALUE, ZERO_VALUE
+from tests import reference
+
+PLAYERS = (X_VALUE, ZERO_VALUE)
+SIZES = [(6, 6), (4, 7), (8, 5)]
+
+
+def get_planes_counts(board, planes):
+    """
+    :return: Dictionary cell -> the count kept by the bit-sliced planes of the BitBoard
+    """
+    bit_0, bit_1, bit_2 = planes
+    return {cell_index: (bit_0 >> bit_index & 1) + 2 * (bit_1 >> bit_index & 1) + 4 * (bit_2 >> bit_index & 1)
+            for cell_index in board.geometry.cells for bit_index in [board.cell_bit(cell_index).bit_length() - 1]}
+
+
+def get_state(board):
+    """
+    :return: Everything the board keeps up to date on a change of a cell
+    """
+    line_windows = board.line_windows
+    state = {
+        'matrix': board.get_game_matrix().tolist(),
+        'hashes': (board.zobrist_hash, list(board.symmetry_hashes)),
+        'counts': {player: list(counts) for (player, counts) in line_windows.counts.items()},
+        'open_windows': {player: list(counts) for (player, counts) in line_windows.open_windows.items()},
+        'threat_windows': {player: set(windows) for (player, windows) in line_windows.threat_windows.items()},
+        'slide_counts': dict(board.slide_counts),
+        'placements_counts': board.get_placements_counts(),
+    }
+    if isinstance(board, BitBoard):
+        state['bits'] = (board.x_bits, board.zero_bits)
+        state['planes'] = (board.x_neighbor_planes, board.zero_neighbor_planes)
+    else:
+        state['neighbors'] = {player: matrix.tolist() for (player, matrix) in board.neighbors_matrices.items()}
+        state['impossible'] = {player: matrix.tolist() for (player, matrix) in board.impossible_moves_matrices.items()}
+        state['impossible_counts'] = dict(board.impossible_counts)
+        state['player_cells'] = {player: set(cells) for (player, cells) in board.player_cells.items()}
+        state['near_cells'] = set(board.near_cells)
+    return state
+
+
+def check_board(board):
+    """
+    Compares the data of the board with the reference computed from its matrix
+    """
+    matrix = board.get_game_matrix().tolist()
+    cells = board.geometry.cells
+
+    assert board.is_board_final() == reference.get_winner(matrix)
+    for player in PLAYERS:
+        assert set(board.get_possible_moves(player)) == reference.get_moves(matrix, player)
+        assert board.is_move_available(player) == bool(reference.get_moves(matrix, player))
+
+        open_windows, threat_windows = reference.get_open_windows(matrix, player)
+        # The windows without symbols aren't counted (open_windows[player][0] isn't used)
+        assert board.line_windows.open_windows[player][1:] == open_windows[1:]
+        assert board.line_windows.threat_windows[player] == threat_windows
+        assert board.slide_counts[player] == reference.get_slide_count(matrix, player)
+
+        placements = [move for move in reference.get_moves(matrix, player) if move.from_cell is None]
+        assert board.get_placements_counts()[player] == len(placements)
+        for cell_index in cells:
+            assert board.is_impossible_placement(cell_index, player) == (
+                    matrix[cell_index[0]][cell_index[1]] == NOTHING_VALUE and
+                    reference.get_orthogonal_count(matrix, cell_index, get_opposite_player(player)) >
+                    reference.get_orthogonal_count(matrix, cell_index, player))
+
+    assert board.zobrist_hash == reference.get_hash(matrix)
+    assert board.symmetry_hashes == [reference.get_hash(matrix, cells_map)
+                                     for cells_map in board.geometry.symmetry_cells]
+    assert board.get_empty_count() == sum(row.count(NOTHING_VALUE) for row in matrix)
+
+    if isinstance(board, BitBoard):
+        for (player, planes) in ((X_VALUE, board.x_neighbor_planes), (ZERO_VALUE, board.zero_neighbor_planes)):
+            assert get_planes_counts(board, planes) == {
+                cell_index: reference.get_orthogonal_count(matrix, cell_index, player) for cell_index in cells}
+            # The guard columns never have a count
+            assert all(not plane & ~board.geometry.cells_mask for plane in planes)
+    else:
+        for player in PLAYERS:
+            assert {cell_index: int(board.neighbors_matrices[player][cell_index]) for cell_index in cells} == {
+                cell_index: reference.get_orthogonal_count(matrix, cell_index, player) for cell_index in cells}
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+@pytest.mark.parametrize('size', SIZES)
+def test_rules_match_reference(board_class, size):
+    for (board, player, move) in reference.generate_games(board_class, 8, 40, seed=size[0] * 10 + size[1],
+                                                          no_rows=size[0], no_columns=size[1]):
+        check_board(board)
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_make_unmake_restores_the_board(board_class):
+    for (board, player, move) in reference.generate_games(board_class, 10, 40, seed=3):
+        state = get_state(board)
+        board.make(move)
+        check_board(board)
+        board.unmake(move)
+        assert get_state(board) == state
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_copy_is_independent(board_class):
+    for (board, player, move) in reference.generate_games(board_class, 4, 30, seed=4):
+        state = get_state(board)
+        child = board.copy()
+        child.make(move)
+        assert get_state(board) == state
+        check_board(child)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_backends_agree(size):
+    for (board, player, move) in reference.generate_games(BitBoard, 8, 40, seed=5, no_rows=size[0],
+                                                          no_columns=size[1]):
+        other = Board(board.get_game_matrix())
+        assert other.zobrist_hash == board.zobrist_hash
+        assert other.symmetry_hashes == board.symmetry_hashes
+        assert other.slide_counts == board.slide_counts
+        assert other.get_placements_counts() == board.get_placements_counts()
+        assert other.line_windows.counts == board.line_windows.counts
+        for player_value in PLAYERS:
+            assert set(other.get_possible_moves(player_value)) == set(board.get_possible_moves(player_value))
+            assert (set(other.generate_frontier_placements(player_value)) ==
+                    set(board.generate_frontier_placements(player_value)))
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_symmetric_positions_share_the_canonical_hash(board_class):
+    for (board, player, move) in reference.generate_games(board_class, 4, 30, seed=6):
+        canonical_hash, symmetry = board.get_canonical_hash(player)
+        canonical = board.get_transformed(symmetry)
+        assert canonical.get_hash(player) == canonical_hash
+        for other_symmetry in range(len(board.geometry.symmetries)):
+            transformed = board.get_transformed(other_symmetry)
+            assert transformed.get_canonical_hash(player)[0] == canonical_hash
+            # The moves are mapped with the board
+            assert set(transformed.get_possible_moves(player)) == {
+                board.geometry.transform_move(possible_move, other_symmetry)
+                for possible_move in board.get_possible_moves(player)}
+        assert board.geometry.inverse_transform_move(board.geometry.transform_move(move, symmetry), symmetry) == move
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_is_legal_move(board_class):
+    for (board, player, move) in reference.generate_games(board_class, 4, 30, seed=7, no_rows=5, no_columns=6):
+        matrix = board.get_game_matrix().tolist()
+        legal_moves = reference.get_moves(matrix, player)
+        # The cells around the board too: the bitboards would map them onto the guard column or the next row
+        cells = [(row_index, column_index) for row_index in range(-1, 7) for column_index in range(-1, 8)]
+        for to_cell in cells:
+            candidates = [Move(player, None, to_cell)] + [
+                Move(player, (to_cell[0] + row_step, to_cell[1] + column_step), to_cell)
+                for (row_step, column_step) in reference.ALL_DIRECTIONS]
+            for candidate in candidates:
+                assert board.is_legal_move(candidate) == (candidate in legal_moves)
+        assert not board.is_legal_move(Move(NOTHING_VALUE, None, move.to_cell))
@@ -0,0 +1,123 @@
+"""
+AlphaBeta.search against a plain min-max with the same leaf scores, at shallow depths
+"""
+import pytest
+
+from engine import (AlphaBeta, Board, BitBoard, Bound, PositionHistory, TranspositionTable, Zobrist,
+                    get_opposite_player)
+from tests import reference
+
+
+def check_search(alpha_beta, board, player, depth):
+    """
+    The score of the search is the min-max score; a forced win is only compared by its winner, because the
+    iterative deepening stops at the first depth that finds it (the depth bonus of the score is smaller)
+    """
+    expected_score = reference.min_max_score(board, player, depth, AlphaBeta().evaluate)
+    move, score = alpha_beta.search(board, player, depth)
+    if abs(expected_score) >= AlphaBeta.WIN_SCORE:
+        assert abs(score) >= AlphaBeta.WIN_SCORE and (score > 0) == (expected_score > 0)
+    else:
+        assert score == expected_score
+    assert move in board.get_possible_moves(player)
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+@pytest.mark.parametrize('depth', [1, 2])
+def test_search_matches_min_max(board_class, depth):
+    for (board, player) in reference.get_random_positions(board_class, 8, 16, seed=depth):
+        check_search(AlphaBeta(), board, player, depth)
+
+
+def test_search_keeps_the_transposition_table():
+    # The entries of the previous searches don't change the results of the next ones
+    alpha_beta = AlphaBeta(TranspositionTable(1))
+    for (board, player) in reference.get_random_positions(BitBoard, 8, 16, seed=4):
+        for depth in (1, 2):
+            check_search(alpha_beta, board, player, depth)
+    assert alpha_beta.transposition_table.hits > 0
+
+
+@pytest.mark.parametrize('board_class', [Board, BitBoard])
+def test_incremental_hash(board_class):
+    for (board, player) in reference.get_random_positions(board_class, 8, 16, seed=5):
+        for move in board.get_possible_moves(player):
+            child_board = board.copy()
+            child_board.make(move)
+            matrix = child_board.get_game_matrix()
+            expected_hash = 0
+            for row_index in range(len(matrix)):
+                for column_index in range(len(matrix[0])):
+                    expected_hash ^= Zobrist.key(int(matrix[row_index, column_index]), (row_index, column_index))
+            assert child_board.zobrist_hash == expected_hash
+        assert board.get_hash(player) != board.get_hash(get_opposite_player(player))
+
+
+def test_transposition_table_replacement():
+    table = TranspositionTable(1)
+    assert table.get_stats()['capacity'] == 2 * table.bucket_count
+    key = 12345
+    other_key = key + table.bucket_count  # The same bucket
+
+    table.store(key, 4, Bound.EXACT, 10, None)
+    # A shallower entry of another position goes to the always-replace slot
+    table.store(other_key, 2, Bound.EXACT, 20, None)
+    assert table.probe(key).depth == 4 and table.probe(other_key).depth == 2
+
+    # A deeper entry takes the depth-preferred slot and the old entry moves to the always-replace slot
+    third_key = key + 2 * table.bucket_count
+    table.store(third_key, 6, Bound.LOWER, 30, None)
+    assert table.probe(third_key).score == 30 and table.probe(key).score == 10
+    assert table.probe(other_key) is None
+    assert table.get_stats()['evictions'] == 1
+
+    # The entries of an older search are replaced by any depth
+    table.new_search()
+    table.store(other_key, 1, Bound.UPPER, 40, None)
+    assert table.probe(other_key).score == 40 and table.probe(third_key).score == 30
+
+    stats = table.get_stats()
+    assert (stats['stores'], stats['used']) == (4, 2)
+    assert stats['hits'] + stats['misses'] == stats['probes']
+
+
+def test_search_doesnt_change_the_board():
+    for (board, player) in reference.get_random_positions(BitBoard, 6, 16, seed=6):
+        matrix, zobrist_hash = board.get_game_matrix().tolist(), board.zobrist_hash
+        history = PositionHistory()
+        history.push(board.get_hash(player))
+        AlphaBeta().search(board, player, 3, history=history)
+        assert board.get_game_matrix().tolist() == matrix and board.zobrist_hash == zobrist_hash
+        assert history.keys == [board.get_hash(player)]
+
+
+def test_repeated_position_is_a_draw():
+    for (board, player) in reference.get_random_positions(BitBoard, 6, 16, seed=7):
+        opponent = get_opposite_player(player)
+        for move in board.get_possible_moves(player)[:3]:
+            board.make(move)
+            if board.is_board_final():
+                board.unmake(move)
+                continue
+            child_key = board.get_hash(opponent)
+            child_score = reference.min_max_score(board, opponent, 1, AlphaBeta().evaluate)
+            board.unmake(move)
+
+            # The search scores a position of the game reached again as a draw
+            history = PositionHistory()
+            for key in (child_key, board.get_hash(player)):
+                history.push(key)
+            assert AlphaBeta().search(board, player, 2, root_moves=[move], history=history) == (move, 0)
+            history = PositionHistory()
+            history.push(board.get_hash(player))
+            assert AlphaBeta().search(board, player, 2, root_moves=[move], history=history) == (move, child_score)
+
+
+def test_stop_after_the_end_of_a_search():
+    alpha_beta = AlphaBeta()
+    for (board, player) in reference.get_random_positions(BitBoard, 4, 12, seed=8):
+        alpha_beta.search(board, player, 1)
+        # The stop came too late for its search, the next search isn't stopped by it
+        alpha_beta.stop()
+        move, score = alpha_beta.search(board, player, 3)
+        assert alpha_beta.get_stats().depth == 3 or abs(score) >= AlphaBeta.WIN_SCORE
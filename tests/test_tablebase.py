@@ -0,0 +1,180 @@
+"""
+The perfect index and the retrograde labels of the tablebase against the rules and against min-max on 4x4
+
+The 4x4 endgame with one empty cell (1.2 million positions) is solved once for the module, in about a minute.
+"""
+import random
+
+import pytest
+
+from batch import BatchEvaluation
+from engine import AlphaBeta, Board, BitBoard, Evaluation, get_opposite_player, min_max_line, X_VALUE, ZERO_VALUE
+from tablebase import DRAW, LOSS, WIN, Tablebase, TablebaseIndex, solve, write_tablebase
+
+MIN_MAX_DEPTH = 4
+
+
+@pytest.fixture(scope='module')
+def tablebase(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('tablebase') / 'tablebase_4x4.tb')
+    index, labels = solve(4, 4, 1)
+    write_tablebase(path, index, labels)
+    tablebase = Tablebase(path)
+    yield tablebase
+    tablebase.close()
+
+
+def get_board(index, x_bits, zero_bits, board_class=BitBoard):
+    """
+    :return: The board of the flat bits of the index
+    """
+    board = board_class(no_rows=index.no_rows, no_columns=index.no_columns)
+    for cell_index in board.geometry.cells:
+        flat_index = board.geometry.flat_index(cell_index)
+        if x_bits >> flat_index & 1:
+            board.set_cell(cell_index, X_VALUE)
+        elif zero_bits >> flat_index & 1:
+            board.set_cell(cell_index, ZERO_VALUE)
+    return board
+
+
+def get_sample(index, count, seed, min_empty=0):
+    """
+    :return: List of random indexes of the positions with at least min_empty empty cells
+    """
+    rng = random.Random(seed)
+    return [rng.randrange(index.level_offsets[min_empty], index.size) for sample in range(count)]
+
+
+@pytest.mark.parametrize('size', [(4, 4, 2), (4, 5, 1), (5, 4, 1)])
+def test_index_round_trip(size):
+    index = TablebaseIndex(*size)
+    edges = [0, index.size - 1] + [offset + change for offset in index.level_offsets[1:] for change in (-1, 0, 1)]
+    for position_index in edges + get_sample(index, 2000, seed=1):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        assert not x_bits & zero_bits
+        assert (index.full_mask & ~(x_bits | zero_bits)).bit_count() <= index.max_empty
+        assert index.get_index(x_bits, zero_bits, player) == position_index
+
+        # The bits of both backends are the bits of the index
+        for board_class in (Board, BitBoard):
+            assert index.get_board_bits(get_board(index, x_bits, zero_bits, board_class)) == (x_bits, zero_bits)
+
+
+def test_index_rules_match_the_engine():
+    index = TablebaseIndex(4, 4, 2)
+    for position_index in get_sample(index, 500, seed=2):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        board = get_board(index, x_bits, zero_bits)
+        assert index.get_winner(x_bits, zero_bits) == (board.is_board_final() or None)
+
+        own_bits, opponent_bits = (x_bits, zero_bits) if player == X_VALUE else (zero_bits, x_bits)
+        successors = set()
+        for (move, successor_bits) in index.generate_successors(own_bits, opponent_bits):
+            successors.add(successor_bits)
+        expected_successors = set()
+        for move in board.get_possible_moves(player):
+            board.make(move)
+            expected_successors.add(index.get_board_bits(board)[0 if player == X_VALUE else 1])
+            board.unmake(move)
+        assert successors == expected_successors
+
+        # Every predecessor has a move to the position
+        for previous_bits in index.generate_predecessors(own_bits, opponent_bits):
+            assert opponent_bits in {successor_bits for (move, successor_bits) in
+                                     index.generate_successors(previous_bits, own_bits)}
+
+
+def test_labels_follow_the_children(tablebase):
+    """
+    The label of every position is the best result over its moves (a skipped turn if there are none)
+    """
+    index = tablebase.index
+    for position_index in get_sample(index, 3000, seed=3):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        board = get_board(index, x_bits, zero_bits)
+        result, distance = tablebase.probe(board, player)
+        if board.is_board_final():
+            assert (result, distance) == (LOSS, 0)
+            continue
+
+        opponent = get_opposite_player(player)
+        children = []
+        for move in board.get_possible_moves(player):
+            board.make(move)
+            children.append(tablebase.probe(board, opponent))
+            board.unmake(move)
+        if not children and board.is_move_available(opponent):
+            children.append(tablebase.probe(board, opponent))
+
+        losses = [child_distance for (child_result, child_distance) in children if child_result == LOSS]
+        if losses:
+            assert (result, distance) == (WIN, min(losses) + 1)
+        elif children and all(child_result == WIN for (child_result, child_distance) in children):
+            assert (result, distance) == (LOSS, max(child_distance for (child_result, child_distance) in children) + 1)
+        else:
+            assert (result, distance) == (DRAW, 0)
+
+
+def test_labels_match_min_max(tablebase):
+    """
+    A win or a loss within the depth of the min-max has the score of its distance, the other positions
+    aren't won or lost by the min-max
+    """
+    index = tablebase.index
+    for position_index in get_sample(index, 400, seed=4, min_empty=1):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        board = get_board(index, x_bits, zero_bits)
+        if board.is_board_final():
+            continue
+        result, distance = tablebase.probe(board, player)
+        score = min_max_line(board, player, MIN_MAX_DEPTH)[0]
+        player_score = score if player == ZERO_VALUE else -score
+
+        if result != DRAW and distance <= MIN_MAX_DEPTH:
+            win_score = Evaluation.WIN_SCORE + MIN_MAX_DEPTH - distance
+            assert player_score == (win_score if result == WIN else -win_score)
+        else:
+            assert abs(player_score) < Evaluation.WIN_SCORE
+
+
+def test_search_plays_the_perfect_move(tablebase):
+    alpha_beta = AlphaBeta(tablebase=tablebase)
+    index = tablebase.index
+    for position_index in get_sample(index, 300, seed=5):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        board = get_board(index, x_bits, zero_bits)
+        if board.is_board_final():
+            continue
+        result, distance = tablebase.probe(board, player)
+        move, score = alpha_beta.search(board, player, 3)
+        if move is None:
+            assert not board.get_possible_moves(player)
+            continue
+
+        # The move keeps the result of the position, with the distance of a perfect game
+        board.make(move)
+        child_result, child_distance = tablebase.probe(board, get_opposite_player(player))
+        assert child_result == {WIN: LOSS, LOSS: WIN, DRAW: DRAW}[result]
+        if result == DRAW:
+            assert score == 0
+        else:
+            assert child_distance == distance - 1
+            player_score = score if player == ZERO_VALUE else -score
+            assert abs(score) >= Evaluation.WIN_SCORE and (player_score > 0) == (result == WIN)
+
+
+def test_batch_search_uses_the_tablebase(tablebase):
+    """
+    With two empty cells the placements reach the tablebase, their scores aren't taken from the batch
+    """
+    alpha_beta = AlphaBeta(tablebase=tablebase)
+    batch_alpha_beta = AlphaBeta(batch_evaluation=BatchEvaluation(), tablebase=tablebase)
+    index = TablebaseIndex(4, 4, 2)
+    for position_index in get_sample(index, 200, seed=6, min_empty=2):
+        x_bits, zero_bits, player = index.get_position(position_index)
+        board = get_board(index, x_bits, zero_bits)
+        if board.is_board_final():
+            continue
+        for depth in (1, 2):
+            assert batch_alpha_beta.search(board, player, depth)[1] == alpha_beta.search(board, player, depth)[1]
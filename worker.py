@@ -0,0 +1,161 @@
+"""
+Background searches of the AI
+
+The search runs in a thread, so the interface that started it keeps handling its events; the result is given
+to a callback (the pygame interface posts it back to its event queue). The module doesn't depend on pygame.
+
+During the opponent's turn the worker can ponder (see SearchWorker.ponder): it searches the position after the
+reply predicted by its last search, or the opponent's position if there is no prediction. When the opponent
+plays the predicted reply the ponder search becomes the search of the move; after any other reply a new search
+starts, with the transposition table filled by the ponder search.
+"""
+import threading
+import time
+
+from engine import AlphaBeta, TranspositionTable, get_opposite_player
+
+
+class SearchWorker:
+    """
+    Runs one search at a time in a background thread with a time or node budget
+
+    The transposition table is kept between the searches of the game. The search returns the best move
+    found so far when the budget is over (see AlphaBeta.search), so the think time has an upper bound.
+    """
+    STOP_INTERVAL = 0.05  # Seconds between the stop requests sent to a search that is ending (see stop)
+
+    def __init__(self, on_result, transposition_table=None, book=None):
+        """
+        :param on_result: Function called from the worker thread with (move, score, stats) when a search ends
+        :param book: Book of the openings (see book.py), or None
+        """
+        self.on_result = on_result
+        self.alpha_beta = AlphaBeta(transposition_table if transposition_table is not None else TranspositionTable(),
+                                    book=book)
+        self.thread = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.principal_variation = []  # The line of the last search of a move
+
+        # Pondering: the position searched (hash, player to move), None if all the replies are searched, and
+        # the result of a ponder search that ended before the opponent's move
+        self.pondering = False
+        self.ponder_position = None
+        self.ponder_result = None
+        self.ponder_start = 0.0
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    def is_searching(self):
+        """
+        :return: True if a search of a move is running (a ponder search isn't)
+        """
+        return self.thread is not None and self.thread.is_alive() and not self.pondering
+
+    def is_pondering(self):
+        return self.pondering
+
+    def get_predicted_move(self):
+        """
+        :return: The reply of the opponent expected by the last search, or None
+        """
+        if len(self.principal_variation) > 1:
+            return self.principal_variation[1]
+        return None
+
+    def start(self, board, player, depth_or_budget, max_nodes=None, history=None):
+        """
+        Starts the search of the best move of the player; the board and the history are copied, so they
+        can be changed while the search runs. If the worker was pondering this position, the ponder search
+        goes on with what is left of the budget of the move (or its result is given at once).
+
+        :param depth_or_budget: The maximum depth (int) or the time budget in seconds (float)
+        :param max_nodes: The node budget, no limit if None
+        :param history: PositionHistory of the game, see AlphaBeta.search
+        """
+        if self.pondering:
+            with self.lock:
+                hit = self.ponder_position == (board.get_hash(player), player)
+                if hit:
+                    self.pondering = False
+                    self.ponder_hits += 1
+                    ponder_result, self.ponder_result = self.ponder_result, None
+                    if ponder_result is None:
+                        # The time and the nodes of the ponder search count for the budget of the move
+                        if isinstance(depth_or_budget, float):
+                            depth_or_budget = max(0.0, depth_or_budget - (time.perf_counter() - self.ponder_start))
+                        if max_nodes is not None:
+                            max_nodes = max(0, max_nodes - self.alpha_beta.nodes)
+                        self.alpha_beta.set_budget(depth_or_budget, max_nodes)
+                        return
+                    self.principal_variation = list(self.alpha_beta.principal_variation)
+            if hit:
+                self.on_result(*ponder_result)
+                return
+            self.ponder_misses += 1
+            self.stop()
+
+        if self.is_searching():
+            raise RuntimeError("A search is already running")
+
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run, daemon=True, args=(
+            board.copy(), player, depth_or_budget, max_nodes, history.copy() if history is not None else None))
+        self.thread.start()
+
+    def ponder(self, board, player, history=None):
+        """
+        Starts a search during the turn of the opponent (the player), without a budget: the position after
+        the predicted reply is searched, or the position of the opponent (all its replies) if there is no
+        prediction. The search ends with the next start or stop.
+        """
+        if self.is_searching():
+            raise RuntimeError("A search is already running")
+        self.stop()
+
+        board = board.copy()
+        history = history.copy() if history is not None else None
+        predicted_move = self.get_predicted_move()
+        if predicted_move is not None and board.is_legal_move(predicted_move):
+            board.make(predicted_move)
+            player = get_opposite_player(player)
+            if history is not None:
+                history.push(board.get_hash(player))
+            self.ponder_position = (board.get_hash(player), player)
+        else:
+            self.ponder_position = None
+
+        self.cancelled = False
+        self.pondering = True
+        self.ponder_start = time.perf_counter()
+        self.ponder_result = None
+        self.thread = threading.Thread(target=self.run, daemon=True, args=(
+            board, player, AlphaBeta.MAX_DEPTH - 1, None, history))
+        self.thread.start()
+
+    def run(self, board, player, depth_or_budget, max_nodes, history):
+        move, score = self.alpha_beta.search(board, player, depth_or_budget, max_nodes=max_nodes, history=history)
+        with self.lock:
+            if self.cancelled:
+                return
+            if self.pondering:
+                # The opponent didn't move yet, the result is given if the prediction is right
+                self.ponder_result = (move, score, self.alpha_beta.get_stats())
+                return
+            self.principal_variation = list(self.alpha_beta.principal_variation)
+        self.on_result(move, score, self.alpha_beta.get_stats())
+
+    def stop(self):
+        """
+        Ends the search or the ponder search as soon as possible without giving its result (e.g. when the
+        window is closed)
+        """
+        if self.thread is not None and self.thread.is_alive():
+            with self.lock:
+                self.cancelled = True
+            # The search clears the stop requests that came before it started, so the stop is repeated
+            while self.thread.is_alive():
+                self.alpha_beta.stop()
+                self.thread.join(self.STOP_INTERVAL)
+        self.pondering = False
+        self.ponder_result = None